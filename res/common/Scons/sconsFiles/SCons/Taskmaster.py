@@ -52,6 +52,7 @@ __revision__ = "src/engine/SCons/Taskmaster.py rel_2.4.1:3453:73fefd3ea0b0 2015/
 from itertools import chain
 import operator
 import sys
+import time
 import traceback
 
 import SCons.Errors
@@ -109,6 +110,25 @@ def dump_stats():
     for n in sorted(StatsNodes, key=lambda a: str(a)):
         print (fmt % n.stats.__dict__) + str(n)
 
+# [web2board] added: build timeline. When CollectTimings is a list, every
+# executed Task appends a NodeTiming and the time spent by the Taskmaster
+# looking for the next ready node (dependency scanning and up to date
+# checks) is accumulated in ScanTime.
+
+CollectTimings = None
+
+ScanTime = 0.0
+
+class NodeTiming(object):
+    __slots__ = ('node', 'command', 'ready', 'start', 'end')
+
+    def __init__(self, node, command, ready, start, end):
+        self.node = node
+        self.command = command
+        self.ready = ready
+        self.start = start
+        self.end = end
+
 
 
 class Task(object):
@@ -166,6 +186,9 @@ class Task(object):
         T = self.tm.trace
         if T: T.write(self.trace_message(u'Task.prepare()', self.node))
 
+        # [web2board] added: the task is ready to be dispatched to a job
+        self.ready_time = time.time()
+
         # Now that it's the appropriate time, give the TaskMaster a
         # chance to raise any exceptions it encountered while preparing
         # this task.
@@ -225,6 +248,32 @@ class Task(object):
         so only do thread safe stuff here.  Do thread unsafe stuff in
         prepare(), executed() or failed().
         """
+        # [web2board] modified to record the task timing
+        if CollectTimings is None:
+            return self._execute()
+        start = time.time()
+        try:
+            self._execute()
+        finally:
+            CollectTimings.append(NodeTiming(self.targets[0],
+                                             self._get_command(),
+                                             getattr(self, 'ready_time', start),
+                                             start, time.time()))
+
+    def _get_command(self):
+        executor = self.targets[0].get_executor()
+        if executor is None:
+            return ''
+        try:
+            env = executor.get_build_env()
+            targets = executor.get_all_targets()
+            sources = executor.get_all_sources()
+            return '\n'.join([env.subst(a.genstring(targets, sources, env), 0, targets, sources)
+                               for a in executor.get_action_list()])
+        except Exception:
+            return str(executor)
+
+    def _execute(self):
         T = self.tm.trace
         if T: T.write(self.trace_message(u'Task.execute()', self.node))
 
@@ -935,7 +984,14 @@ class Taskmaster(object):
         This simply asks for the next Node to be evaluated, and then wraps
         it in the specific Task subclass with which we were initialized.
         """
-        node = self._find_next_ready_node()
+        # [web2board] modified to measure the scanning time
+        if CollectTimings is None:
+            node = self._find_next_ready_node()
+        else:
+            global ScanTime
+            scan_start = time.time()
+            node = self._find_next_ready_node()
+            ScanTime = ScanTime + time.time() - scan_start
 
         if node is None:
             return None
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+"""
+Micro benchmarks for web2board hot paths.
+usage: python Scripts/Benchmark.py [benchmark_name ...]
+"""
+import inspect
+import os
+import re
+import sys
+import time
+import timeit
+
+modulePath = os.path.abspath(os.path.dirname(inspect.getframeinfo(inspect.currentframe()).filename))
+srcPath = os.path.abspath(os.path.normpath(os.path.join(modulePath, os.pardir)))
+sys.path.insert(0, srcPath)
+
+BENCHMARKS = {}
+
+
+def benchmark(name):
+    def wrapper(func):
+        BENCHMARKS[name] = func
+        return func
+
+    return wrapper
+
+
+def report(title, seconds, iterations):
+    print "{:<60} {:>12.3f} us/call".format(title, seconds * 1e6 / iterations)
+
+
+@benchmark("metrics")
+def benchmark_metrics(iterations=100000):
+    from libs.Metrics import Metrics
+    from libs.WSCommunication.ConnectionHandler import instrument_comm_environment
+
+    report("Metrics.inc", timeit.timeit(lambda: Metrics.inc("calls", hub="CodeHub", function="compile"),
+                                        number=iterations), iterations)
+    report("Metrics.observe", timeit.timeit(lambda: Metrics.observe("seconds", 0.02, hub="CodeHub"),
+                                            number=iterations), iterations)
+
+    class QueueMock(object):
+        on_message = None
+
+    class CommEnvironmentMock(object):
+        def __init__(self):
+            self.message_received_queue = QueueMock()
+
+        def on_message(self, client, message):
+            self.reply(client, dict(hub="CodeHub", function="compile", success=True), message)
+
+        def reply(self, client, reply, origin_message):
+            pass
+
+    plain = CommEnvironmentMock()
+    instrumented = instrument_comm_environment(CommEnvironmentMock())
+    plain_time = timeit.timeit(lambda: plain.on_message(None, "{}"), number=iterations)
+    instrumented_time = timeit.timeit(lambda: instrumented.on_message(None, "{}"), number=iterations)
+    report("hub dispatch overhead", instrumented_time - plain_time, iterations)
+    Metrics.reset()
+
+
+@benchmark("pch")
+def benchmark_precompiled_header(iterations=5, board="uno"):
+    """
+    Warm edit-compile latency of the sketch with and without the precompiled Arduino.h (needs the toolchain)
+    """
+    from libs.CompilerUploader import CompilerUploader
+
+    compiler = CompilerUploader.construct(board)
+    sketch = "void setup() {{\n  pinMode({}, OUTPUT);\n}}\nvoid loop() {{\n}}\n"
+    for title, disable_pch in (("warm edit-compile without precompiled header", "1"),
+                               ("warm edit-compile with precompiled header", "")):
+        os.environ["PLATFORMIO_DISABLE_PCH"] = disable_pch
+        compiler.compile(sketch.format(0))  # core, libraries and header already built
+        start_time = time.time()
+        for i in range(iterations):
+            compiler.compile(sketch.format(i + 1))
+        report(title, time.time() - start_time, iterations)
+    os.environ.pop("PLATFORMIO_DISABLE_PCH")
+
+
+@benchmark("noop_build")
+def benchmark_noop_build(iterations=5, board="uno"):
+    """
+    Rebuild time of an unchanged sketch with and without the scons fast incremental mode (needs the toolchain)
+    """
+    from libs.CompilerUploader import CompilerUploader
+
+    compiler = CompilerUploader.construct(board)
+    sketch = "void setup() {\n}\nvoid loop() {\n}\n"
+    for title, disable_fast_mode in (("no-op rebuild without fast incremental mode", "1"),
+                                     ("no-op rebuild with fast incremental mode", "")):
+        os.environ["PLATFORMIO_DISABLE_FAST_INCREMENTAL"] = disable_fast_mode
+        compiler.compile(sketch)
+        report(title, timeit.timeit(lambda: compiler.compile(sketch), number=iterations), iterations)
+    os.environ.pop("PLATFORMIO_DISABLE_FAST_INCREMENTAL")
+
+
+def _generate_sketch(size):
+    function = ("/* function {0} */\nint function_{0}(int a, int b) {{\n"
+                "  if (a > b) {{ return a; }}\n  // compare\n  return b + {0};\n}}\n")
+    data = "const unsigned char data_{0}[] = {{" + ", ".join(["0x2A"] * 100) + "}};\n"
+    parts = ["#include <Servo.h>\nvoid setup() {\n}\nvoid loop() {\n}\n"]
+    length, i = len(parts[0]), 0
+    while length < size:
+        part = (function if i % 2 else data).format(i)
+        parts.append(part)
+        length += len(part)
+        i += 1
+    return "".join(parts)
+
+
+@benchmark("ino_to_cpp")
+def benchmark_ino_to_cpp(iterations=3):
+    from platformio.builder.tools.piomisc import InoToCPPConverter
+
+    # previous implementation, used as reference
+    legacy_prototype_re = re.compile(r"""^(
+        (\s*[a-z_\d]+){1,2}         # return type
+        (\s+[a-z_\d]+\s*)           # name of prototype
+        \([a-z_,\.\*\&\[\]\s\d]*\)  # arguments
+        )\s*\{                      # must end with {
+        """, re.X | re.M | re.I)
+    legacy_strip_comments_re = re.compile(r"(/\*.*?\*/|^\s*//[^\r\n]*$)", re.M | re.S)
+
+    class SketchNode(object):
+        def __init__(self, contents):
+            self.contents = contents
+
+        def get_path(self):
+            return "main.ino"
+
+        def get_text_contents(self):
+            return self.contents
+
+    # long generated lines (as lookup tables macros) make the legacy regex backtrack quadratically
+    pathological_line = "x" * 4000 + " y(" + "a " * 4000 + "\n"
+    sketches = [("{} KB".format(size / 1024), _generate_sketch(size))
+                for size in (1024, 10 * 1024, 100 * 1024, 1024 * 1024)]
+    sketches.append(("8 KB long line", _generate_sketch(0) + pathological_line))
+    for title, sketch in sketches:
+        converter = InoToCPPConverter([SketchNode(sketch)])
+        report("InoToCPPConverter.convert " + title, timeit.timeit(converter.convert, number=iterations), iterations)
+        report("legacy prototypes and comments regex " + title,
+               timeit.timeit(lambda: (legacy_prototype_re.findall(sketch), legacy_strip_comments_re.sub("", sketch)),
+                             number=iterations), iterations)
+
+
+if __name__ == '__main__':
+    names = sys.argv[1:] or sorted(BENCHMARKS.keys())
+    for name in names:
+        print "--- {} ---".format(name)
+        BENCHMARKS[name]()
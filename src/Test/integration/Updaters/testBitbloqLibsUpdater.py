@@ -6,6 +6,7 @@ import unittest
 from flexmock import flexmock, flexmock_teardown
 
 from Test.testingUtils import restore_test_resources
+from libs.LibraryStore import LibraryStore
 from libs.PathsManager import PathsManager as pm
 from libs.Updaters.BitbloqLibsUpdater import BitbloqLibsUpdater
 from libs.Updaters.Updater import Updater, VersionInfo
@@ -16,7 +17,7 @@ class TestBitbloqLibsUpdater(unittest.TestCase):
     def setUp(self):
         self.res_path = os.path.join(pm.TEST_SETTINGS_PATH, "Updater")
         self.updater = BitbloqLibsUpdater()
-        self.updater.destination_path = os.path.join(self.res_path, "newLibrariesPath")
+        self.updater.store = LibraryStore(os.path.join(self.res_path, "newLibrariesPath"))
         restore_test_resources("Updater")
 
         pm.CONFIG_PATH = self.res_path + os.sep + "config.json"
@@ -44,8 +45,8 @@ class TestBitbloqLibsUpdater(unittest.TestCase):
             self.assertEqual(self.updater.current_version_info.version, Version.bitbloq_libs)
             self.assertEqual(self.updater.current_version_info.libraries_names, Version.bitbloq_libs_libraries)
         finally:
-            if os.path.exists(self.updater.destination_path):
-                shutil.rmtree(self.updater.destination_path)
+            if os.path.exists(self.updater.store.root):
+                shutil.rmtree(self.updater.store.root)
             self.assertFalse(os.path.exists(self.updater.destination_path))
 
     def test_upload_writesLibrariesInDestinationPathWithControlledData(self):
@@ -1,4 +1,7 @@
 import os
+import threading
+from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from SocketServer import ThreadingMixIn
 
 import shutil
 from flexmock import flexmock
@@ -42,3 +45,37 @@ def create_sender_mock():
 
 def restore_paths():
     PathsManager.__dict__ = {x: y for x, y in __original_pathManagerDict.items()}
+
+
+class LocalHTTPServer(ThreadingMixIn, HTTPServer):
+    """
+    Local server of the download tests, it serves handler_class in a background thread and the handlers read how to
+    respond from the attributes given to it. The requests of the handlers are appended to requests
+    """
+    daemon_threads = True
+
+    def __init__(self, handler_class, **attributes):
+        HTTPServer.__init__(self, ("127.0.0.1", 0), handler_class)
+        self.requests = []
+        for name, value in attributes.items():
+            setattr(self, name, value)
+        self.url = "http://127.0.0.1:{}".format(self.server_port)
+        self.__stopped = False
+        thread = threading.Thread(target=self.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+    def handle_error(self, request, client_address):
+        # connections closed by the clients
+        pass
+
+    def stop(self):
+        if not self.__stopped:
+            self.__stopped = True
+            self.shutdown()
+            self.server_close()
+
+
+class QuietHTTPRequestHandler(BaseHTTPRequestHandler):
+    def log_message(self, *args):
+        pass
@@ -0,0 +1,237 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+import zipfile
+from concurrent.futures import Future
+
+from flexmock import flexmock, flexmock_teardown
+
+from Test.testingUtils import QuietHTTPRequestHandler, LocalHTTPServer
+from libs.Config import Config
+from libs.ContentManifest import ContentManifest
+from libs.LibraryStore import LibraryStore
+from libs.PathsManager import PathsManager
+from libs.Updaters.BitbloqLibsUpdater import BitbloqLibsUpdater
+from libs.Updaters.Updater import VersionInfo
+from libs.Version import Version
+
+VERSIONS = {
+    "0.1.0": {"BitbloqLed/BitbloqLed.h": "led 1", "BitbloqLed/BitbloqLed.cpp": "led.cpp 1",
+              "BitbloqOscillator/BitbloqOscillator.h": "oscillator 1", "README.md": "readme"},
+    "0.2.0": {"BitbloqLed/BitbloqLed.h": "led 2", "BitbloqLed/BitbloqLed.cpp": "led.cpp 1",
+              "BitbloqZowi/BitbloqZowi.h": "zowi 2", "README.md": "readme"},
+}
+
+
+def _get_blob_hash(content):
+    return hashlib.sha1("blob {}\0{}".format(len(content), content)).hexdigest()
+
+
+class _ArchiveHandler(QuietHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.path)
+        kind, version, path = (self.path.split("/", 3)[1:] + [""])[:3]
+        files = VERSIONS.get(version.lstrip("v").replace(".zip", ""))
+        if files is None or kind not in server.available:
+            return self.send_error(404)
+        if kind == "trees":
+            tree = [dict(path=p, type="blob", sha=_get_blob_hash(c)) for p, c in files.items()]
+            body = json.dumps(dict(tree=tree + [dict(path="BitbloqLed", type="tree", sha="0")], truncated=False))
+        elif kind == "raw":
+            body = files[path]
+        else:
+            data = io.BytesIO()
+            with zipfile.ZipFile(data, "w") as z:
+                for file_path, content in files.items():
+                    z.writestr("bitbloqLibs-{}/{}".format(version, file_path), content)
+            body = data.getvalue()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestBitbloqLibsUpdater(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.server = LocalHTTPServer(_ArchiveHandler, available={"trees", "raw", "archive"})
+        url = self.server.url
+        flexmock(Config, bitbloq_libs_download_url_template=url + "/archive/v{version}.zip",
+                 bitbloq_libs_manifest_url_template=url + "/trees/v{version}",
+                 bitbloq_libs_file_url_template=url + "/raw/v{version}/{path}")
+        flexmock(Version, bitbloq_libs=Version.bitbloq_libs, bitbloq_libs_libraries=Version.bitbloq_libs_libraries)
+        flexmock(Version).should_receive("store_values")
+        self.lib_dir = os.path.join(self.test_dir, "lib")
+        flexmock(Config).should_receive("get_platformio_lib_dir").and_return(self.lib_dir)
+        flexmock(PathsManager, PLATFORMIO_WORKSPACE_PATH=os.path.join(self.test_dir, "workspace"))
+        self.updater = BitbloqLibsUpdater()
+        self.updater.store = LibraryStore(os.path.join(self.test_dir, "store"))
+        self.updater.update(self.__get_version_info("0.1.0"))
+        self.server.requests = []
+
+    def tearDown(self):
+        self.server.stop()
+        flexmock_teardown()
+        shutil.rmtree(self.test_dir)
+
+    @staticmethod
+    def __get_version_info(version):
+        return VersionInfo(version, Config.bitbloq_libs_download_url_template.format(version=version))
+
+    def __get_path(self, path):
+        return os.path.join(self.updater.destination_path, *path.split("/"))
+
+    def __assert_installed(self, version):
+        self.assertEqual(self.updater.store.get_active_version(), version)
+        self.assertEqual(self.updater.destination_path, self.updater.store.get_version_path(version))
+        for path, content in VERSIONS[version].items():
+            with open(self.__get_path(path)) as f:
+                self.assertEqual(f.read(), content)
+        self.assertEqual(len(ContentManifest.from_directory(self.updater.destination_path).files),
+                         len(VERSIONS[version]))
+        self.assertEqual(sorted(os.listdir(self.updater.store.root)), ["active_version", "objects", "versions"])
+
+    def test_update_downloadsOnlyFilesNotStored(self):
+        self.updater.update(self.__get_version_info("0.2.0"))
+
+        self.__assert_installed("0.2.0")
+        self.assertEqual(sorted(self.server.requests), ["/raw/v0.2.0/BitbloqLed/BitbloqLed.h",
+                                                        "/raw/v0.2.0/BitbloqZowi/BitbloqZowi.h", "/trees/v0.2.0"])
+        self.assertEqual(Version.bitbloq_libs, "0.2.0")
+        self.assertEqual(sorted(Version.bitbloq_libs_libraries), ["BitbloqLed", "BitbloqZowi"])
+
+    def test_update_keepsPreviousVersionSideBySide(self):
+        self.updater.update(self.__get_version_info("0.2.0"))
+
+        previous_path = self.updater.store.get_version_path("0.1.0")
+        with open(os.path.join(previous_path, "BitbloqOscillator", "BitbloqOscillator.h")) as f:
+            self.assertEqual(f.read(), "oscillator 1")
+
+    def test_update_switchesToStoredVersionWithoutDownloads(self):
+        self.updater.update(self.__get_version_info("0.2.0"))
+        self.server.requests = []
+        previous_mtime = os.path.getmtime(self.updater.store.get_version_path("0.1.0"))
+
+        self.updater.update(self.__get_version_info("0.1.0"))
+
+        self.__assert_installed("0.1.0")
+        self.assertEqual(self.server.requests, [])
+        self.assertEqual(os.path.getmtime(self.updater.store.get_version_path("0.1.0")), previous_mtime)
+        self.assertEqual(Version.bitbloq_libs, "0.1.0")
+
+    def test_update_storesSharedFilesOnlyOnce(self):
+        self.updater.update(self.__get_version_info("0.2.0"))
+
+        objects_count = sum(len(files) for _, _, files in os.walk(os.path.join(self.updater.store.root, "objects")))
+        contents = set(VERSIONS["0.1.0"].values()) | set(VERSIONS["0.2.0"].values())
+        self.assertEqual(objects_count, len(contents))
+
+    def test_update_storesOnlyNewFilesIfArchiveIsUsed(self):
+        self.server.available = {"archive"}
+
+        self.updater.update(self.__get_version_info("0.2.0"))
+
+        self.__assert_installed("0.2.0")
+        self.assertEqual(self.server.requests, ["/trees/v0.2.0", "/archive/v0.2.0.zip"])
+
+    def test_update_usesArchiveIfManyFilesAreNotStored(self):
+        flexmock(BitbloqLibsUpdater, DELTA_MAX_FILES=1)
+
+        self.updater.update(self.__get_version_info("0.2.0"))
+
+        self.__assert_installed("0.2.0")
+        self.assertEqual(self.server.requests, ["/trees/v0.2.0", "/archive/v0.2.0.zip"])
+
+    def test_update_usesArchiveIfFileCanNotBeDownloaded(self):
+        self.server.available = {"trees", "archive"}
+
+        self.updater.update(self.__get_version_info("0.2.0"))
+
+        self.__assert_installed("0.2.0")
+        self.assertEqual(self.server.requests[-1], "/archive/v0.2.0.zip")
+
+    def test_update_waitsForRunningDownloadsBeforeUsingArchive(self):
+        events = []
+        real_download = self.updater.downloader.download
+
+        def download(url, file_path):
+            future = Future()
+            if url.endswith(".zip"):
+                return real_download(url, file_path)
+            if url.endswith("BitbloqLed.h"):
+                future.set_exception(IOError("not found"))
+            else:
+                def write():
+                    time.sleep(0.2)
+                    with open(file_path, "w") as f:
+                        f.write("zowi 2")
+                    events.append("written")
+                    future.set_result(None)
+
+                future.set_running_or_notify_cancel()
+                threading.Thread(target=write).start()
+            return future
+
+        flexmock(self.updater.downloader).should_receive("download").replace_with(download)
+        download_archive = self.updater._download_archive
+        flexmock(self.updater).should_receive("_download_archive").replace_with(
+            lambda version_to_upload, staging_path: events.append(os.listdir(staging_path)) or
+            download_archive(version_to_upload, staging_path))
+
+        self.updater.update(self.__get_version_info("0.2.0"))
+
+        # the archive is extracted in a clean staging path once no download is running
+        self.assertEqual(events, ["written", []])
+
+    def test_update_keepsActiveVersionIfDownloadFails(self):
+        self.server.available = set()
+
+        self.assertRaises(IOError, self.updater.update, self.__get_version_info("0.2.0"))
+
+        self.assertEqual(self.updater.store.get_active_version(), "0.1.0")
+        self.assertEqual(self.updater.store.get_versions(), ["0.1.0"])
+        self.assertEqual(Version.bitbloq_libs, "0.1.0")
+
+    def test_update_prunesVersionsButActiveAndPreviousOne(self):
+        flexmock(Config, library_versions_kept=2)
+        libraries_build_dir = os.path.join(self.test_dir, "workspace", ".pioenvs", "uno", "libversions", "0.1.0")
+        os.makedirs(libraries_build_dir)
+        self.updater.update(self.__get_version_info("0.2.0"))
+        VERSIONS["0.3.0"] = dict(VERSIONS["0.2.0"], **{"README.md": "readme 3"})
+        try:
+            self.updater.update(self.__get_version_info("0.3.0"))
+        finally:
+            del VERSIONS["0.3.0"]
+
+        self.assertEqual(self.updater.store.get_versions(), ["0.2.0", "0.3.0"])
+        self.assertFalse(os.path.exists(libraries_build_dir))
+
+    def test_restoreCurrentVersionIfNecessary_migratesLegacyInstall(self):
+        for path, content in VERSIONS["0.1.0"].items():
+            file_path = os.path.join(self.lib_dir, *path.split("/"))
+            if not os.path.isdir(os.path.dirname(file_path)):
+                os.makedirs(os.path.dirname(file_path))
+            with open(file_path, "w") as f:
+                f.write(content)
+
+        self.updater.restore_current_version_if_necessary()
+
+        self.assertEqual(os.listdir(self.lib_dir), ["README.md"])
+        self.assertEqual(self.server.requests, [])
+
+    def test_restoreCurrentVersionIfNecessary_onlyActivatesStoredVersion(self):
+        self.updater.update(self.__get_version_info("0.2.0"))
+        self.updater.store.set_active_version("0.1.0")
+        self.server.requests = []
+
+        self.updater.restore_current_version_if_necessary()
+
+        self.__assert_installed("0.2.0")
+        self.assertEqual(self.server.requests, [])
@@ -0,0 +1,105 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from flexmock import flexmock, flexmock_teardown
+
+from platformio import app
+from platformio.app import CachedState
+
+
+class TestCachedState(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.test_dir, "appstate.json")
+        self.__write_state(dict(installed_packages={"toolchain-atmelavr": {"version": 1}}))
+        self.state = CachedState(self.path)
+
+    def tearDown(self):
+        self.state.flush()
+        flexmock_teardown()
+        shutil.rmtree(self.test_dir)
+
+    def __write_state(self, data):
+        with open(self.path, "w") as f:
+            json.dump(data, f)
+
+    def __read_state(self):
+        with open(self.path) as f:
+            return json.load(f)
+
+    def test_get_readsFileOnlyIfItChanged(self):
+        self.state.get("installed_packages")
+        flexmock(json).should_receive("load").never()
+
+        self.assertEqual(self.state.get("installed_packages"), {"toolchain-atmelavr": {"version": 1}})
+
+    def test_get_reloadsFileChangedByOtherProcess(self):
+        self.state.get("installed_packages")
+        self.__write_state(dict(installed_packages={}, last_version="2.0"))
+
+        self.assertEqual(self.state.get("last_version"), "2.0")
+
+    def test_get_returnsCopies(self):
+        self.state.get("installed_packages")["toolchain-atmelavr"]["version"] = 2
+
+        self.assertEqual(self.state.get("installed_packages")["toolchain-atmelavr"]["version"], 1)
+
+    def test_set_isVisibleAtOnceAndWrittenBehind(self):
+        self.state.set("last_version", "2.0")
+
+        self.assertEqual(self.state.get("last_version"), "2.0")
+        self.assertNotIn("last_version", self.__read_state())
+
+        self.state.flush()
+
+        self.assertEqual(self.__read_state()["last_version"], "2.0")
+
+    def test_set_isFlushedAfterDelay(self):
+        flexmock(CachedState, FLUSH_DELAY=0.01)
+        self.state.set("last_version", "2.0")
+        end_time = time.time() + 5
+        while "last_version" not in self.__read_state() and time.time() < end_time:
+            time.sleep(0.01)
+
+        self.assertEqual(self.__read_state()["last_version"], "2.0")
+
+    def test_flush_mergesChangesOfOtherProcesses(self):
+        self.state.get("installed_packages")
+        self.state.set("last_version", "2.0")
+        self.__write_state(dict(installed_packages={}, telemetry={"cid": "1"}))
+
+        self.state.flush()
+
+        self.assertEqual(self.__read_state(), dict(installed_packages={}, telemetry={"cid": "1"}, last_version="2.0"))
+
+    def test_delete_removesItem(self):
+        self.state.delete("installed_packages")
+
+        self.assertEqual(self.state.get("installed_packages", {}), {})
+        self.state.flush()
+        self.assertEqual(self.__read_state(), {})
+
+    def test_settings_useCachedState(self):
+        flexmock(CachedState).should_receive("get_instance").and_return(self.state)
+
+        app.set_setting("enable_prompts", "no")
+
+        self.assertFalse(app.get_setting("enable_prompts"))
+        self.assertEqual(self.state.get("settings"), {"enable_prompts": False})
+        app.reset_settings()
+        self.assertEqual(self.state.get("settings", {}), {})
+
+    def test_setSetting_keepsSettingsChangedByOtherProcesses(self):
+        flexmock(CachedState).should_receive("get_instance").and_return(self.state)
+        app.get_setting("enable_prompts")
+        self.__write_state(dict(settings={"check_libraries_interval": 3}))
+
+        app.set_setting("enable_prompts", "no")
+        self.state.flush()
+
+        self.assertEqual(self.__read_state()["settings"], {"check_libraries_interval": 3, "enable_prompts": False})
+        self.assertEqual(app.get_setting("check_libraries_interval"), 3)
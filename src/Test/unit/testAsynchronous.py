@@ -0,0 +1,101 @@
+import gc
+import time
+import unittest
+import weakref
+
+from flexmock import flexmock, flexmock_teardown
+
+from libs.Decorators import Asynchronous
+from libs.Decorators.Asynchronous import AsyncFuture, asynchronous, get_pool, get_pools_stats
+
+
+class TestAsynchronous(unittest.TestCase):
+    def tearDown(self):
+        flexmock_teardown()
+
+    def test_asynchronous_returnsFutureWithResult(self):
+        @asynchronous()
+        def add(a, b):
+            return a + b
+
+        self.assertEqual(add(1, 2).result(timeout=1), 3)
+
+    def test_asynchronous_runsTaskInSelectedPool(self):
+        @asynchronous(pool="io")
+        def task():
+            pass
+
+        submitted = get_pool("io").submitted_count
+        task().result(timeout=1)
+
+        self.assertEqual(get_pool("io").submitted_count, submitted + 1)
+
+    def test_asynchronous_runsDedicatedPoolsInOwnThread(self):
+        @asynchronous(pool="serial")
+        def loop():
+            time.sleep(0.2)
+
+        futures = [loop() for _ in range(30)]
+        time.sleep(0.05)
+
+        self.assertGreaterEqual(get_pool("serial").active_count, 30)
+        [f.result(timeout=2) for f in futures]
+
+    def test_asynchronous_raisesKeyErrorForUnknownPool(self):
+        @asynchronous(pool="notExistingPool")
+        def task():
+            pass
+
+        self.assertRaises(KeyError, task)
+
+    def test_getPoolsStats_containsLatencyHistograms(self):
+        @asynchronous(pool="io")
+        def task():
+            pass
+
+        task().result(timeout=1)
+        stats = get_pools_stats()["io"]
+
+        self.assertGreaterEqual(stats["run_latency"]["count"], 1)
+        self.assertIn("queued", stats)
+        self.assertIn("active", stats)
+
+    def test_asyncFuture_logsNotRetrievedExceptions(self):
+        flexmock(Asynchronous.log).should_receive("error").once()
+
+        @asynchronous()
+        def fail():
+            raise Exception("error")
+
+        future = fail()
+        while not future.done():
+            time.sleep(0.01)
+        del future
+
+    def test_asyncFuture_doesNotLogRetrievedExceptions(self):
+        flexmock(Asynchronous.log).should_receive("error").never()
+
+        @asynchronous()
+        def fail():
+            raise Exception("error")
+
+        future = fail()
+        self.assertRaises(Exception, future.result, 1)
+        del future
+
+    def test_asyncFuture_canBeCollectedInReferenceCycles(self):
+        @asynchronous()
+        def task():
+            pass
+
+        future = task()
+        future.result(timeout=1)
+        cycle = [future]
+        future.add_done_callback(cycle.append)
+        future.cycle = cycle
+        future_reference = weakref.ref(future)
+        del future, cycle
+        gc.collect()
+
+        self.assertIsNone(future_reference())
+        self.assertFalse([o for o in gc.garbage if isinstance(o, AsyncFuture)])
@@ -0,0 +1,43 @@
+import unittest
+
+from flexmock import flexmock, flexmock_teardown
+
+from libs import BuildTimeline
+from libs.JobServer import JobServer
+from libs.LibraryStore import LibraryStore
+from platformio import app, util
+from platformio.platforms import base
+from platformio.platforms.base import BasePlatform
+
+
+class TestBasePlatform(unittest.TestCase):
+    def setUp(self):
+        self.platform = BasePlatform()
+        self.executed_args = []
+        flexmock(self.platform).should_receive("configure_default_packages")
+        flexmock(self.platform).should_receive("_install_default_packages")
+        flexmock(LibraryStore).should_receive("get_instance").and_return(
+            flexmock(get_active_version=lambda: None))
+        flexmock(JobServer).should_receive("get_instance").and_return(
+            flexmock(tokens=2, get_environment_value=lambda: "127.0.0.1:0"))
+        flexmock(app).should_receive("flush_state")
+        flexmock(BuildTimeline).should_receive("collect").and_return([])
+        flexmock(util).should_receive("exec_command").replace_with(
+            lambda args, **kwargs: self.executed_args.extend(args) or dict(returncode=0))
+
+    def tearDown(self):
+        flexmock_teardown()
+
+    def __run(self, **kwargs):
+        return self.platform.run(["BUILD_SCRIPT=%s" % base.__file__], [], 1, **kwargs)
+
+    def test_run_passesKeepGoingToScons(self):
+        self.__run(keep_going=True)
+
+        self.assertIn("-k", self.executed_args)
+        self.assertLess(self.executed_args.index("-k"), self.executed_args.index("-f"))
+
+    def test_run_stopsAtFirstErrorByDefault(self):
+        self.__run()
+
+        self.assertNotIn("-k", self.executed_args)
@@ -0,0 +1,78 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from flexmock import flexmock, flexmock_teardown
+
+from libs.BoardsCatalog import BoardsCatalog, parse_hwid
+
+UNO = {"build": {"mcu": "atmega328p", "vid": "0x2341", "pid": "0x0043"}, "name": "Arduino Uno", "platform": "atmelavr"}
+LEONARDO = {"build": {"mcu": "atmega32u4", "vid": "0x2341", "pid": "0x8036"}, "name": "Arduino Leonardo",
+            "platform": "atmelavr"}
+TEENSY = {"build": {"mcu": "mk20dx256"}, "name": "Teensy 3.1", "platform": "teensy"}
+
+
+class TestBoardsCatalog(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.boards_dir = os.path.join(self.test_dir, "boards")
+        os.makedirs(self.boards_dir)
+        self.__write_boards("arduino.json", dict(uno=UNO, leonardo=LEONARDO))
+        self.__write_boards("teensy.json", dict(teensy31=TEENSY))
+        self.catalog_path = os.path.join(self.test_dir, "boards_catalog.json")
+        self.catalog = self.__create_catalog()
+
+    def tearDown(self):
+        flexmock_teardown()
+        shutil.rmtree(self.test_dir)
+
+    def __write_boards(self, file_name, boards):
+        with open(os.path.join(self.boards_dir, file_name), "w") as f:
+            json.dump(boards, f)
+
+    def __create_catalog(self):
+        return BoardsCatalog(self.catalog_path, [self.boards_dir, os.path.join(self.test_dir, "not_existing")])
+
+    def test_getBoard_deserializesTheBoard(self):
+        self.assertEqual(self.catalog.get_board("leonardo"), LEONARDO)
+        self.assertEqual(self.catalog.get_board("teensy31"), TEENSY)
+        self.assertIsNone(self.catalog.get_board("unknown"))
+
+    def test_getBoard_usesCompiledCatalogIfSourcesDidNotChange(self):
+        self.catalog.get_board("uno")
+        flexmock(BoardsCatalog).should_receive("_compile").never()
+
+        self.assertEqual(self.__create_catalog().get_board("uno"), UNO)
+
+    def test_getBoard_recompilesCatalogIfSourcesChanged(self):
+        self.catalog.get_board("uno")
+        self.__write_boards("teensy.json", dict(teensy31=TEENSY, teensy30=TEENSY))
+        os.utime(os.path.join(self.boards_dir, "teensy.json"), (time.time() + 10, time.time() + 10))
+
+        self.assertEqual(self.__create_catalog().get_board("teensy30"), TEENSY)
+
+    def test_getBoard_worksIfCatalogCanNotBeWritten(self):
+        catalog = BoardsCatalog(os.path.join(self.test_dir, "not_existing", "catalog.json"), [self.boards_dir])
+
+        self.assertEqual(catalog.get_board("uno"), UNO)
+
+    def test_search_filtersByIndexedFields(self):
+        self.assertEqual(self.catalog.search(platform="atmelavr"), ["leonardo", "uno"])
+        self.assertEqual(self.catalog.search(mcu="ATmega328P"), ["uno"])
+        self.assertEqual(self.catalog.search(vid="2341", pid="0x8036"), ["leonardo"])
+        self.assertEqual(self.catalog.search(query="teensy 3"), ["teensy31"])
+
+    def test_getAll_behavesAsBoardsDictionary(self):
+        boards = self.catalog.get_all()
+
+        self.assertEqual(sorted(boards.keys()), ["leonardo", "teensy31", "uno"])
+        self.assertIn("uno", boards)
+        self.assertEqual(boards["uno"], UNO)
+        self.assertRaises(KeyError, lambda: boards["unknown"])
+
+    def test_parseHwid_getsUsbIds(self):
+        self.assertEqual(parse_hwid("USB VID:PID=2341:0043 SER=75237333536351815111"), ("2341", "0043"))
+        self.assertEqual(parse_hwid("n/a"), (None, None))
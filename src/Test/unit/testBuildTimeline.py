@@ -0,0 +1,62 @@
+import json
+import os
+import tempfile
+import unittest
+
+from libs import BuildTimeline
+from libs.Metrics import Metrics
+
+
+def _node(target, start, end, deps=()):
+    return dict(target=target, phase=BuildTimeline.get_phase(target), command="", ready=start, start=start, end=end,
+                deps=list(deps))
+
+
+class TestBuildTimeline(unittest.TestCase):
+    def setUp(self):
+        Metrics.reset()
+        self.timeline = dict(wall=3.0, scan=0.5, nodes=[
+            _node(".pioenvs/uno/FrameworkArduino/wiring.o", 0.5, 1.5),
+            _node(".pioenvs/uno/src/tmp_ino_to.o", 0.5, 1.0),
+            _node(".pioenvs/uno/Servo/Servo.o", 1.0, 1.2),
+            _node(".pioenvs/uno/libFrameworkArduino.a", 1.5, 1.7, [0]),
+            _node(".pioenvs/uno/firmware.elf", 1.7, 2.5, [1, 2, 3]),
+            _node(".pioenvs/uno/firmware.hex", 2.5, 2.6, [4])
+        ])
+
+    def tearDown(self):
+        Metrics.reset()
+
+    def test_getPhase_classifiesTargets(self):
+        self.assertEqual([n["phase"] for n in self.timeline["nodes"]],
+                         ["core", "sketch", "libraries", "archive", "link", "objcopy"])
+        self.assertEqual(BuildTimeline.get_phase("upload"), "other")
+
+    def test_getCriticalPath_followsLongestDependencyChain(self):
+        self.assertEqual(BuildTimeline.get_critical_path(self.timeline["nodes"]), [0, 3, 4, 5])
+        self.assertEqual(BuildTimeline.get_critical_path([]), [])
+
+    def test_summarize_addsPhasesTimes(self):
+        summary = BuildTimeline.summarize(self.timeline)
+
+        self.assertEqual(summary["phases"]["sketch"], dict(count=1, seconds=0.5))
+        self.assertEqual(summary["critical_path"][-1], ".pioenvs/uno/firmware.hex")
+        self.assertAlmostEqual(summary["critical_path_seconds"], 2.1)
+
+    def test_collect_removesFileAndObservesMetrics(self):
+        fd, path = tempfile.mkstemp()
+        with os.fdopen(fd, "w") as f:
+            json.dump(self.timeline, f)
+
+        timeline = BuildTimeline.collect(path, board="uno")
+
+        self.assertFalse(os.path.exists(path))
+        self.assertEqual(timeline["summary"]["scan"], 0.5)
+        self.assertIn(("build_phase_seconds", (("board", "uno"), ("phase", "link"))), Metrics.histograms)
+
+    def test_collect_returnsNoneIfTheBuildDidNotWriteIt(self):
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+
+        self.assertIsNone(BuildTimeline.collect(path))
+        self.assertFalse(os.path.exists(path))
@@ -0,0 +1,97 @@
+import unittest
+
+from flexmock import flexmock, flexmock_teardown
+
+from libs import utils
+from libs.CompileProgress import CompileProgressSink, get_output_sink
+
+COMPILE_LINE = "avr-g++ -o .pioenvs/uno/src/main.o -c -fno-exceptions -Os -DF_CPU=16000000L -Isrc src/main.cpp"
+ARCHIVE_LINE = "avr-ar rcs .pioenvs/uno/libFrameworkArduino.a .pioenvs/uno/FrameworkArduino/wiring.o"
+
+
+class TestCompileProgress(unittest.TestCase):
+    def setUp(self):
+        self.pushed = []
+        CompileProgressSink.objects_by_env.clear()
+        self.sink = CompileProgressSink("uno", self.pushed.append, push_interval=60)
+
+    def tearDown(self):
+        CompileProgressSink.objects_by_env.clear()
+        flexmock_teardown()
+
+    def test_onOut_countsOnlyCompileCommands(self):
+        self.sink.on_out(COMPILE_LINE)
+        self.sink.on_out(ARCHIVE_LINE)
+        self.sink.on_out("scons: done building targets.")
+
+        progress = self.sink.get_progress()
+
+        self.assertEqual(progress["compiled"], 1)
+        self.assertEqual(progress["current_file"], "src/main.cpp")
+
+    def test_onErr_collectsWarnings(self):
+        self.sink.on_err("src/main.cpp:3:5: warning: unused variable 'a' [-Wunused-variable]")
+        self.sink.on_err("src/main.cpp: In function 'void setup()':")
+
+        self.assertEqual(len(self.sink.get_progress()["warnings"]), 1)
+
+    def test_push_isThrottled(self):
+        self.sink.on_out(COMPILE_LINE)
+        self.sink.on_out(COMPILE_LINE)
+        self.sink.on_out(COMPILE_LINE)
+
+        self.assertEqual(len(self.pushed), 1)
+        self.assertEqual(self.pushed[0]["compiled"], 1)
+
+    def test_close_pushesPendingProgressAndStoresTotal(self):
+        self.sink.on_out(COMPILE_LINE)
+        self.sink.on_out(COMPILE_LINE)
+
+        self.sink.close(success=True)
+
+        self.assertEqual(self.pushed[-1]["compiled"], 2)
+        self.assertEqual(CompileProgressSink("uno", self.pushed.append).get_progress()["total"], 2)
+
+    def test_contextManager_setsSinkForCurrentThreadOnly(self):
+        with self.sink:
+            self.assertIs(get_output_sink(), self.sink)
+        self.assertIsNone(get_output_sink())
+
+    def test_push_exceptionsDoNotBreakTheBuild(self):
+        def on_progress(progress):
+            raise Exception("client disconnected")
+
+        sink = CompileProgressSink("uno", on_progress)
+        sink.on_out(COMPILE_LINE)
+        sink.close()
+
+    def test_failFast_killsProcessGroupOnFirstUserCodeError(self):
+        process = object()
+        flexmock(utils).should_receive("kill_process_group").with_args(process).once()
+        sink = CompileProgressSink("uno", self.pushed.append, fail_fast=True)
+        sink.on_process_started(process)
+
+        sink.on_err(".pioenvs/uno/FrameworkArduino/main.cpp:3:1: error: a")
+        self.assertFalse(sink.aborted)
+        sink.on_err("main.ino:9:14: error: expected ';' before '}' token")
+        sink.on_err("main.ino:10:14: error: expected ';' before '}' token")
+
+        self.assertTrue(sink.aborted)
+
+    def test_failFast_killsProcessIfAbortedBeforeItWasRegistered(self):
+        process = object()
+        flexmock(utils).should_receive("kill_process_group").with_args(process).once()
+        sink = CompileProgressSink("uno", self.pushed.append, fail_fast=True)
+
+        sink.on_err("main.ino:9:14: error: expected ';' before '}' token")
+        sink.on_process_started(process)
+
+    def test_close_doesNotStoreTotalOfAbortedBuilds(self):
+        flexmock(utils).should_receive("kill_process_group")
+        sink = CompileProgressSink("uno", self.pushed.append, fail_fast=True)
+        sink.on_out(COMPILE_LINE)
+        sink.on_err("main.ino:9:14: error: expected ';' before '}' token")
+
+        sink.close(success=True)
+
+        self.assertNotIn("uno", CompileProgressSink.objects_by_env)
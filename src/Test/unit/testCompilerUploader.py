@@ -1,11 +1,16 @@
+import os
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 
 from flexmock import flexmock, flexmock_teardown
 
-from libs import CompilerUploader
+from libs import CompileProgress, CompilerUploader
 from libs.LoggingUtils import init_logging
 
-log = init_logging(__name__)
+log = init_logging(__name__, log_dir=tempfile.gettempdir())
 
 
 class TestCompilerUploader(unittest.TestCase):
@@ -13,6 +18,7 @@ class TestCompilerUploader(unittest.TestCase):
     def setUp(self):
         self.compiler = CompilerUploader.CompilerUploader.construct()
         self.platformio_run_mock = flexmock(CompilerUploader)
+        CompilerUploader.CompilerUploader._check_results_cache.clear()
 
     def tearDown(self):
         flexmock_teardown()
@@ -87,3 +93,53 @@ scons: *** [.pioenvs/bt328/firmware.elf] Error 1"""
 
         self.assertIn("main.cpp", parse_error[1]["file"])
         self.assertEqual(parse_error[1]["error"], 'undefined reference to `loop\'')
+
+    def test_check_returnsSketchErrorsWithoutBuilding(self):
+        include_dir = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(include_dir, "Arduino.h"), "w") as f:
+                f.write("void delay(unsigned long ms);\n")
+            ide_data = dict(cxx_path="g++", cxx_flags=[], defines=["F_CPU=16000000L"], includes=[include_dir])
+            flexmock(self.compiler).should_receive("get_ide_data").and_return(ide_data)
+            self.platformio_run_mock.should_receive("platformio_run").never()
+
+            result = self.compiler.check("void setup() {\n}\nvoid loop() {\n  delay(100)\n}\n")
+        finally:
+            shutil.rmtree(include_dir)
+
+        self.assertFalse(result["success"])
+        self.assertEqual(result["errors"][0]["file"], "main.ino")
+        self.assertEqual(result["errors"][0]["line"], 4)
+
+    def test_check_cachesResultsByCode(self):
+        check_result = dict(success=True, errors=[], warnings=[])
+        flexmock(self.compiler).should_receive("_run_syntax_check").and_return(check_result).once()
+
+        self.assertIs(self.compiler.check("void setup(){}"), check_result)
+        self.assertIs(self.compiler.check("void setup(){}"), check_result)
+
+    def test_compile_abortsRunningWarmBuild(self):
+        warm_build_started = threading.Event()
+
+        def platformio_run(keep_going=False, **kwargs):
+            if keep_going:
+                warm_build_started.set()
+                sink = CompileProgress.get_output_sink()
+                end = time.time() + 5
+                # the process of the build is killed when the sink is aborted
+                while not sink.aborted and time.time() < end:
+                    time.sleep(0.01)
+                return [[False, dict(err="")]]
+            return [[True, dict(err="")]]
+
+        self.platformio_run_mock.should_receive("platformio_run").replace_with(platformio_run)
+        warm_build = self.compiler._warm_build_cache()
+        self.assertTrue(warm_build_started.wait(5))
+        start_time = time.time()
+
+        result = self.compiler.compile("")
+
+        self.assertTrue(result[0])
+        self.assertLess(time.time() - start_time, 4)
+        warm_build.result(timeout=5)
+        self.assertFalse(CompilerUploader.CompilerUploader._is_warming_build_cache)
@@ -0,0 +1,46 @@
+import threading
+import time
+import unittest
+
+from libs import Diagnostics
+
+
+class TestDiagnostics(unittest.TestCase):
+    def test_samplingProfiler_collectsCollapsedStacksFromOtherThreads(self):
+        def busy_function():
+            end_time = time.time() + 0.2
+            while time.time() < end_time:
+                pass
+
+        profiler = Diagnostics.SamplingProfiler(interval=0.001)
+        profiler.start()
+        busy_thread = threading.Thread(target=busy_function)
+        busy_thread.start()
+        busy_thread.join()
+
+        collapsed_stacks = profiler.stop()
+
+        self.assertIn("busy_function", collapsed_stacks)
+        self.assertGreater(profiler.samples_count, 0)
+
+    def test_callProfiler_returnsFunctionResultAndStats(self):
+        profiler = Diagnostics.CallProfiler()
+
+        result = profiler.run(sorted, [3, 1, 2])
+
+        self.assertEqual(result, [1, 2, 3])
+        self.assertIn("sorted", profiler.get_stats_text())
+
+    def test_getThreadsStacks_includesCurrentThread(self):
+        stacks = Diagnostics.get_threads_stacks()
+
+        self.assertTrue(any(threading.current_thread().name in name for name in stacks))
+
+    def test_memorySnapshot_compareToReturnsNewObjects(self):
+        old_snapshot = Diagnostics.MemorySnapshot()
+        new_objects = [Diagnostics.CallProfiler() for _ in range(100)]
+
+        diff = Diagnostics.MemorySnapshot().compare_to(old_snapshot)
+
+        self.assertTrue(len(diff) > 0)
+        self.assertIsNotNone(new_objects)
@@ -1,65 +1,106 @@
 import os
-import time
+import shutil
+import tempfile
 import unittest
 import urllib2
+
 from flexmock import flexmock, flexmock_teardown
 
-from Test.testingUtils import restore_test_resources
+from Test.testingUtils import QuietHTTPRequestHandler, LocalHTTPServer
 from libs.Downloader import Downloader
-import logging
-
-from libs.PathsManager import PathsManager
-
 
-class TestDownloader(unittest.TestCase):
-    def setUp(self):
-        logging.basicConfig()
-        logging.getLogger().setLevel(logging.DEBUG)
+CONTENT = "".join(chr(i % 256) for i in range(100000))
 
-        self.relative_data_path = 'Downloader'
-        self.data_path = os.path.join(PathsManager.TEST_SETTINGS_PATH, self.relative_data_path)
-        self.downloader = Downloader(refresh_time=0.01)
-        self.metaMock = flexmock(getheaders=lambda x: [1000])
-        self.read_sleep = 0
 
-        def read_mock(bytes=-1):
-            if self.read_sleep is not None:
-                time.sleep(self.read_sleep)
-                self.read_sleep = None
-                return "testing"
-            return ''
+class _DownloadHandler(QuietHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        range_header = self.headers.get("Range")
+        server.requests.append(range_header)
+        if self.path != "/web2board.zip":
+            return self.send_error(404)
+        start = int(range_header[len("bytes="):-1]) if range_header and server.accept_ranges else 0
+        self.send_response(206 if start else 200)
+        self.send_header("Content-Length", str(len(CONTENT) - start))
+        self.end_headers()
+        end = len(CONTENT)
+        if server.truncate_at is not None:
+            end, server.truncate_at = server.truncate_at, None
+        self.wfile.write(CONTENT[start:end])
 
-        self.site_mock = flexmock(info=lambda: self.metaMock, read=read_mock)
-        self.urllib2_mock = flexmock(urllib2)
-        self.urlopen_mock = self.urllib2_mock.should_receive("urlopen").and_return(self.site_mock)
 
-        restore_test_resources(self.relative_data_path)
+class TestDownloader(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.dst = os.path.join(self.test_dir, "web2board.zip")
+        self.server = LocalHTTPServer(_DownloadHandler, accept_ranges=True, truncate_at=None)
+        self.url = self.server.url + "/web2board.zip"
+        self.downloader = Downloader(refresh_time=0)
+        flexmock(Downloader, CHUNK_SIZE=10000, RETRY_DELAY=0)
+        self.info_calls = []
 
     def tearDown(self):
+        self.server.stop()
         flexmock_teardown()
+        shutil.rmtree(self.test_dir)
 
     def __infoCallbackMock(self, *args):
-        pass
+        self.info_calls.append(args)
 
-    def __finishCallbackMock(self, *args):
-        pass
+    def __assert_downloaded(self):
+        with open(self.dst, "rb") as f:
+            self.assertEqual(f.read(), CONTENT)
 
     def test_download_createsFileInDestinationPath(self):
-        url = "url"
-        dst = self.data_path + os.sep + 'testing.txt'
-        self.assertFalse(os.path.exists(dst))
-        self.urlopen_mock.with_args(url).at_least().times(1)
+        self.assertFalse(os.path.exists(self.dst))
+
+        self.assertEqual(self.downloader.download(self.url, self.dst).result(), self.dst)
+
+        self.__assert_downloaded()
+
+    def test_download_usesASingleRequest(self):
+        self.downloader.download(self.url, self.dst).result()
+
+        self.assertEqual(self.server.requests, [None])
+
+    def test_download_callsInfoCallbackWithSizeOfResponse(self):
+        self.downloader.download(self.url, self.dst, info_callback=self.__infoCallbackMock).result()
+
+        self.assertEqual(self.info_calls[0], (10000, 100000, 10.0))
+        self.assertEqual(self.info_calls[-1], (100000, 100000, 100.0))
+
+    def test_download_throttlesInfoCallback(self):
+        downloader = Downloader(refresh_time=60)
+
+        downloader.download(self.url, self.dst, info_callback=self.__infoCallbackMock).result()
+
+        self.assertEqual(self.info_calls, [(100000, 100000, 100.0)])
+
+    def test_download_resumesWithRangeAfterConnectionLoss(self):
+        self.server.truncate_at = 30000
+
+        self.downloader.download(self.url, self.dst).result()
+
+        self.__assert_downloaded()
+        self.assertEqual(self.server.requests, [None, "bytes=30000-"])
+
+    def test_download_restartsIfServerIgnoresRange(self):
+        self.server.truncate_at = 30000
+        self.server.accept_ranges = False
+
+        self.downloader.download(self.url, self.dst).result()
+
+        self.__assert_downloaded()
 
-        self.downloader.download(url, dst).result()
+    def test_download_raisesHttpErrorsWithoutRetryingOrKeepingFile(self):
+        with self.assertRaises(urllib2.HTTPError):
+            self.downloader.download(self.url + ".missing", self.dst).result()
 
-        self.assertTrue(os.path.exists(dst))
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertFalse(os.path.exists(self.dst))
 
-    def test_download_callsInfoCallback(self):
-        url = "url"
-        dst = self.data_path + os.sep + 'testing.txt'
-        self.read_sleep = 0.6
-        self.urlopen_mock.with_args(url).at_least().times(1)
-        flexmock(self).should_call("__infoCallbackMock") \
-            .with_args(object, 1000, float).at_least().times(1)
+    def test_download_raisesAfterRetries(self):
+        downloader = Downloader(retries=0)
+        self.server.truncate_at = 30000
 
-        self.downloader.download(url, dst, info_callback=self.__infoCallbackMock).result()
+        self.assertRaises(IOError, downloader.download(self.url, self.dst).result)
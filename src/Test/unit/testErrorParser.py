@@ -0,0 +1,96 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from libs.ErrorParser import ErrorParser, LineMarkersMap, format_compile_result, is_user_code_error
+
+CONVERTED_CODE = """#include <Arduino.h>
+void setup();
+void loop();
+#line 1 "main.ino"
+int a = 0;
+void setup() {
+}
+void loop() {
+}"""
+
+
+class TestErrorParser(unittest.TestCase):
+    def setUp(self):
+        self.parser = ErrorParser()
+
+    def test_feed_parsesErrorsWarningsAndNotes(self):
+        self.parser.feed("main.ino: In function 'void setup()':")
+        self.parser.feed("main.ino:3:5: warning: unused variable 'a' [-Wunused-variable]")
+        self.parser.feed("main.ino:9:14: error: 'b' was not declared in this scope")
+        self.parser.feed("main.ino:2:6: note: suggested alternative: 'a'")
+        self.parser.feed("scons: *** [.pioenvs/uno/src/tmp_ino_to.o] Error 1")
+
+        self.assertEqual(len(self.parser.warnings), 1)
+        self.assertEqual(self.parser.warnings[0]["line"], 3)
+        self.assertEqual(len(self.parser.errors), 1)
+        self.assertEqual(self.parser.errors[0]["error"], "'b' was not declared in this scope")
+        self.assertEqual(self.parser.errors[0]["notes"][0]["line"], 2)
+
+    def test_feed_parsesLinkerErrorsWithoutColumn(self):
+        diagnostic = self.parser.feed("/home/w2b/.pioenvs/uno/FrameworkArduino/main.cpp:37: undefined reference to `setup'")
+
+        self.assertEqual(diagnostic["line"], 37)
+        self.assertEqual(diagnostic["column"], 0)
+        self.assertEqual(diagnostic["severity"], "error")
+
+    def test_feed_keepsBoundedNumberOfDiagnostics(self):
+        for i in range(ErrorParser.MAX_DIAGNOSTICS * 3):
+            self.parser.feed("main.ino:{}:1: error: expected ';'".format(i + 1))
+
+        self.assertEqual(len(self.parser.errors), ErrorParser.MAX_DIAGNOSTICS)
+        self.assertEqual(self.parser.errors_count, ErrorParser.MAX_DIAGNOSTICS * 3)
+
+    def test_feed_remapsConvertedFileLinesToSketchLines(self):
+        src_dir = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(src_dir, "tmp_ino_to.cpp"), "w") as f:
+                f.write(CONVERTED_CODE)
+            parser = ErrorParser(project_src_dir=src_dir)
+
+            diagnostic = parser.feed(".pioenvs/uno/src/tmp_ino_to.cpp:6:1: error: expected ';'")
+        finally:
+            shutil.rmtree(src_dir)
+
+        self.assertEqual(diagnostic["file"], "main.ino")
+        self.assertEqual(diagnostic["line"], 2)
+
+    def test_lineMarkersMap_mapsPrototypesToFirstCodeLine(self):
+        line_markers_map = LineMarkersMap(CONVERTED_CODE.splitlines())
+
+        self.assertEqual(line_markers_map.map(2), ("main.ino", 1))
+        self.assertEqual(line_markers_map.map(8), ("main.ino", 4))
+
+    def test_isUserCodeError_onlyMatchesErrorsInSketchOrProjectSources(self):
+        self.assertTrue(is_user_code_error(self.parser.feed("main.ino:9:14: error: expected ';' before '}' token")))
+        self.assertTrue(is_user_code_error(self.parser.feed("src/a.cpp:3:1: fatal error: a.h: No such file")))
+        self.assertFalse(is_user_code_error(self.parser.feed(".pioenvs/uno/FrameworkArduino/main.cpp:3:1: error: a")))
+        self.assertFalse(is_user_code_error(self.parser.feed("main.ino:9:14: warning: unused variable 'a'")))
+
+    def test_isUserCodeError_matchesAbsoluteAndWindowsPaths(self):
+        project_src_dir = "/home/user/web2board/platformioWorkSpace/src"
+        user_errors = ["/home/user/web2board/platformioWorkSpace/src/main.ino:9:14: error: a",
+                       "C:\\Users\\user\\platformioWorkSpace\\src\\main.ino:9:14: error: a",
+                       "C:\\Users\\user\\platformioWorkSpace\\.pioenvs\\uno\\src\\tmp_ino_to.cpp:3:1: error: a",
+                       "/home/user/web2board/platformioWorkSpace/src/sketch/a.cpp:3:1: error: a"]
+        other_errors = ["/home/user/.platformio/lib/Servo/src/Servo.cpp:3:1: error: a",
+                        "C:\\Users\\user\\platformioWorkSpace\\.pioenvs\\uno\\Servo\\src\\Servo.cpp:3:1: error: a"]
+
+        for line in user_errors:
+            self.assertTrue(is_user_code_error(self.parser.feed(line), project_src_dir), line)
+        for line in other_errors:
+            self.assertFalse(is_user_code_error(self.parser.feed(line), project_src_dir), line)
+
+    def test_formatCompileResult_addsWarningsToFailedResults(self):
+        error_text = "main.ino:3:5: warning: unused variable 'a'\nmain.ino:9:14: error: expected ';'"
+
+        result = format_compile_result([False, dict(err=error_text)])
+
+        self.assertEqual(len(result[1]["err"]), 1)
+        self.assertEqual(len(result[1]["warnings"]), 1)
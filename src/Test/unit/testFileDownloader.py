@@ -0,0 +1,148 @@
+import hashlib
+import os
+import random
+import shutil
+import tempfile
+import unittest
+
+from flexmock import flexmock, flexmock_teardown
+
+from Test.testingUtils import QuietHTTPRequestHandler, LocalHTTPServer
+from platformio import util
+from platformio.downloader import FileDownloader
+from platformio.exception import FDSHASumMismatch, FDSizeMismatch, FDUnrecognizedStatusCode
+
+
+class _FileHandler(QuietHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        server = self.server
+        content = server.content
+        range_header = self.headers.get("Range")
+        server.requests.append(range_header)
+        if range_header and server.fail_ranges:
+            return self.__send_headers(500, 0)
+        start, end = 0, len(content)
+        if range_header and server.accept_ranges:
+            start, end = range_header.replace("bytes=", "").split("-")
+            start, end = int(start), int(end) + 1 if end else len(content)
+            self.__send_headers(206, end - start)
+        else:
+            self.__send_headers(200, len(content))
+        if server.truncate_at is not None and start < server.truncate_at < end and \
+                (range_header or not server.truncate_ranges_only):
+            end, server.truncate_at = server.truncate_at, None
+            self.close_connection = 1
+        self.wfile.write(content[start:end])
+
+    def __send_headers(self, code, length):
+        self.send_response(code)
+        self.send_header("Content-Length", str(length))
+        self.send_header("ETag", '"v1"')
+        self.send_header("Last-Modified", "Wed, 21 Oct 2015 07:28:00 GMT")
+        if self.server.accept_ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        self.end_headers()
+
+
+class TestFileDownloader(unittest.TestCase):
+    def setUp(self):
+        self.dest_dir = tempfile.mkdtemp()
+        self.server = LocalHTTPServer(_FileHandler, content="".join(chr(random.randint(0, 255)) for _ in range(100000)),
+                                      accept_ranges=True, fail_ranges=False, truncate_at=None,
+                                      truncate_ranges_only=False)
+        self.url = self.server.url + "/toolchain.tar.gz"
+        self.sha1 = hashlib.sha1(self.server.content).hexdigest()
+        flexmock(util).should_receive("is_ci").and_return(True)
+        flexmock(util).should_receive("exec_command").never()
+        flexmock(FileDownloader, MIN_CHUNK_SIZE=1024, PARALLEL_MIN_SIZE=50000, SEGMENT_SIZE=16000, RETRIES=1)
+
+    def tearDown(self):
+        self.server.stop()
+        flexmock_teardown()
+        shutil.rmtree(self.dest_dir)
+
+    def __download(self, sha1=None):
+        downloader = FileDownloader(self.url, self.dest_dir)
+        downloader.start()
+        downloader.verify(sha1 or self.sha1)
+        with open(downloader.get_filepath(), "rb") as f:
+            self.assertEqual(f.read(), self.server.content)
+        self.assertEqual(sorted(os.listdir(self.dest_dir)), ["toolchain.tar.gz"])
+        return downloader
+
+    def test_start_streamsSmallFilesInOneRequest(self):
+        flexmock(FileDownloader, PARALLEL_MIN_SIZE=200000)
+
+        downloader = self.__download()
+
+        self.assertEqual(self.server.requests, [None])
+        self.assertEqual(downloader.get_sha1(), self.sha1)
+
+    def test_start_downloadsBigFilesInParallelRangeSegments(self):
+        self.__download()
+
+        self.assertEqual(sorted(self.server.requests[1:]),
+                         sorted("bytes={}-{}".format(start, min(start + 16000, 100000) - 1)
+                                for start in range(0, 100000, 16000)))
+
+    def test_start_streamsBigFilesIfServerDoesNotAcceptRanges(self):
+        self.server.accept_ranges = False
+
+        self.__download()
+
+        self.assertEqual(self.server.requests, [None])
+
+    def test_start_resumesInterruptedStream(self):
+        flexmock(FileDownloader, PARALLEL_MIN_SIZE=200000)
+        self.server.truncate_at = 30000
+
+        self.__download()
+
+        self.assertEqual(self.server.requests, [None, "bytes=30000-"])
+
+    def test_start_resumesInterruptedSegment(self):
+        self.server.truncate_at = 20000
+        self.server.truncate_ranges_only = True
+
+        self.__download()
+
+        self.assertIn("bytes=20000-31999", self.server.requests)
+
+    def test_start_resumesPartialDownloadOfPreviousRun(self):
+        flexmock(FileDownloader, PARALLEL_MIN_SIZE=200000, RETRIES=0)
+        self.server.truncate_at = 30000
+        self.assertRaises(FDSizeMismatch, FileDownloader(self.url, self.dest_dir).start)
+        self.server.requests = []
+
+        self.__download()
+
+        self.assertEqual(self.server.requests, [None, "bytes=30000-"])
+
+    def test_start_restartsPartialDownloadOfChangedFile(self):
+        with open(os.path.join(self.dest_dir, "toolchain.tar.gz.part"), "wb") as f:
+            f.write("old content")
+        with open(os.path.join(self.dest_dir, "toolchain.tar.gz.part.json"), "w") as f:
+            f.write('{"etag": "\\"v0\\""}')
+
+        self.__download()
+
+    def test_start_raisesIfRangeIsNotServed(self):
+        self.server.fail_ranges = True
+
+        self.assertRaises(FDUnrecognizedStatusCode, FileDownloader(self.url, self.dest_dir).start)
+
+    def test_verify_raisesIfSha1DoesNotMatch(self):
+        downloader = FileDownloader(self.url, self.dest_dir)
+        downloader.start()
+
+        self.assertRaises(FDSHASumMismatch, downloader.verify, "0" * 40)
+
+    def test_start_feedsBytesInOrder(self):
+        chunks = []
+        downloader = FileDownloader(self.url, self.dest_dir)
+
+        downloader.start(on_data=chunks.append)
+
+        self.assertEqual("".join(chunks), self.server.content)
@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from flexmock import flexmock, flexmock_teardown
+
+from libs import ImplicitDependencies
+
+
+class TestImplicitDependencies(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.project_lib_dir = os.path.join(self.test_dir, "lib")
+        self.user_lib_dir = os.path.join(self.test_dir, "userLibs")
+        self.__write(os.path.join(self.user_lib_dir, "Servo", "Servo.h"))
+
+    def tearDown(self):
+        flexmock_teardown()
+        shutil.rmtree(self.test_dir)
+
+    @staticmethod
+    def __write(path, content=""):
+        if not os.path.isdir(os.path.dirname(path)):
+            os.makedirs(os.path.dirname(path))
+        with open(path, "w") as f:
+            f.write(content)
+
+    def __get_key(self):
+        return ImplicitDependencies.get_include_dirs_key([self.project_lib_dir, self.user_lib_dir])
+
+    def test_getIncludeDirsKey_isStableIfFilesAreOnlyEdited(self):
+        key = self.__get_key()
+
+        self.__write(os.path.join(self.user_lib_dir, "Servo", "Servo.h"), "#define SERVO")
+
+        self.assertEqual(self.__get_key(), key)
+
+    def test_getIncludeDirsKey_changesIfNewHeaderShadowsPreviousOne(self):
+        key = self.__get_key()
+
+        self.__write(os.path.join(self.project_lib_dir, "Servo", "Servo.h"))
+
+        self.assertNotEqual(self.__get_key(), key)
+
+    def test_getIncludeDirsKey_changesIfHeaderIsRemoved(self):
+        key = self.__get_key()
+
+        os.remove(os.path.join(self.user_lib_dir, "Servo", "Servo.h"))
+
+        self.assertNotEqual(self.__get_key(), key)
+
+    def test_getIncludeDirsKey_changesIfHeaderIsAddedToLibrarySrcDir(self):
+        src_dir = os.path.join(self.user_lib_dir, "Servo", "src")
+        os.makedirs(src_dir)
+        key = self.__get_key()
+
+        self.__write(os.path.join(src_dir, "ServoTimers.h"))
+
+        self.assertNotEqual(self.__get_key(), key)
+
+    def __create_dependency(self, path):
+        dependency = flexmock(changed_timestamp_then_content=lambda target, prev_ni: "checked")
+        dependency.should_receive("srcnode").and_return(flexmock(get_abspath=lambda: path))
+        return dependency
+
+    def test_getDecider_doesNotCheckBuiltDependenciesInImmutableDirs(self):
+        decider = ImplicitDependencies.get_decider([os.path.join(self.test_dir, "packages")])
+        header_path = os.path.join(self.test_dir, "packages", "framework", "Arduino.h")
+
+        self.assertFalse(decider(self.__create_dependency(header_path), None, object()))
+        self.assertEqual(decider(self.__create_dependency(header_path), None, None), "checked")
+
+    def test_getDecider_checksDependenciesOutOfImmutableDirs(self):
+        decider = ImplicitDependencies.get_decider([os.path.join(self.test_dir, "packages")])
+        header_path = os.path.join(self.test_dir, "packages-old", "Arduino.h")
+
+        self.assertEqual(decider(self.__create_dependency(header_path), None, object()), "checked")
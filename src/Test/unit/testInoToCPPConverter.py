@@ -0,0 +1,118 @@
+import unittest
+
+from platformio.builder.tools.piomisc import InoToCPPConverter
+
+
+class _Node(object):
+    def __init__(self, path, contents):
+        self.path = path
+        self.contents = contents
+
+    def get_path(self):
+        return self.path
+
+    def get_text_contents(self):
+        return self.contents
+
+
+class TestInoToCPPConverter(unittest.TestCase):
+    def __convert(self, *sketches):
+        return InoToCPPConverter([_Node("/project/src/" + name, contents) for name, contents in sketches]).convert()
+
+    def test_convert_addsPrototypesBeforeTheFirstCodeLine(self):
+        sketch = ("#include <Servo.h>\n"
+                  "\n"
+                  "int pin = 3;\n"
+                  "void setup() {\n"
+                  "  blink(pin);\n"
+                  "}\n"
+                  "void loop() {}\n"
+                  "void blink(int times) {\n"
+                  "}\n")
+
+        self.assertEqual(self.__convert(("main.ino", sketch)),
+                         "#include <Arduino.h>\n"
+                         "#include <Servo.h>\n"
+                         "\n"
+                         "void setup();\n"
+                         "void loop();\n"
+                         "void blink(int times);\n"
+                         '#line 3 "main.ino"\n'
+                         "int pin = 3;\n"
+                         "void setup() {\n"
+                         "blink(pin);\n"
+                         "}\n"
+                         "void loop() {}\n"
+                         "void blink(int times) {\n"
+                         "}")
+
+    def test_convert_doesNotAddEmptyLineIfCodeStartsInFirstLine(self):
+        self.assertEqual(self.__convert(("main.ino", "void setup() {}\nvoid loop() {}\n")),
+                         "#include <Arduino.h>\n"
+                         "void setup();\n"
+                         "void loop();\n"
+                         '#line 1 "main.ino"\n'
+                         "void setup() {}\n"
+                         "void loop() {}")
+
+    def test_convert_stripsCommentsKeepingLineNumbers(self):
+        sketch = ("/* Blink\n"
+                  "   void commented(int a) {} */\n"
+                  "// void alsoCommented() {}\n"
+                  "void setup() { /* pin */ }\n"
+                  "void loop() {}  // forever\n")
+
+        self.assertEqual(self.__convert(("main.ino", sketch)),
+                         "#include <Arduino.h>\n"
+                         "\n"
+                         "\n"
+                         "\n"
+                         "void setup();\n"
+                         "void loop();\n"
+                         '#line 4 "main.ino"\n'
+                         "void setup() {   }\n"
+                         "void loop() {}  // forever")
+
+    def test_convert_addsPrototypesOfMethodsInsideClasses(self):
+        sketch = ("class Led {\n"
+                  "public:\n"
+                  "  void on(int pin) {\n"
+                  "    if (pin) {\n"
+                  "    }\n"
+                  "  }\n"
+                  "};\n"
+                  "void setup() {}\n"
+                  "void loop() {}\n")
+
+        self.assertEqual(self.__convert(("main.ino", sketch)).split("\n")[:5],
+                         ["#include <Arduino.h>",
+                          "void on(int pin);",
+                          "void setup();",
+                          "void loop();",
+                          '#line 1 "main.ino"'])
+
+    def test_convert_ignoresStatementsAndStringsInsideFunctions(self):
+        sketch = ('void setup() {\n'
+                  '  Serial.println("void fake(int a) {");\n'
+                  '  int value = read(3);\n'
+                  '  while (value) {}\n'
+                  '}\n'
+                  'void loop() {}\n')
+
+        self.assertEqual(self.__convert(("main.ino", sketch)).split("\n")[1:3], ["void setup();", "void loop();"])
+
+    def test_convert_putsMainSketchFirstAndPrototypesOfAllSketches(self):
+        self.assertEqual(self.__convert(("a_utils.ino", "int twice(int a) {\n  return a * 2;\n}\n"),
+                                        ("main.ino", "void setup() {}\nvoid loop() {}\n")),
+                         "#include <Arduino.h>\n"
+                         "int twice(int a);\n"
+                         "void setup();\n"
+                         "void loop();\n"
+                         '#line 1 "main.ino"\n'
+                         "void setup() {}\n"
+                         "void loop() {}\n"
+                         '#line 1 "a_utils.ino"\n'
+                         "int twice(int a) {\n  return a * 2;\n}\n")
+
+    def test_convert_returnsNoneWithoutSketches(self):
+        self.assertIsNone(self.__convert())
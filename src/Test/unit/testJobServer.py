@@ -0,0 +1,78 @@
+import threading
+import time
+import unittest
+
+from libs.JobServer import JobServer, JobTokenClient, JOB_SERVER_ENV_VAR
+
+
+class TestJobServer(unittest.TestCase):
+    def setUp(self):
+        self.server = JobServer(tokens=1)
+
+    def __acquire_in_thread(self, name, acquired):
+        def acquire():
+            self.server.acquire()
+            acquired.append(name)
+
+        thread = threading.Thread(target=acquire)
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def __wait_for(self, condition, timeout=5):
+        end = time.time() + timeout
+        while not condition() and time.time() < end:
+            time.sleep(0.01)
+        self.assertTrue(condition())
+
+    def test_acquire_limitsTokens(self):
+        self.assertTrue(self.server.acquire(timeout=0.1))
+        self.assertFalse(self.server.acquire(timeout=0.1))
+
+        self.server.release()
+
+        self.assertTrue(self.server.acquire(timeout=0.1))
+
+    def test_release_givesTokenToFirstWaiter(self):
+        acquired = []
+        self.server.acquire()
+        self.__acquire_in_thread("first", acquired)
+        self.__wait_for(lambda: self.server.get_stats()["waiting"] == 1)
+        self.__acquire_in_thread("second", acquired)
+        self.__wait_for(lambda: self.server.get_stats()["waiting"] == 2)
+
+        self.server.release()
+        self.__wait_for(lambda: len(acquired) == 1)
+        self.server.release()
+        self.__wait_for(lambda: len(acquired) == 2)
+
+        self.assertEqual(acquired, ["first", "second"])
+
+    def test_release_skipsTimedOutWaiters(self):
+        self.server.acquire()
+        self.assertFalse(self.server.acquire(timeout=0.05))
+
+        self.server.release()
+
+        self.assertEqual(self.server.get_stats(), dict(tokens=1, available=1, waiting=0))
+
+    def test_client_releasesTokenWhenConnectionCloses(self):
+        self.server.start()
+        client = JobTokenClient.from_environment({JOB_SERVER_ENV_VAR: self.server.get_environment_value()})
+
+        with client.token():
+            self.__wait_for(lambda: self.server.get_stats()["available"] == 0)
+            self.assertFalse(self.server.acquire(timeout=0.05))
+
+        self.__wait_for(lambda: self.server.get_stats()["available"] == 1)
+
+    def test_client_runsWithoutTokenIfServerIsNotReachable(self):
+        client = JobTokenClient(("127.0.0.1", 1))
+        executed = []
+
+        client.wrap_spawn(lambda *args: executed.append(args))("sh", "echo")
+
+        self.assertEqual(executed, [("sh", "echo")])
+
+    def test_fromEnvironment_returnsNoneWithoutJobServer(self):
+        self.assertIsNone(JobTokenClient.from_environment({}))
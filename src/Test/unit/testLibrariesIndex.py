@@ -0,0 +1,82 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from flexmock import flexmock, flexmock_teardown
+
+from libs.LibrariesIndex import LibrariesIndex
+
+
+class TestLibrariesIndex(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.lib_dir = os.path.join(self.test_dir, "lib")
+        self.index_path = os.path.join(self.test_dir, ".pioenvs", ".libraries_index")
+        self.__add_file("Servo/Servo.h")
+        self.__add_file("Servo/src/Servo.h")
+        self.__add_file("BitbloqServo/src/Servo.h")
+        self.__add_file("BitbloqServo/src/BitbloqServo.h")
+        self.index = LibrariesIndex(self.index_path)
+
+    def tearDown(self):
+        flexmock_teardown()
+        shutil.rmtree(self.test_dir)
+
+    def __add_file(self, path):
+        file_path = os.path.join(self.lib_dir, *path.split("/"))
+        if not os.path.isdir(os.path.dirname(file_path)):
+            os.makedirs(os.path.dirname(file_path))
+        with open(file_path, "w") as f:
+            f.write("")
+
+    def __path(self, path):
+        return os.path.join(self.lib_dir, *path.split("/"))
+
+    def test_findHeader_returnsSortedLibrariesFirstAndRootBeforeSrc(self):
+        self.assertEqual(self.index.find_header(self.lib_dir, "Servo.h"),
+                         ("BitbloqServo", self.__path("BitbloqServo/src"), self.__path("BitbloqServo/src/Servo.h")))
+        self.assertEqual(self.index.find_header(self.lib_dir, "Servo.h", lib_ignore=["BitbloqServo"]),
+                         ("Servo", self.__path("Servo"), self.__path("Servo/Servo.h")))
+
+    def test_findHeader_returnsLibrariesOfLibUseFirst(self):
+        found = self.index.find_header(self.lib_dir, "Servo.h", lib_use=["Servo"])
+
+        self.assertEqual(found[0], "Servo")
+
+    def test_findHeader_returnsNoneIfHeaderIsNotFound(self):
+        self.assertIsNone(self.index.find_header(self.lib_dir, "Missing.h"))
+
+    def test_findHeader_ignoresCaseInCaseInsensitiveFileSystems(self):
+        flexmock(LibrariesIndex, CASE_INSENSITIVE=True)
+
+        found = self.index.find_header(self.lib_dir, "bitbloqservo.h")
+
+        self.assertEqual(found[2], self.__path("BitbloqServo/src/BitbloqServo.h"))
+
+    def test_findHeader_respectsCaseInCaseSensitiveFileSystems(self):
+        flexmock(LibrariesIndex, CASE_INSENSITIVE=False)
+
+        self.assertIsNone(self.index.find_header(self.lib_dir, "bitbloqservo.h"))
+
+    def test_getDirIndex_isRebuiltIfLibrariesChange(self):
+        self.index.find_header(self.lib_dir, "Servo.h")
+        time.sleep(0.01)
+
+        self.__add_file("Zowi/Zowi.h")
+        self.__add_file("Servo/src/ServoTimers.h")
+
+        self.assertEqual(self.index.find_header(self.lib_dir, "Zowi.h")[0], "Zowi")
+        self.assertEqual(self.index.find_header(self.lib_dir, "ServoTimers.h")[0], "Servo")
+
+    def test_save_persistsIndexForNextBuilds(self):
+        self.index.find_header(self.lib_dir, "Servo.h")
+        self.index.get_includes('#include <Servo.h>\n#include "BitbloqServo.h"\n')
+        self.index.save()
+        flexmock(LibrariesIndex).should_receive("_build_dir_index").never()
+
+        index = LibrariesIndex(self.index_path)
+
+        self.assertEqual(index.find_header(self.lib_dir, "Servo.h")[0], "BitbloqServo")
+        self.assertEqual(index.includes.values(), [[("<", "Servo.h"), ('"', "BitbloqServo.h")]])
@@ -0,0 +1,136 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from flexmock import flexmock, flexmock_teardown
+
+from libs.ContentManifest import ContentManifest, get_blob_hash
+from libs.LibraryStore import LibraryStore, LibraryStoreError
+
+FILES = {"BitbloqLed/BitbloqLed.h": "led", "BitbloqLed/BitbloqLed.cpp": "led.cpp"}
+
+
+class TestLibraryStore(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.store = LibraryStore(os.path.join(self.test_dir, "store"))
+
+    def tearDown(self):
+        flexmock_teardown()
+        shutil.rmtree(self.test_dir)
+
+    def __add_version(self, version, files):
+        manifest = ContentManifest()
+        for path, content in files.items():
+            file_path = os.path.join(self.test_dir, "new_file")
+            with open(file_path, "w") as f:
+                f.write(content)
+            manifest.files[path] = get_blob_hash(file_path)
+            self.store.add_object(file_path, manifest.files[path])
+        self.store.add_version(version, manifest)
+        return manifest
+
+    def __read(self, version, path):
+        with open(os.path.join(self.store.get_version_path(version), *path.split("/"))) as f:
+            return f.read()
+
+    def test_addVersion_createsTreeOfTheVersion(self):
+        self.__add_version("0.1.0", FILES)
+
+        self.assertTrue(self.store.has_version("0.1.0"))
+        self.assertEqual(self.__read("0.1.0", "BitbloqLed/BitbloqLed.h"), "led")
+        self.assertEqual(self.store.get_manifest("0.1.0").files, ContentManifest.from_directory(
+            self.store.get_version_path("0.1.0")).files)
+
+    @unittest.skipUnless(hasattr(os, "link"), "hard links are not available")
+    def test_addVersion_linksFilesSharedByVersions(self):
+        self.__add_version("0.1.0", FILES)
+        self.__add_version("0.2.0", dict(FILES, **{"BitbloqLed/BitbloqLed.h": "led 2"}))
+
+        cpp_paths = [os.path.join(self.store.get_version_path(v), "BitbloqLed", "BitbloqLed.cpp")
+                     for v in ("0.1.0", "0.2.0")]
+        self.assertTrue(os.path.samefile(*cpp_paths))
+        self.assertEqual(self.__read("0.1.0", "BitbloqLed/BitbloqLed.h"), "led")
+        self.assertEqual(self.__read("0.2.0", "BitbloqLed/BitbloqLed.h"), "led 2")
+
+    def test_addVersion_copiesFilesIfTheyCanNotBeLinked(self):
+        flexmock(os).should_receive("link").and_raise(OSError)
+
+        self.__add_version("0.1.0", FILES)
+
+        self.assertEqual(self.__read("0.1.0", "BitbloqLed/BitbloqLed.cpp"), "led.cpp")
+
+    def test_addVersion_raisesIfObjectsAreMissing(self):
+        manifest = ContentManifest({"BitbloqLed/BitbloqLed.h": "0" * 40})
+
+        self.assertRaises(LibraryStoreError, self.store.add_version, "0.1.0", manifest)
+
+        self.assertFalse(self.store.has_version("0.1.0"))
+
+    def test_getMissingFiles_returnsFilesWithoutStoredContent(self):
+        manifest = self.__add_version("0.1.0", FILES)
+        manifest.files["BitbloqZowi/BitbloqZowi.h"] = "1" * 40
+
+        self.assertEqual(self.store.get_missing_files(manifest), ["BitbloqZowi/BitbloqZowi.h"])
+
+    def test_setActiveVersion_changesOnlyThePointer(self):
+        self.__add_version("0.1.0", FILES)
+        self.__add_version("0.2.0", FILES)
+
+        self.store.set_active_version("0.1.0")
+        self.store.set_active_version("0.2.0")
+
+        self.assertEqual(self.store.get_active_version(), "0.2.0")
+        self.assertEqual(self.store.get_active_path(), self.store.get_version_path("0.2.0"))
+        self.assertEqual(self.store.get_versions(), ["0.1.0", "0.2.0"])
+
+    def test_setActiveVersion_raisesIfVersionIsNotStored(self):
+        self.assertRaises(LibraryStoreError, self.store.set_active_version, "0.1.0")
+
+        self.assertIsNone(self.store.get_active_version())
+        self.assertIsNone(self.store.get_active_path())
+
+    def test_prune_keepsActiveAndLastAddedVersions(self):
+        for version in ("0.1.0", "0.2.0", "0.3.0"):
+            self.__add_version(version, dict(FILES, **{"BitbloqLed/BitbloqLed.h": "led " + version}))
+            os.utime(self.store.get_manifest_path(version), (0, {"0.1.0": 100, "0.2.0": 300, "0.3.0": 200}[version]))
+        self.store.set_active_version("0.1.0")
+
+        self.store.prune(keep=2)
+
+        self.assertEqual(self.store.get_versions(), ["0.1.0", "0.2.0"])
+        self.assertFalse(os.path.exists(self.store.get_version_path("0.3.0")))
+        self.assertEqual(self.store.get_missing_files(self.store.get_manifest("0.1.0")), [])
+        self.assertEqual(sum(len(files) for _, _, files in os.walk(os.path.join(self.store.root, "objects"))), 3)
+
+    def test_prune_removesBuildDirsOfRemovedVersions(self):
+        for version in ("0.1.0", "0.2.0"):
+            self.__add_version(version, FILES)
+            os.utime(self.store.get_manifest_path(version), (0, {"0.1.0": 100, "0.2.0": 200}[version]))
+            os.makedirs(os.path.join(self.test_dir, ".pioenvs", "uno", "libversions", version, "BitbloqLed"))
+        self.store.set_active_version("0.2.0")
+
+        self.store.prune(keep=1, builds_dir=os.path.join(self.test_dir, ".pioenvs"))
+
+        self.assertEqual(os.listdir(os.path.join(self.test_dir, ".pioenvs", "uno", "libversions")), ["0.2.0"])
+
+    def __write_lib_file(self, path, content):
+        file_path = os.path.join(self.test_dir, "lib", *path.split("/"))
+        if not os.path.isdir(os.path.dirname(file_path)):
+            os.makedirs(os.path.dirname(file_path))
+        with open(file_path, "w") as f:
+            f.write(content)
+
+    def test_migrateLegacyLibraries_movesOnlyUnchangedCopiesOfStoredLibraries(self):
+        self.__add_version("0.1.0", dict(FILES, **{"BitbloqZowi/BitbloqZowi.h": "zowi"}))
+        for path, content in FILES.items():
+            self.__write_lib_file(path, content)
+        self.__write_lib_file("BitbloqZowi/BitbloqZowi.h", "edited zowi")
+        self.__write_lib_file("MyLibrary/MyLibrary.h", "mine")
+        lib_dir = os.path.join(self.test_dir, "lib")
+
+        self.assertEqual(self.store.migrate_legacy_libraries(lib_dir), ["BitbloqLed"])
+
+        self.assertEqual(sorted(os.listdir(lib_dir)), ["BitbloqZowi", "MyLibrary"])
+        self.assertTrue(os.path.isfile(os.path.join(self.store.root, "legacy", "BitbloqLed", "BitbloqLed.h")))
@@ -0,0 +1,156 @@
+# coding=utf-8
+import logging
+import os
+import unittest
+from Queue import Full
+
+from flexmock import flexmock, flexmock_teardown
+
+from libs import LoggingUtils, utils
+from libs.LoggingUtils import AsyncLoggingHandler
+
+
+class SinkMock(logging.Handler):
+    def __init__(self, level=logging.NOTSET):
+        logging.Handler.__init__(self, level)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestAsyncLoggingHandler(unittest.TestCase):
+    def setUp(self):
+        self.sink = SinkMock()
+        self.handler = AsyncLoggingHandler([self.sink])
+        self.log = logging.getLogger("testAsyncLoggingHandler")
+        self.log.propagate = False
+        self.log.setLevel(logging.DEBUG)
+        self.log.addHandler(self.handler)
+
+    def tearDown(self):
+        self.log.removeHandler(self.handler)
+        flexmock_teardown()
+
+    def test_emit_dispatchesRecordToSinks(self):
+        self.log.info("message %s", "arg")
+        self.handler.flush()
+
+        self.assertEqual(len(self.sink.records), 1)
+        self.assertEqual(self.sink.records[0].msg, u"message arg")
+
+    def test_emit_decodesNonAsciiMessagesOnlyOnce(self):
+        self.log.info("ñ %s", u"á")
+        self.handler.flush()
+
+        record = self.sink.records[0]
+        self.assertIsInstance(record.msg, unicode)
+        self.assertIsNone(record.args)
+
+    def test_emit_filtersRecordsBySinkLevel(self):
+        self.sink.setLevel(logging.WARNING)
+
+        self.log.debug("debug")
+        self.log.warning("warning")
+        self.handler.flush()
+
+        self.assertEqual([r.msg for r in self.sink.records], [u"warning"])
+
+    def test_emit_countsDroppedRecordsIfQueueIsFull(self):
+        flexmock(self.handler.queue).should_receive("put_nowait").and_raise(Full)
+
+        self.log.info("dropped")
+        self.log.info("dropped")
+
+        self.assertEqual(self.handler.dropped_records, 2)
+
+    def test_emit_rendersMessageWhenLogged(self):
+        values = ["logged"]
+        self.log.info("values: %s", values)
+        values.append("changed later")
+        self.handler.flush()
+
+        self.assertEqual(self.sink.records[0].msg, u"values: ['logged']")
+
+    def test_emit_rendersTracebackWhenLogged(self):
+        try:
+            raise ValueError("error")
+        except ValueError:
+            self.log.exception("failed")
+        self.handler.flush()
+
+        record = self.sink.records[0]
+        self.assertIsNone(record.exc_info)
+        self.assertIn("ValueError: error", record.exc_text)
+
+
+class TestMoveRootHandlersToAsyncHandler(unittest.TestCase):
+    def setUp(self):
+        self.root = logging.getLogger()
+        self.original_handlers = list(self.root.handlers)
+        self.original_async_handler = LoggingUtils._async_handler
+        self.sink = SinkMock()
+        self.root.handlers = [self.sink]
+        flexmock(LoggingUtils.atexit).should_receive("register")
+
+    def tearDown(self):
+        if LoggingUtils._async_handler is not self.original_async_handler:
+            LoggingUtils._async_handler.close()
+        LoggingUtils._async_handler = self.original_async_handler
+        self.root.handlers = self.original_handlers
+        flexmock_teardown()
+
+    def test_move_isIdempotent(self):
+        LoggingUtils._move_root_handlers_to_async_handler()
+        first_handler = LoggingUtils._async_handler
+
+        LoggingUtils._move_root_handlers_to_async_handler()
+
+        self.assertEqual(self.root.handlers, [LoggingUtils._async_handler])
+        self.assertEqual(LoggingUtils._async_handler.sinks, [self.sink])
+        self.assertFalse(first_handler.is_dispatching())
+
+    def test_move_dispatchesRecordsOfReplacedHandler(self):
+        LoggingUtils._move_root_handlers_to_async_handler()
+        LoggingUtils._async_handler.handle(logging.makeLogRecord(dict(msg="queued", levelno=logging.INFO)))
+
+        LoggingUtils._move_root_handlers_to_async_handler()
+
+        self.assertEqual([r.msg for r in self.sink.records], [u"queued"])
+
+    def test_move_closesSinksNoLongerUsed(self):
+        LoggingUtils._move_root_handlers_to_async_handler()
+        new_sink = SinkMock()
+        self.root.handlers = [new_sink]
+        flexmock(self.sink).should_receive("close").once()
+        flexmock(new_sink).should_receive("close").never()
+
+        LoggingUtils._move_root_handlers_to_async_handler()
+
+        self.assertEqual(LoggingUtils._async_handler.sinks, [new_sink])
+
+    def test_move_registersFlushAtExitOnce(self):
+        LoggingUtils._async_handler = None
+        flexmock(LoggingUtils.atexit).should_receive("register").once()
+
+        LoggingUtils._move_root_handlers_to_async_handler()
+        LoggingUtils._move_root_handlers_to_async_handler()
+
+
+class TestSetLogLevel(unittest.TestCase):
+    def setUp(self):
+        self.root = logging.getLogger()
+        self.original_handlers = list(self.root.handlers)
+        self.file_handler = logging.FileHandler(os.devnull, delay=True)
+        self.console_handler = logging.StreamHandler()
+        self.handler = AsyncLoggingHandler([self.file_handler, self.console_handler])
+        self.root.handlers = [self.handler]
+
+    def tearDown(self):
+        self.root.handlers = self.original_handlers
+
+    def test_setLogLevel_changesConsoleSinkWhateverItsPosition(self):
+        utils.set_log_level("error")
+
+        self.assertEqual(self.console_handler.level, logging.ERROR)
+        self.assertEqual(self.file_handler.level, logging.NOTSET)
@@ -0,0 +1,49 @@
+import unittest
+
+from libs.Metrics import Histogram, Metrics
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        Metrics.reset()
+
+    def tearDown(self):
+        Metrics.reset()
+
+    def test_inc_accumulatesCountersByLabels(self):
+        Metrics.inc("hub_calls_total", hub="CodeHub", function="compile")
+        Metrics.inc("hub_calls_total", hub="CodeHub", function="compile")
+        Metrics.inc("hub_calls_total", hub="CodeHub", function="upload")
+
+        self.assertEqual(Metrics.get_counter("hub_calls_total", function="compile", hub="CodeHub"), 2)
+        self.assertEqual(Metrics.get_counter("hub_calls_total", function="upload", hub="CodeHub"), 1)
+
+    def test_histogram_storesCumulativeBuckets(self):
+        histogram = Histogram(buckets=(1, 10))
+        histogram.observe(0.5)
+        histogram.observe(5)
+        histogram.observe(50)
+
+        data = histogram.get_dictionary()
+
+        self.assertEqual(data["buckets"], [(1, 1), (10, 2), ("+Inf", 3)])
+        self.assertEqual(data["count"], 3)
+        self.assertEqual(data["sum"], 55.5)
+
+    def test_getCacheHitRatios_returnsRatioPerCache(self):
+        Metrics.inc("cache_requests_total", 3, cache="boards", result="hit")
+        Metrics.inc("cache_requests_total", 1, cache="boards", result="miss")
+
+        self.assertEqual(Metrics.get_cache_hit_ratios(), dict(boards=0.75))
+
+    def test_toPrometheus_formatsCountersAndHistograms(self):
+        Metrics.inc("hub_calls_total", hub="Code\"Hub")
+        Metrics.observe("hub_call_seconds", 0.002, hub="CodeHub")
+
+        text = Metrics.to_prometheus()
+
+        self.assertIn('# TYPE web2board_hub_calls_total counter', text)
+        self.assertIn('web2board_hub_calls_total{hub="Code\\"Hub"} 1', text)
+        self.assertIn('# TYPE web2board_hub_call_seconds histogram', text)
+        self.assertIn('web2board_hub_call_seconds_bucket{hub="CodeHub",le="0.005"} 1', text)
+        self.assertIn('web2board_hub_call_seconds_count{hub="CodeHub"} 1', text)
@@ -0,0 +1,71 @@
+import json
+import os
+import shutil
+import tempfile
+import time
+import unittest
+
+from flexmock import flexmock, flexmock_teardown
+
+from platformio import util
+from platformio.platforms.base import PlatformFactory
+
+
+class TestPlatformFactory(unittest.TestCase):
+    def setUp(self):
+        self.platforms_dir = tempfile.mkdtemp()
+        self.home_dir = tempfile.mkdtemp()
+        flexmock(util).should_receive("get_home_dir").and_return(self.home_dir)
+        self.__write_module("base.py", "class BasePlatform(object):\n    pass\n")
+        self.__write_module("atmelavr.py", "raise Exception('platform modules are not imported')\n"
+                                           "class AtmelavrPlatform(BasePlatform):\n    pass\n")
+        self.__write_module("helpers.py", "def helper():\n    pass\n")
+
+    def tearDown(self):
+        flexmock_teardown()
+        shutil.rmtree(self.platforms_dir)
+        shutil.rmtree(self.home_dir)
+
+    def __write_module(self, file_name, source):
+        with open(os.path.join(self.platforms_dir, file_name), "w") as f:
+            f.write(source)
+
+    def __create_packaged_manifest(self):
+        return PlatformFactory.create_manifest(self.platforms_dir,
+                                               os.path.join(self.platforms_dir, PlatformFactory.MANIFEST_NAME))
+
+    def test_createManifest_findsPlatformsWithoutImportingThem(self):
+        manifest = self.__create_packaged_manifest()
+
+        self.assertEqual(manifest["platforms"], {"atmelavr": {"file": "atmelavr.py", "class": "AtmelavrPlatform"}})
+        with open(os.path.join(self.platforms_dir, PlatformFactory.MANIFEST_NAME)) as f:
+            self.assertEqual(json.load(f), manifest)
+
+    def test_loadManifest_usesManifestWhileModulesDoNotChange(self):
+        manifest = self.__create_packaged_manifest()
+        manifest["platforms"]["fake"] = {"file": "fake.py", "class": "FakePlatform"}
+        with open(os.path.join(self.platforms_dir, PlatformFactory.MANIFEST_NAME), "w") as f:
+            json.dump(manifest, f)
+
+        self.assertIn("fake", PlatformFactory.load_manifest(self.platforms_dir)["platforms"])
+
+    def test_loadManifest_regeneratesManifestIfModulesChanged(self):
+        self.__create_packaged_manifest()
+        self.__write_module("teensy.py", "class TeensyPlatform(BasePlatform):\n    pass\n")
+        os.utime(os.path.join(self.platforms_dir, "teensy.py"), (time.time() + 10, time.time() + 10))
+
+        self.assertEqual(sorted(PlatformFactory.load_manifest(self.platforms_dir)["platforms"]),
+                         ["atmelavr", "teensy"])
+
+    def test_loadManifest_writesRegeneratedManifestInHomeDir(self):
+        manifest = PlatformFactory.load_manifest(self.platforms_dir)
+
+        self.assertEqual(sorted(os.listdir(self.platforms_dir)), ["atmelavr.py", "base.py", "helpers.py"])
+        with open(PlatformFactory.get_manifest_cache_path(self.platforms_dir)) as f:
+            self.assertEqual(json.load(f), manifest)
+        self.assertTrue(PlatformFactory.get_manifest_cache_path(self.platforms_dir).startswith(self.home_dir))
+
+    def test_newPlatform_createsPlatformOfManifest(self):
+        platform = PlatformFactory.newPlatform("atmelavr")
+
+        self.assertEqual(platform.__class__.__name__, "AtmelavrPlatform")
@@ -0,0 +1,63 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from libs import PrecompiledHeader
+
+COMMAND_LINE = "avr-g++ -fno-exceptions -Os -mmcu=atmega328p -DF_CPU=16000000L -DARDUINO=10607"
+PACKAGES_VERSIONS = {"framework-arduinoavr": 19, "toolchain-atmelavr": 2}
+
+
+class TestPrecompiledHeader(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.header_path = os.path.join(self.test_dir, "Arduino.h")
+        self.__write_header("#define ARDUINO_H\n")
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir)
+
+    def __write_header(self, content):
+        with open(self.header_path, "w") as f:
+            f.write(content)
+
+    def __get_key(self, command_line=COMMAND_LINE, packages_versions=PACKAGES_VERSIONS):
+        return PrecompiledHeader.get_key(command_line, self.header_path, packages_versions)
+
+    def test_getKey_isStableForSameInputs(self):
+        self.assertEqual(self.__get_key(), self.__get_key(packages_versions=dict(PACKAGES_VERSIONS)))
+        self.assertEqual(len(self.__get_key()), 10)
+
+    def test_getKey_changesWithFlags(self):
+        self.assertNotEqual(self.__get_key(), self.__get_key(COMMAND_LINE.replace("-Os", "-O2")))
+        self.assertNotEqual(self.__get_key(), self.__get_key(COMMAND_LINE + " -DNEW_DEFINE"))
+
+    def test_getKey_changesWithHeaderContent(self):
+        key = self.__get_key()
+
+        self.__write_header("#define ARDUINO_H\n#include <new_header.h>\n")
+
+        self.assertNotEqual(self.__get_key(), key)
+
+    def test_getKey_changesWhenPackagesAreUpdated(self):
+        updated_versions = dict(PACKAGES_VERSIONS, **{"framework-arduinoavr": 20})
+
+        self.assertNotEqual(self.__get_key(), self.__get_key(packages_versions=updated_versions))
+
+    def test_getKey_worksIfHeaderDoesNotExist(self):
+        os.remove(self.header_path)
+
+        self.assertEqual(len(self.__get_key()), 10)
+
+    def test_removeStaleDirs_keepsOnlyCurrentKey(self):
+        pch_root = os.path.join(self.test_dir, "pch")
+        for key in ("current", "old"):
+            os.makedirs(os.path.join(pch_root, key))
+
+        PrecompiledHeader.remove_stale_dirs(pch_root, "current")
+
+        self.assertEqual(os.listdir(pch_root), ["current"])
+
+    def test_removeStaleDirs_worksWithoutPchDir(self):
+        PrecompiledHeader.remove_stale_dirs(os.path.join(self.test_dir, "pch"), "current")
@@ -0,0 +1,92 @@
+import gzip
+import shutil
+import sys
+import tempfile
+import time
+import unittest
+
+from libs import utils
+from libs.ProcessRunner import ProcessRunner, RingBuffer
+
+
+def _python(code):
+    return [sys.executable, "-c", code]
+
+
+class TestProcessRunner(unittest.TestCase):
+    def setUp(self):
+        self.spill_dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.spill_dir)
+
+    def test_run_deliversLinesOfBothStreams(self):
+        out_lines, err_lines = [], []
+        code = "import sys\nfor i in range(3):\n    print 'out', i\n    sys.stderr.write('err %d\\r\\n' % i)\n" \
+               "sys.stdout.write('last')"
+
+        result = ProcessRunner(_python(code), on_out=out_lines.append, on_err=err_lines.append).run()
+
+        self.assertEqual(out_lines, ["out 0", "out 1", "out 2", "last"])
+        self.assertEqual(err_lines, ["err 0", "err 1", "err 2"])
+        self.assertEqual(result["out"], "out 0\nout 1\nout 2\nlast")
+        self.assertEqual(result["returncode"], 0)
+        self.assertFalse(result["timed_out"])
+
+    def test_run_usesNullDeviceAsStdin(self):
+        result = ProcessRunner(_python("import sys; print repr(sys.stdin.read())"), timeout=10).run()
+
+        self.assertEqual(result["out"], "''")
+
+    def test_run_returnsNonZeroReturnCode(self):
+        self.assertEqual(ProcessRunner(_python("import sys; sys.exit(3)")).run()["returncode"], 3)
+
+    def test_run_keepsLastOutputAndSpillsTheRestCompressed(self):
+        code = "for i in range(1000):\n    print 'line %04d' % i"
+
+        result = ProcessRunner(_python(code), max_output_bytes=100, spill_dir=self.spill_dir).run()
+
+        self.assertEqual(result["out"].splitlines()[-1], "line 0999")
+        self.assertLessEqual(len(result["out"]), 100)
+        spilled = gzip.open(result["out_spill"]).read().splitlines()
+        self.assertEqual(spilled[0], "line 0000")
+        self.assertEqual(len(spilled) + len(result["out"].splitlines()), 1000)
+
+    def test_run_killsProcessOnTimeout(self):
+        start_time = time.time()
+
+        result = ProcessRunner(_python("import time; print 'started'; time.sleep(30)"), timeout=0.5).run()
+
+        self.assertTrue(result["timed_out"])
+        self.assertNotEqual(result["returncode"], 0)
+        self.assertLess(time.time() - start_time, 10)
+
+    @unittest.skipIf(utils.is_windows(), "process groups are killed with taskkill")
+    def test_run_killsWholeProcessGroupOnTimeout(self):
+        # the grandchild keeps the pipes open if it is not killed
+        code = "import subprocess, sys, time\nsubprocess.Popen([sys.executable, '-c', 'import time; time.sleep(30)'])\n" \
+               "time.sleep(30)"
+        start_time = time.time()
+
+        result = ProcessRunner(_python(code), timeout=0.5, new_process_group=True).run()
+
+        self.assertTrue(result["timed_out"])
+        self.assertLess(time.time() - start_time, ProcessRunner.KILL_GRACE_PERIOD + 5)
+
+
+class TestRingBuffer(unittest.TestCase):
+    def test_append_dropsOldestLines(self):
+        ring_buffer = RingBuffer(max_bytes=12)
+        for line in ("aaa", "bbb", "ccc", "ddd"):
+            ring_buffer.append(line)
+
+        self.assertEqual(ring_buffer.get_text(), "bbb\nccc\nddd")
+        self.assertEqual(ring_buffer.dropped_lines, 1)
+        self.assertIsNone(ring_buffer.spill_path)
+
+    def test_append_keepsLastLineEvenIfItIsTooLong(self):
+        ring_buffer = RingBuffer(max_bytes=4)
+        ring_buffer.append("aaa")
+        ring_buffer.append("too long line")
+
+        self.assertEqual(ring_buffer.get_text(), "too long line")
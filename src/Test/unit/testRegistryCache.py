@@ -0,0 +1,118 @@
+import json
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import requests
+from flexmock import flexmock, flexmock_teardown
+
+from Test.testingUtils import QuietHTTPRequestHandler, LocalHTTPServer
+from libs.RegistryCache import RegistryCache
+from platformio import exception, util
+
+ETAG = '"v1"'
+
+
+class _RegistryStubHandler(QuietHTTPRequestHandler):
+    def do_GET(self):
+        server = self.server
+        server.requests.append(self.headers.get("If-None-Match"))
+        if self.path.startswith("/missing"):
+            return self.__respond(404, json.dumps(dict(errors=[dict(title="Unknown package")])))
+        if self.headers.get("If-None-Match") == ETAG:
+            return self.__respond(304)
+        self.__respond(200, json.dumps(server.manifest), {"ETag": ETAG})
+
+    def __respond(self, code, body="", headers=None):
+        self.send_response(code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestRegistryCache(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.server = LocalHTTPServer(_RegistryStubHandler, manifest={"toolchain-atmelavr": [{"version": 1}]})
+        self.url = self.server.url
+        self.cache = RegistryCache(self.cache_dir, fresh_seconds=60, max_age_seconds=3600)
+
+    def tearDown(self):
+        for thread in threading.enumerate():
+            if thread.name == "RegistryCache-revalidate":
+                thread.join(5)
+        self.server.stop()
+        flexmock_teardown()
+        shutil.rmtree(self.cache_dir)
+
+    def __get(self, cache=None):
+        status_code, text = (cache or self.cache).get(self.url + "/packages/manifest")
+        return status_code, json.loads(text)
+
+    def __age_entries(self, seconds):
+        real_time = time.time
+        flexmock(time).should_receive("time").replace_with(lambda: real_time() + seconds)
+
+    def __wait_requests(self, count):
+        end_time = time.time() + 5
+        while len(self.server.requests) < count and time.time() < end_time:
+            time.sleep(0.01)
+
+    def test_get_servesFreshResponseFromDiskWithoutRequests(self):
+        self.__get()
+
+        result = self.__get(RegistryCache(self.cache_dir, fresh_seconds=60, max_age_seconds=3600))
+
+        self.assertEqual(result, (200, {"toolchain-atmelavr": [{"version": 1}]}))
+        self.assertEqual(self.server.requests, [None])
+
+    def test_get_servesStaleResponseAndRevalidatesItInBackground(self):
+        self.__get()
+        self.server.manifest = {"toolchain-atmelavr": [{"version": 2}]}
+        self.__age_entries(120)
+
+        result = self.__get()
+        self.__wait_requests(2)
+
+        self.assertEqual(result, (200, {"toolchain-atmelavr": [{"version": 1}]}))
+        self.assertEqual(self.server.requests, [None, ETAG])
+
+    def test_get_revalidatesExpiredResponseWithEtag(self):
+        self.__get()
+        self.__age_entries(7200)
+
+        self.assertEqual(self.__get(), (200, {"toolchain-atmelavr": [{"version": 1}]}))
+        self.assertEqual(self.server.requests, [None, ETAG])
+
+    def test_get_servesStaleResponseWhenOffline(self):
+        self.__get()
+        self.server.stop()
+        self.__age_entries(120)
+
+        self.assertEqual(self.__get(), (200, {"toolchain-atmelavr": [{"version": 1}]}))
+
+    def test_get_raisesConnectionErrorIfOfflineAndResponseIsTooOld(self):
+        self.__get()
+        self.server.stop()
+        self.__age_entries(7200)
+
+        self.assertRaises(requests.exceptions.ConnectionError, self.__get)
+
+    def test_get_doesNotCacheErrors(self):
+        status_code, _ = self.cache.get(self.url + "/missing")
+        self.cache.get(self.url + "/missing")
+
+        self.assertEqual(status_code, 404)
+        self.assertEqual(len(self.server.requests), 2)
+
+    def test_getApiResult_raisesRegistryErrorsOfCachedRequests(self):
+        flexmock(util, __apiurl__=self.url)
+        flexmock(RegistryCache).should_receive("get_instance").and_return(self.cache)
+
+        self.assertEqual(util.get_api_result("/packages/manifest"), {"toolchain-atmelavr": [{"version": 1}]})
+        with self.assertRaisesRegexp(exception.APIRequestError, "Unknown package"):
+            util.get_api_result("/missing")
@@ -0,0 +1,109 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from flexmock import flexmock, flexmock_teardown
+
+from libs import ToolchainFacts as toolchain_facts
+from libs.ToolchainFacts import ToolchainFacts, get_file_stamp, get_project_stamp, parse_compiler_output
+from platformio import util
+
+GCC_ERR = """Using built-in specs.
+COLLECT_GCC=avr-gcc
+Target: avr
+gcc version 4.8.1 (GCC)
+#include "..." search starts here:
+#include <...> search starts here:
+ /opt/avr/lib/gcc/avr/4.8.1/include
+ /opt/avr/avr/include
+End of search list.
+"""
+GCC_OUT = """#define __AVR__ 1
+#define __GNUC__ 4
+#define __cplusplus 199711L
+#define __NO_INLINE__
+"""
+
+
+class TestToolchainFacts(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.facts_path = os.path.join(self.test_dir, "toolchain_facts")
+        self.facts = ToolchainFacts(self.facts_path)
+        self.compiler_path = os.path.join(self.test_dir, "avr-gcc")
+        with open(self.compiler_path, "w") as f:
+            f.write("compiler")
+        self.compiler_result = dict(returncode=0, out=GCC_OUT, err=GCC_ERR)
+
+    def tearDown(self):
+        flexmock_teardown()
+        shutil.rmtree(self.test_dir)
+
+    def test_parseCompilerOutput_getsTypeIncludeDirsAndDefines(self):
+        facts = parse_compiler_output(GCC_OUT, GCC_ERR)
+
+        self.assertEqual(facts["type"], "gcc")
+        self.assertEqual(facts["include_dirs"], ["/opt/avr/lib/gcc/avr/4.8.1/include", "/opt/avr/avr/include"])
+        self.assertEqual(facts["defines"], ["__AVR__=1", "__GNUC__=4", "__cplusplus=199711L", "__NO_INLINE__"])
+
+    def test_set_persistsEntriesForOtherInstances(self):
+        self.facts.set("programs", "avr-gcc", self.compiler_path, stamp=[1, 2.5])
+
+        facts = ToolchainFacts(self.facts_path)
+
+        self.assertEqual(facts.get("programs", "avr-gcc", [1, 2.5]), self.compiler_path)
+        self.assertIsNone(facts.get("programs", "avr-gcc", [1, 3.5]))
+
+    def test_set_keepsEntriesWrittenByOtherProcesses(self):
+        ToolchainFacts(self.facts_path).set("programs", "a", "a_path")
+        self.facts.set("programs", "b", "b_path")
+
+        self.assertEqual(ToolchainFacts(self.facts_path).get("programs", "a"), "a_path")
+
+    def test_get_readsEntriesUpdatedByOtherProcesses(self):
+        self.facts.set("programs", "a", "old_path", stamp=[1])
+        ToolchainFacts(self.facts_path).set("programs", "a", "new_path", stamp=[2])
+
+        self.assertEqual(self.facts.get("programs", "a", [2]), "new_path")
+
+    def test_getProjectStamp_changesWithTheBuilder(self):
+        stamp = get_project_stamp(self.test_dir)
+        flexmock(toolchain_facts).should_receive("get_builder_stamp").and_return(["2.8.6", None])
+
+        self.assertNotEqual(get_project_stamp(self.test_dir), stamp)
+
+    def test_getCompilerFacts_runsCompilerOnlyOnceForTheSameStamp(self):
+        flexmock(util).should_receive("exec_command").and_return(self.compiler_result).once()
+
+        facts = self.facts.get_compiler_facts(self.compiler_path, version="1.40801.0")
+
+        self.assertEqual(facts["type"], "gcc")
+        self.assertEqual(facts["path"], self.compiler_path)
+        self.assertEqual(ToolchainFacts(self.facts_path).get_compiler_facts(self.compiler_path, version="1.40801.0"),
+                         facts)
+
+    def test_getCompilerFacts_runsCompilerAgainIfToolchainChanges(self):
+        flexmock(util).should_receive("exec_command").and_return(self.compiler_result).twice()
+        self.facts.get_compiler_facts(self.compiler_path, version="1.40801.0")
+
+        self.facts.get_compiler_facts(self.compiler_path, version="1.40802.0")
+
+    def test_getCompilerFacts_returnsNoneForUnknownCompilers(self):
+        self.assertIsNone(self.facts.get_compiler_facts(os.path.join(self.test_dir, "unknown-gcc")))
+        self.assertIsNone(get_file_stamp(os.path.join(self.test_dir, "unknown-gcc")))
+
+    def test_whereIsProgram_doesNotSpawnProcessesOnceCached(self):
+        flexmock(ToolchainFacts).should_receive("get_instance").and_return(self.facts)
+        flexmock(util).should_receive("exec_command").and_return(dict(returncode=0, out=self.compiler_path)).once()
+
+        self.assertEqual(util.where_is_program("avr-gcc", self.test_dir), self.compiler_path)
+        self.assertEqual(util.where_is_program("avr-gcc", self.test_dir), self.compiler_path)
+
+    def test_whereIsProgram_ignoresLocationsWhichDoNotExistAnymore(self):
+        flexmock(ToolchainFacts).should_receive("get_instance").and_return(self.facts)
+        util.where_is_program("avr-gcc", self.test_dir)
+        os.remove(self.compiler_path)
+
+        self.assertEqual(util.where_is_program("avr-gcc", self.test_dir), "avr-gcc")
+
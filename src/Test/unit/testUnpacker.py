@@ -0,0 +1,159 @@
+import hashlib
+import io
+import os
+import shutil
+import stat
+import tarfile
+import tempfile
+import time
+import unittest
+import zipfile
+
+import click
+from flexmock import flexmock, flexmock_teardown
+
+from platformio.exception import FDSHASumMismatch
+from platformio.unpacker import FileUnpacker, TARStream
+
+FILES = {"bin/avr-gcc": "#!/bin/sh\n", "include/avr/io.h": "#define IO\n", "package.json": '{"version": 1}'}
+
+
+class _DownloaderStub(object):
+    """
+    Writes the archive in chunks calling on_data as FileDownloader does
+    """
+
+    def __init__(self, archive_path, content):
+        self.archive_path = archive_path
+        self.content = content
+        self.chunks_fed = 0
+
+    def get_filepath(self):
+        return self.archive_path
+
+    def start(self, on_data=None):
+        with open(self.archive_path, "wb") as f:
+            for i in range(0, len(self.content), 100):
+                f.write(self.content[i:i + 100])
+                if on_data is not None:
+                    on_data(self.content[i:i + 100])
+                    self.chunks_fed += 1
+
+    def verify(self, sha1=None):
+        if sha1 and sha1 != hashlib.sha1(self.content).hexdigest():
+            raise FDSHASumMismatch(sha1, self.archive_path, sha1)
+
+
+class TestFileUnpacker(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = tempfile.mkdtemp()
+        self.dest_dir = os.path.join(self.test_dir, "toolchain-atmelavr")
+        flexmock(click).should_receive("echo")
+
+    def tearDown(self):
+        flexmock_teardown()
+        shutil.rmtree(self.test_dir)
+
+    def __create_tar(self, name="toolchain.tar.gz"):
+        data = io.BytesIO()
+        with tarfile.open(fileobj=data, mode="w:gz") as tar:
+            for file_name, content in sorted(FILES.items()):
+                info = tarfile.TarInfo(file_name)
+                info.size = len(content)
+                tar.addfile(info, io.BytesIO(content))
+        path = os.path.join(self.test_dir, name)
+        with open(path, "wb") as f:
+            f.write(data.getvalue())
+        return path, data.getvalue()
+
+    def __create_zip(self):
+        path = os.path.join(self.test_dir, "toolchain.zip")
+        with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as z:
+            for file_name, content in sorted(FILES.items()):
+                info = zipfile.ZipInfo(file_name, (2015, 10, 21, 7, 28, 0))
+                info.external_attr = 0755 << 16L
+                z.writestr(info, content)
+        return path
+
+    def __assert_unpacked(self):
+        for file_name, content in FILES.items():
+            with open(os.path.join(self.dest_dir, file_name)) as f:
+                self.assertEqual(f.read(), content)
+        self.assertEqual(os.listdir(self.test_dir).count("toolchain-atmelavr"), 1)
+        self.assertFalse([f for f in os.listdir(self.test_dir) if ".unpacking" in f])
+
+    def test_start_extractsTarInDestination(self):
+        FileUnpacker(self.__create_tar()[0], self.dest_dir).start()
+
+        self.__assert_unpacked()
+
+    def test_start_extractsZipInParallelPreservingAttributes(self):
+        FileUnpacker(self.__create_zip(), self.dest_dir).start()
+
+        self.__assert_unpacked()
+        gcc_stat = os.stat(os.path.join(self.dest_dir, "bin", "avr-gcc"))
+        self.assertTrue(gcc_stat.st_mode & stat.S_IXUSR)
+        self.assertEqual(gcc_stat.st_mtime, time.mktime((2015, 10, 21, 7, 28, 0, 0, 0, 0)))
+
+    def test_start_replacesEntriesOfExistingDestination(self):
+        os.makedirs(os.path.join(self.dest_dir, "include"))
+        with open(os.path.join(self.dest_dir, "include", "old.h"), "w") as f:
+            f.write("old")
+
+        FileUnpacker(self.__create_zip(), self.dest_dir).start()
+
+        self.__assert_unpacked()
+        self.assertFalse(os.path.exists(os.path.join(self.dest_dir, "include", "old.h")))
+
+    def test_start_doesNotCreateDestinationIfArchiveIsCorrupted(self):
+        path = os.path.join(self.test_dir, "corrupted.tar.gz")
+        with open(path, "wb") as f:
+            f.write("not a tar")
+
+        self.assertRaises(tarfile.TarError, FileUnpacker(path, self.dest_dir).start)
+
+        self.assertEqual(os.listdir(self.test_dir), ["corrupted.tar.gz"])
+
+    def test_downloadAndStart_extractsTarWhileDownloading(self):
+        path, content = self.__create_tar()
+        os.remove(path)
+        downloader = _DownloaderStub(path, content)
+        flexmock(tarfile.TarFile).should_call("extractall").once()
+
+        FileUnpacker(path, self.dest_dir).download_and_start(downloader, hashlib.sha1(content).hexdigest())
+
+        self.__assert_unpacked()
+        self.assertGreater(downloader.chunks_fed, 1)
+        self.assertFalse(os.path.exists(path))
+
+    def test_downloadAndStart_extractsZipAfterDownloading(self):
+        path = self.__create_zip()
+        with open(path, "rb") as f:
+            downloader = _DownloaderStub(path, f.read())
+
+        FileUnpacker(path, self.dest_dir).download_and_start(downloader)
+
+        self.__assert_unpacked()
+        self.assertEqual(downloader.chunks_fed, 0)
+
+    def test_downloadAndStart_discardsExtractedFilesIfSha1DoesNotMatch(self):
+        path, content = self.__create_tar()
+
+        self.assertRaises(FDSHASumMismatch, FileUnpacker(path, self.dest_dir).download_and_start,
+                          _DownloaderStub(path, content), "0" * 40)
+
+        self.assertFalse(os.path.exists(self.dest_dir))
+        self.assertFalse([f for f in os.listdir(self.test_dir) if ".unpacking" in f])
+
+
+class TestTARStream(unittest.TestCase):
+    def test_feed_raisesErrorsOfTheExtraction(self):
+        test_dir = tempfile.mkdtemp()
+        try:
+            stream = TARStream(test_dir)
+            with self.assertRaises(tarfile.TarError):
+                for _ in range(1000):
+                    stream.feed("not a tar" * 1000)
+                stream.close()
+        finally:
+            shutil.rmtree(test_dir)
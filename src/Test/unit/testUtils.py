@@ -3,7 +3,7 @@ import shutil
 import unittest
 
 import serial.tools.list_ports
-from flexmock import flexmock
+from flexmock import flexmock, flexmock_teardown
 
 from Test.testingUtils import restore_test_resources
 from libs import utils
@@ -22,6 +22,7 @@ class TestUtils(unittest.TestCase):
         restore_test_resources()
 
     def tearDown(self):
+        flexmock_teardown()
         serial.tools.list_ports.comports = self.original_list_ports_comports
 
         if os.path.exists(self.copy_tree_new):
@@ -84,6 +85,43 @@ class TestUtils(unittest.TestCase):
         self.assertTrue(os.path.exists(self.zip_folder))
         self.assertTrue(os.path.exists(self.zip_folder + os.sep + "zip.txt"))
 
+    def test_extractZip_stripsLeadingComponents(self):
+        utils.extract_zip(self.zip_path, self.zip_folder, strip_components=1)
+
+        self.assertTrue(os.path.exists(self.zip_folder + os.sep + "zip.txt"))
+        self.assertEqual(utils.get_zip_top_directories(self.zip_path), ["zip"])
+
+    def test_replaceEntries_movesEntriesReplacingExistingOnes(self):
+        utils.copytree(self.copy_tree_old, self.copy_tree_new)
+        with open(os.path.join(self.copy_tree_new, "01.txt"), "w") as f:
+            f.write("new")
+
+        utils.replace_entries(self.copy_tree_new, self.zip_folder)
+        utils.replace_entries(self.zip_folder, self.copy_tree_old)
+
+        self.assertEqual(os.listdir(self.copy_tree_new), [])
+        with open(os.path.join(self.copy_tree_old, "01.txt")) as f:
+            self.assertEqual(f.read(), "new")
+        self.assertEqual(sorted(os.listdir(self.copy_tree_old)), ["01.txt", "02.txt"])
+
+    def test_replaceFile_renamesOverExistingFileOutOfWindows(self):
+        utils.copytree(self.copy_tree_old, self.copy_tree_new)
+        flexmock(utils).should_receive("is_windows").and_return(False)
+        flexmock(os).should_receive("remove").never()
+
+        utils.replace_file(os.path.join(self.copy_tree_new, "01.txt"), os.path.join(self.copy_tree_new, "02.txt"))
+
+        self.assertEqual(os.listdir(self.copy_tree_new), ["02.txt"])
+
+    def test_replaceFile_removesExistingFileOnWindows(self):
+        utils.copytree(self.copy_tree_old, self.copy_tree_new)
+        flexmock(utils).should_receive("is_windows").and_return(True)
+        flexmock(os).should_receive("rename").once()
+
+        utils.replace_file(os.path.join(self.copy_tree_new, "01.txt"), os.path.join(self.copy_tree_new, "02.txt"))
+
+        self.assertFalse(os.path.exists(os.path.join(self.copy_tree_new, "02.txt")))
+
     def test_listSerialPorts_useSerialLib(self):
         ports = [(1, 2, 3), (4, 5, 6)]
         flexmock(serial.tools.list_ports).should_receive("comports").and_return(ports).once()
@@ -0,0 +1,213 @@
+import collections
+import json
+import logging
+import os
+import re
+import threading
+
+from libs import utils
+
+log = logging.getLogger(__name__)
+
+_HWID_RE = re.compile(r"VID:PID=([0-9a-fA-F]{4}):([0-9a-fA-F]{4})")
+
+
+def _normalize_usb_id(usb_id):
+    if not usb_id:
+        return None
+    usb_id = usb_id.lower()
+    return usb_id[2:] if usb_id.startswith("0x") else usb_id
+
+
+def parse_hwid(hwid):
+    """
+    :return: (vid, pid) of a serial port hardware id as "USB VID:PID=2341:0043 SER=..." or (None, None)
+    """
+    match = _HWID_RE.search(hwid or "")
+    if match is None:
+        return None, None
+    return match.group(1).lower(), match.group(2).lower()
+
+
+class BoardsMapping(collections.Mapping):
+    """
+    Read only dictionary of all the boards which deserializes every board when it is accessed
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+
+    def __getitem__(self, type_):
+        board = self.catalog.get_board(type_)
+        if board is None:
+            raise KeyError(type_)
+        return board
+
+    def __iter__(self):
+        return iter(self.catalog.get_types())
+
+    def __len__(self):
+        return len(self.catalog.get_types())
+
+    def __contains__(self, type_):
+        return type_ in self.catalog.get_index()
+
+
+class BoardsCatalog(object):
+    """
+    Compiled catalog of the boards json files. The first line of the catalog file is the index
+    (board type -> offset, length, platform, mcu, vid and pid) followed by one serialized board per line,
+    so searches only need the index and boards are deserialized on demand.
+    It is regenerated when the mtime or size of any source json file changes
+    """
+    VERSION = 1
+    PLATFORM, MCU, VID, PID = range(2, 6)
+
+    def __init__(self, path, boards_dirs):
+        self.path = path
+        self.boards_dirs = boards_dirs
+        self._index = None
+        self._data_offset = None
+        self._records = None  # only used if the catalog file can not be written
+        self._boards = dict()
+        self._lock = threading.Lock()
+
+    def _get_sources_stamps(self):
+        stamps = []
+        for boards_dir in self.boards_dirs:
+            if not os.path.isdir(boards_dir):
+                continue
+            for json_file in sorted(os.listdir(boards_dir)):
+                if not json_file.endswith(".json"):
+                    continue
+                st = os.stat(os.path.join(boards_dir, json_file))
+                stamps.append([os.path.join(boards_dir, json_file), st.st_mtime, st.st_size])
+        # compared with the json loaded ones
+        return json.loads(json.dumps(stamps))
+
+    def _load(self):
+        stamps = self._get_sources_stamps()
+        try:
+            with open(self.path, "rb") as f:
+                header = json.loads(f.readline())
+                if header["version"] == self.VERSION and header["stamps"] == stamps:
+                    self._index = header["boards"]
+                    self._data_offset = f.tell()
+                    return
+        except (IOError, ValueError, KeyError):
+            pass
+        self._compile(stamps)
+
+    def _compile(self, stamps):
+        boards = dict()
+        for json_path, _, _ in stamps:
+            with open(json_path) as f:
+                boards.update(json.load(f))
+
+        index = dict()
+        records = dict()
+        offset = 0
+        for type_ in sorted(boards):
+            data = boards[type_]
+            build = data.get("build", {})
+            records[type_] = record = json.dumps(data, sort_keys=True)
+            index[type_] = [offset, len(record), data.get("platform"), build.get("mcu"),
+                            _normalize_usb_id(build.get("vid")), _normalize_usb_id(build.get("pid"))]
+            offset += len(record) + 1
+        header = json.dumps(dict(version=self.VERSION, stamps=stamps, boards=index), separators=(",", ":"))
+
+        self._index = json.loads(header)["boards"]
+        self._data_offset = len(header) + 1
+        tmp_path = "{}.{}.tmp".format(self.path, os.getpid())
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(header + "\n")
+                f.write("\n".join(records[type_] for type_ in sorted(records)))
+            utils.replace_file(tmp_path, self.path)
+            self._records = None
+        except (IOError, OSError):
+            log.debug("Unable to save boards catalog in {}".format(self.path), exc_info=1)
+            self._records = records
+
+    def get_index(self):
+        with self._lock:
+            if self._index is None:
+                self._load()
+            return self._index
+
+    def get_types(self):
+        return sorted(self.get_index())
+
+    def _read_record(self, type_):
+        if self._records is not None:
+            return self._records[type_]
+        offset, length = self._index[type_][:2]
+        with open(self.path, "rb") as f:
+            f.seek(self._data_offset + offset)
+            return f.read(length)
+
+    def get_record(self, type_):
+        """
+        :return: serialized json of the board or None if it does not exist
+        """
+        if type_ not in self.get_index():
+            return None
+        with self._lock:
+            try:
+                return self._read_record(type_)
+            except IOError:
+                # catalog file regenerated by other process
+                self._load()
+                return self._read_record(type_) if type_ in self._index else None
+
+    def get_board(self, type_):
+        board = self._boards.get(type_)
+        if board is None:
+            record = self.get_record(type_)
+            if record is None:
+                return None
+            try:
+                board = json.loads(record)
+            except ValueError:
+                # catalog file regenerated by other process
+                with self._lock:
+                    self._load()
+                record = self.get_record(type_)
+                if record is None:
+                    return None
+                board = json.loads(record)
+            self._boards[type_] = board
+        return board
+
+    def get_all(self):
+        return BoardsMapping(self)
+
+    def search(self, query=None, platform=None, mcu=None, vid=None, pid=None):
+        """
+        Filters by the indexed fields and then by the query text (searched in the serialized board)
+        :return: sorted list of board types
+        """
+        mcu = mcu.lower() if mcu else None
+        vid = _normalize_usb_id(vid)
+        pid = _normalize_usb_id(pid)
+        types = []
+        for type_, entry in self.get_index().items():
+            if platform is not None and entry[self.PLATFORM] != platform:
+                continue
+            if mcu is not None and (entry[self.MCU] or "").lower() != mcu:
+                continue
+            if vid is not None and entry[self.VID] != vid:
+                continue
+            if pid is not None and entry[self.PID] != pid:
+                continue
+            types.append(type_)
+        if query:
+            query = query.lower()
+            types = [t for t in types if query in "{} {}".format(t, self.get_record(t)).lower()]
+        return sorted(types)
+
+    def get_field(self, type_, field):
+        """
+        :param field: BoardsCatalog.PLATFORM, MCU, VID or PID
+        """
+        return self.get_index()[type_][field]
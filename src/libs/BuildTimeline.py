@@ -0,0 +1,118 @@
+import json
+import logging
+import os
+
+from libs.Metrics import Metrics
+
+log = logging.getLogger(__name__)
+
+TIMELINE_ENV_VAR = "WEB2BOARD_BUILD_TIMELINE"
+_PHASES_BY_EXTENSION = {
+    ".a": "archive",
+    ".elf": "link",
+    ".hex": "objcopy",
+    ".bin": "objcopy",
+    ".eep": "objcopy",
+    ".gch": "pch"
+}
+
+
+def get_phase(target):
+    target = "/" + target.replace("\\", "/")
+    extension = os.path.splitext(target)[1]
+    if extension == ".o":
+        if "/FrameworkArduino/" in target:
+            return "core"
+        if "/src/" in target:
+            return "sketch"
+        return "libraries"
+    return _PHASES_BY_EXTENSION.get(extension, "other")
+
+
+def create_timeline(timings, scan_time, start_time, end_time):
+    """
+    Builds the json serializable timeline from the SCons Taskmaster NodeTimings (run in the scons process).
+    Times are seconds since the scons start, deps are the indexes of the executed children of every node
+    :type timings: list
+    """
+    indexes = {id(timing.node): i for i, timing in enumerate(timings)}
+    nodes = []
+    for timing in timings:
+        deps = [indexes[id(child)] for child in timing.node.children(scan=0) if id(child) in indexes]
+        target = str(timing.node)
+        nodes.append(dict(target=target,
+                          phase=get_phase(target),
+                          command=timing.command,
+                          ready=round(timing.ready - start_time, 3),
+                          start=round(timing.start - start_time, 3),
+                          end=round(timing.end - start_time, 3),
+                          deps=sorted(deps)))
+    return dict(wall=round(end_time - start_time, 3), scan=round(scan_time, 3), nodes=nodes)
+
+
+def write_timeline(path, timeline):
+    with open(path, "w") as f:
+        json.dump(timeline, f, separators=(",", ":"))
+
+
+def get_critical_path(nodes):
+    """
+    :return: indexes of the longest chain of dependent nodes weighted by their execution time
+    """
+    lengths = []
+    previous = []
+    for node in nodes:
+        # children always finish before their parents start, so they were recorded before them
+        deps = [d for d in node["deps"] if d < len(lengths)]
+        best = max(deps, key=lambda d: lengths[d]) if deps else None
+        lengths.append(node["end"] - node["start"] + (lengths[best] if best is not None else 0))
+        previous.append(best)
+    if not lengths:
+        return []
+    path = []
+    index = max(range(len(lengths)), key=lambda i: lengths[i])
+    while index is not None:
+        path.append(index)
+        index = previous[index]
+    return path[::-1]
+
+
+def summarize(timeline):
+    phases = dict()
+    for node in timeline["nodes"]:
+        phase = phases.setdefault(node["phase"], dict(count=0, seconds=0))
+        phase["count"] += 1
+        phase["seconds"] += node["end"] - node["start"]
+    for phase in phases.values():
+        phase["seconds"] = round(phase["seconds"], 3)
+    critical_path = [timeline["nodes"][i] for i in get_critical_path(timeline["nodes"])]
+    return dict(wall=timeline["wall"],
+                scan=timeline["scan"],
+                phases=phases,
+                critical_path=[n["target"] for n in critical_path],
+                critical_path_seconds=round(sum(n["end"] - n["start"] for n in critical_path), 3))
+
+
+def collect(path, **labels):
+    """
+    Reads and removes the timeline written by the scons process, adds its summary and observes the phases metrics
+    :return: timeline dictionary or None if the build did not write it
+    """
+    try:
+        with open(path) as f:
+            timeline = json.load(f)
+    except (IOError, ValueError):
+        log.debug("Build timeline not available in {}".format(path))
+        return None
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    timeline["summary"] = summary = summarize(timeline)
+    Metrics.observe("build_scan_seconds", summary["scan"], **labels)
+    Metrics.observe("build_critical_path_seconds", summary["critical_path_seconds"], **labels)
+    for phase, phase_summary in summary["phases"].items():
+        Metrics.observe("build_phase_seconds", phase_summary["seconds"], phase=phase, **labels)
+    return timeline
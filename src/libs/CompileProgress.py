@@ -0,0 +1,126 @@
+import logging
+import re
+import threading
+import time
+
+from libs import utils
+from libs.ErrorParser import ErrorParser, is_user_code_error
+
+log = logging.getLogger(__name__)
+
+__local = threading.local()
+
+
+def set_output_sink(sink):
+    """
+    Sets the sink which will receive the build output lines of the builds started in the current thread
+    :type sink: CompileProgressSink
+    """
+    __local.sink = sink
+
+
+def get_output_sink():
+    return getattr(__local, "sink", None)
+
+
+class CompileProgressSink(object):
+    """
+    Collects the SCons output lines of a build (received from the stdout and stderr pipe threads)
+    and pushes throttled progress dictionaries to on_progress.
+    With fail_fast the whole build process group is killed on the first error found in user code.
+    """
+    COMPILE_LINE_RE = re.compile(r"\s-c\s")
+    OBJECT_FILE_RE = re.compile(r"\s-o\s+\"?([^\s\"]+\.o)\b")
+    SOURCE_FILE_RE = re.compile(r"\"?([^\s\"]+\.(?:c|cpp|cc|S|ino))\"?\s*$")
+    PUSH_INTERVAL = 0.5
+    # greatest number of objects compiled in a build of every environment, used as expected total
+    objects_by_env = dict()
+
+    def __init__(self, env_name, on_progress, push_interval=PUSH_INTERVAL, fail_fast=False, project_src_dir=None):
+        self.env_name = env_name
+        self.on_progress = on_progress
+        self.push_interval = push_interval
+        self.fail_fast = fail_fast
+        self.aborted = False
+        self.process = None
+        self.current_file = None
+        self.compiled = 0
+        self.error_parser = ErrorParser(project_src_dir)
+        self.__last_push = 0
+        self.__pending = False
+        self.__lock = threading.Lock()
+
+    def __enter__(self):
+        set_output_sink(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        set_output_sink(None)
+        self.close(success=exc_type is None)
+
+    def on_process_started(self, process):
+        with self.__lock:
+            self.process = process
+            aborted = self.aborted
+        if aborted:
+            utils.kill_process_group(process)
+
+    def abort(self, reason="first user code error"):
+        with self.__lock:
+            if self.aborted:
+                return
+            self.aborted = True
+            process = self.process
+        log.info("Aborting build of {} on {}".format(self.env_name, reason))
+        if process is not None:
+            utils.kill_process_group(process)
+
+    def on_out(self, line):
+        if self.COMPILE_LINE_RE.search(line) is None or self.OBJECT_FILE_RE.search(line) is None:
+            return
+        source = self.SOURCE_FILE_RE.search(line)
+        with self.__lock:
+            self.compiled += 1
+            self.current_file = source.group(1) if source is not None else self.OBJECT_FILE_RE.search(line).group(1)
+            self.__pending = True
+        self._push_if_necessary()
+
+    def on_err(self, line):
+        with self.__lock:
+            diagnostic = self.error_parser.feed(line)
+            if diagnostic is None or diagnostic["severity"] == "note":
+                return
+            self.__pending = True
+        if self.fail_fast and is_user_code_error(diagnostic, self.error_parser.project_src_dir):
+            self.abort()
+        self._push_if_necessary()
+
+    def get_progress(self):
+        with self.__lock:
+            return dict(env=self.env_name,
+                        current_file=self.current_file,
+                        compiled=self.compiled,
+                        total=self.objects_by_env.get(self.env_name),
+                        warnings=list(self.error_parser.warnings),
+                        errors=self.error_parser.errors_count,
+                        aborted=self.aborted)
+
+    def _push_if_necessary(self, force=False):
+        now = time.time()
+        with self.__lock:
+            if not self.__pending or (not force and now - self.__last_push < self.push_interval):
+                return
+            self.__last_push = now
+            self.__pending = False
+        self._push(self.get_progress())
+
+    def _push(self, progress):
+        try:
+            self.on_progress(progress)
+        except:
+            log.warning("Unable to push compile progress", exc_info=1)
+
+    def close(self, success=True):
+        if success and not self.aborted and self.compiled > self.objects_by_env.get(self.env_name, 0):
+            self.objects_by_env[self.env_name] = self.compiled
+        self._push_if_necessary(force=True)
@@ -1,9 +1,15 @@
 #!/usr/bin/python
 # -*- coding: utf-8 -*-
 
+import hashlib
+import json
 import logging
 import os
 import subprocess
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import timedelta, datetime
 from UserList import UserList as _UserList
 from UserString import UserString as _UserString
@@ -11,12 +17,20 @@ import UserList
 import UserString
 
 from libs import utils
+from libs.BoardsCatalog import parse_hwid
+from libs.CompileProgress import CompileProgressSink, get_output_sink
+from libs.Config import Config
 from libs.Decorators.Asynchronous import asynchronous
-from libs.ErrorParser import format_compile_result
+from libs.ErrorParser import ErrorParser, INO_CONVERTED_FILE, format_compile_result
+from libs.JobServer import JobServer
+from libs.LibraryStore import LibraryStore
+from libs.Metrics import Metrics
 from libs.PathsManager import PathsManager as pm
+from libs.ToolchainFacts import ToolchainFacts, get_project_stamp
 from platformio import exception, util
+from platformio.builder.tools.piomisc import InoToCPPConverter
 from platformio.platformioUtils import run as platformio_run
-from platformio.util import get_boards
+from platformio.util import get_boards, get_boards_catalog
 import re
 
 log = logging.getLogger(__name__)
@@ -26,6 +40,7 @@ ERROR_BOARD_NOT_SUPPORTED = {"code": 1, "message": "Board: {0} not Supported"}
 ERROR_NO_PORT_FOUND = {"code": 2, "message": "No port found, check the board: \"{0}\" is connected"}
 ERROR_MULTIPLE_BOARDS_CONNECTED = {"code": 3,
                                    "message": "More than one connected board was found. You should only have one board connected"}
+ERROR_IDE_DATA_NOT_AVAILABLE = {"code": 4, "message": "Unable to get the build data of board: {0}"}
 
 
 class CompilerException(Exception):
@@ -35,17 +50,84 @@ class CompilerException(Exception):
         super(CompilerException, self).__init__(self.message)
 
 
+class _SketchNode(object):
+    """
+    Minimal SCons node interface needed by InoToCPPConverter
+    """
+
+    def __init__(self, path, contents):
+        self.path = path
+        self.contents = contents
+
+    def get_path(self):
+        return self.path
+
+    def get_text_contents(self):
+        return self.contents
+
+
+class _BuildLock(object):
+    """
+    Serializes the builds, all the boards build the same sketch files (src/main.ino and its converted cpp) of the
+    shared workspace. Interactive builds go before the waiting batch builds and abort the running batch build
+    (through its sink), so a background build never delays the user
+    """
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._busy = False
+        self._batch_sink = None
+        self._interactive_waiting = 0
+
+    @contextmanager
+    def hold(self, batch_sink=None):
+        """
+        :param batch_sink: sink of the batch build, None for interactive builds
+        :type batch_sink: CompileProgressSink
+        """
+        interactive = batch_sink is None
+        with self._condition:
+            if interactive:
+                self._interactive_waiting += 1
+                if self._batch_sink is not None:
+                    self._batch_sink.abort("interactive build request")
+            while self._busy or (not interactive and self._interactive_waiting > 0):
+                self._condition.wait()
+            if interactive:
+                self._interactive_waiting -= 1
+            self._busy = True
+            self._batch_sink = batch_sink
+        try:
+            yield
+        finally:
+            with self._condition:
+                self._busy = False
+                self._batch_sink = None
+                self._condition.notify_all()
+
+
 ##
 # Class CompilerUploader, created to support different compilers & uploaders
 #
 class CompilerUploader:
     __global_compiler_uploader_holder = {}
     DEFAULT_BOARD = "mega"
+    # all boards share the same workspace
+    _build_lock = _BuildLock()
+    _is_warming_build_cache = False
+    _warming_lock = threading.Lock()
+    CHECK_CACHE_SIZE = 100
+    CHECK_TIMEOUT = 30
+    _check_results_cache = OrderedDict()
+    _check_cache_lock = threading.Lock()
 
     def __init__(self, board=DEFAULT_BOARD):
         self.lastPortUsed = None
         self.board = board  # we use the board name as the environment (check platformio.ini)
         self.build_options = self._get_build_options(self.board)
+        self.ide_data = None
+        self._ide_data_lib_version = None
+        self._check_lock = threading.Lock()
 
     @staticmethod
     def _get_build_options(board):
@@ -103,7 +185,7 @@ class CompilerUploader:
         log.debug(err)
         return output, err
 
-    @asynchronous()
+    @asynchronous(pool="probe")
     def _check_port(self, port, mcu, baud_rate, protocol="arduino"):
         try:
             log.debug("Checking port: {}".format(port))
@@ -123,18 +205,57 @@ class CompilerUploader:
             code = code.encode("utf-8")
 
         main_ino_path = os.path.join(pm.PLATFORMIO_WORKSPACE_PATH, "src")
-        if not os.path.exists(main_ino_path):
-            os.makedirs(main_ino_path)
-        with open(os.path.join(main_ino_path, "main.ino"), 'w') as mainCppFile:
-            mainCppFile.write(code)
-
-        run_result = platformio_run(target=target, environment=(self.board,),
-                                    project_dir=pm.PLATFORMIO_WORKSPACE_PATH, upload_port=upload_port)[0]
+        with self._build_lock.hold():
+            if not os.path.exists(main_ino_path):
+                os.makedirs(main_ino_path)
+            with open(os.path.join(main_ino_path, "main.ino"), 'w') as mainCppFile:
+                mainCppFile.write(code)
+
+            start_time = time.time()
+            run_result = platformio_run(target=target, environment=(self.board,),
+                                        project_dir=pm.PLATFORMIO_WORKSPACE_PATH, upload_port=upload_port)[0]
+        Metrics.observe("upload_seconds" if upload else "compile_seconds", time.time() - start_time,
+                        board=self.board, success=run_result[0])
+        output_sink = get_output_sink()
+        if output_sink is not None and output_sink.aborted:
+            Metrics.inc("fail_fast_aborts_total", board=self.board)
+            if Config.warm_build_cache_on_fail_fast:
+                self._warm_build_cache()
         if get_hex_string:
             raise NotImplementedError()
             # hexResult = self.__getHexString(pm.PLATFORMIO_WORKSPACE_PATH, self.board) if runResult[0] else None
             # return runResult, hexResult
-        return format_compile_result(run_result)
+        start_time = time.time()
+        # the streaming sink already parsed stderr while building
+        result = format_compile_result(run_result, output_sink.error_parser if output_sink is not None else None)
+        Metrics.observe("compile_phase_seconds", time.time() - start_time, phase="parse_errors")
+        return result
+
+    @asynchronous(pool="compile")
+    def _warm_build_cache(self):
+        """
+        Finishes in background the build aborted by fail fast (scons -k keeps going after the user code errors)
+        so the core and libraries objects are ready for the next build. It is a batch build, aborted as soon as an
+        interactive build asks for the workspace
+        """
+        with self._warming_lock:
+            if CompilerUploader._is_warming_build_cache:
+                return
+            CompilerUploader._is_warming_build_cache = True
+        try:
+            sink = CompileProgressSink(self.board, lambda progress: None)
+            with self._build_lock.hold(batch_sink=sink):
+                if sink.aborted:
+                    return
+                start_time = time.time()
+                with sink:
+                    platformio_run(environment=(self.board,), project_dir=pm.PLATFORMIO_WORKSPACE_PATH,
+                                   keep_going=True)
+                if not sink.aborted:
+                    Metrics.observe("compile_phase_seconds", time.time() - start_time, phase="warm_build_cache")
+        finally:
+            with self._warming_lock:
+                CompilerUploader._is_warming_build_cache = False
 
     def _search_board_port(self):
         mcu = self.build_options["boardData"]["build"]["mcu"]
@@ -159,10 +280,110 @@ class CompilerUploader:
                         return port
         return None
 
+    @staticmethod
+    def _get_libraries_include_dirs():
+        # all libraries are included because idedata only has the ones used by the last compiled sketch, the user
+        # libraries before the active version of the library store as in the builds
+        include_dirs = []
+        for lib_dir in (Config.get_platformio_lib_dir(), LibraryStore.get_instance().get_active_path()):
+            if lib_dir is None or not os.path.isdir(lib_dir):
+                continue
+            for library in utils.list_directories_in_path(lib_dir):
+                include_dirs.append(os.path.join(lib_dir, library))
+                if os.path.isdir(os.path.join(lib_dir, library, "src")):
+                    include_dirs.append(os.path.join(lib_dir, library, "src"))
+        return include_dirs
+
+    def get_ide_data(self):
+        """
+        Include paths, defines, compiler and flags of the board environment (computed by scons only once and
+        stored in the toolchain facts cache)
+        """
+        lib_version = LibraryStore.get_instance().get_active_version()
+        if self.ide_data is None or self._ide_data_lib_version != lib_version:
+            self._ide_data_lib_version = lib_version
+            key = "{}|{}|{}".format(pm.PLATFORMIO_WORKSPACE_PATH, self.board, lib_version)
+            stamp = get_project_stamp(pm.PLATFORMIO_WORKSPACE_PATH)
+            self.ide_data = ToolchainFacts.get_instance().get_or_compute("idedata", key, stamp, self._run_ide_data)
+            if self.ide_data is None:
+                raise CompilerException(ERROR_IDE_DATA_NOT_AVAILABLE, self.board)
+        return self.ide_data
+
+    def _run_ide_data(self):
+        with self._build_lock.hold():
+            run_result = platformio_run(target=("idedata",), environment=(self.board,),
+                                        project_dir=pm.PLATFORMIO_WORKSPACE_PATH)[0]
+        out_lines = run_result[1]["out"].splitlines() if run_result[0] else []
+        json_lines = [line for line in out_lines if line.startswith("{")]
+        return json.loads(json_lines[-1]) if json_lines else None
+
+    def _run_syntax_check(self, code):
+        ide_data = self.get_ide_data()
+        if ide_data["cxx_path"] is None:
+            raise CompilerException(ERROR_IDE_DATA_NOT_AVAILABLE, self.board)
+        check_dir = os.path.join(pm.PLATFORMIO_WORKSPACE_PATH, ".pioenvs", self.board, "syntax_check")
+        with self._check_lock:
+            if not os.path.exists(check_dir):
+                os.makedirs(check_dir)
+            converted_path = os.path.join(check_dir, INO_CONVERTED_FILE)
+            with open(converted_path, "w") as converted_file:
+                converted_file.write(InoToCPPConverter([_SketchNode("main.ino", code)]).convert() or code)
+
+            args = [ide_data["cxx_path"], "-fsyntax-only"] + ide_data.get("cxx_flags", [])
+            args += ["-D" + define for define in ide_data["defines"]]
+            args += ["-I" + include for include in ide_data["includes"] + self._get_libraries_include_dirs()]
+            args.append(converted_path)
+            log.debug("Checking syntax with: {}".format(args))
+            error_parser = ErrorParser(project_src_dir=check_dir)
+            with JobServer.get_instance().token():
+                output = util.exec_command(args, cwd=pm.PLATFORMIO_WORKSPACE_PATH, on_err=error_parser.feed,
+                                           timeout=self.CHECK_TIMEOUT)
+
+        return dict(success=output["returncode"] == 0, errors=error_parser.errors, warnings=error_parser.warnings)
+
+    def check(self, code):
+        """
+        Converts the sketch and only checks its syntax with the board compiler, no scons build involved.
+        Results are cached by code content
+        :return: dictionary with success, errors and warnings
+        """
+        if isinstance(code, unicode):
+            code = code.encode("utf-8")
+        lib_version = LibraryStore.get_instance().get_active_version() or ""
+        key = hashlib.sha1(self.board + "\0" + lib_version + "\0" + code).hexdigest()
+        with self._check_cache_lock:
+            result = self._check_results_cache.get(key)
+        if result is not None:
+            Metrics.inc("cache_requests_total", cache="syntax_check", result="hit")
+            return result
+        Metrics.inc("cache_requests_total", cache="syntax_check", result="miss")
+
+        start_time = time.time()
+        result = self._run_syntax_check(code)
+        Metrics.observe("check_seconds", time.time() - start_time, board=self.board)
+        with self._check_cache_lock:
+            self._check_results_cache[key] = result
+            while len(self._check_results_cache) > self.CHECK_CACHE_SIZE:
+                self._check_results_cache.popitem(last=False)
+        return result
+
+    def _is_port_of_board_mcu(self, hwid):
+        """
+        True if the usb vid:pid of the port belongs to any board with the mcu of the current board
+        """
+        vid, pid = parse_hwid(hwid)
+        if vid is None:
+            return False
+        mcu = self.build_options["boardData"]["build"]["mcu"] if self.build_options else None
+        return len(get_boards_catalog().search(mcu=mcu, vid=vid, pid=pid)) > 0
+
     def get_available_ports(self):
         ports_to_upload = utils.list_serial_ports(lambda x: x[2] != "n/a")
-        available_ports = map(lambda x: x[0], ports_to_upload)
-        return sorted(available_ports, cmp=lambda x, y: -1 if x == self.lastPortUsed else 1)
+        # last used port first, then the ports whose usb ids match a board with the same mcu
+        priorities = {port[0]: 0 if port[0] == self.lastPortUsed else
+                      1 if len(port) > 2 and self._is_port_of_board_mcu(port[2]) else 2
+                      for port in ports_to_upload}
+        return sorted([port[0] for port in ports_to_upload], key=lambda port: priorities[port])
 
     def get_port(self):
         port_to_upload = self._search_board_port()
@@ -190,9 +411,11 @@ class CompilerUploader:
         protocol = self.build_options["boardData"]["upload"]["protocol"]
         baud_rate = str(self.build_options["boardData"]["upload"]["speed"])
         args = "-V -P " + port + " -p " + mcu + " -b " + baud_rate + " -c " + protocol + " -D -U flash:w:" + hex_file_path + ":i"
+        start_time = time.time()
         output, err = self._call_avrdude(args)
         ok_text = "bytes of flash written"
         result_ok = ok_text in output or ok_text in err
+        Metrics.observe("upload_hex_seconds", time.time() - start_time, board=self.board, success=result_ok)
         return result_ok, {"out": output, "err": err}
 
     @classmethod
@@ -202,5 +425,8 @@ class CompilerUploader:
         :rtype: CompilerUploader
         """
         if board not in cls.__global_compiler_uploader_holder:
+            Metrics.inc("cache_requests_total", cache="compiler_uploader", result="miss")
             cls.__global_compiler_uploader_holder[board] = CompilerUploader(board)
+        else:
+            Metrics.inc("cache_requests_total", cache="compiler_uploader", result="hit")
         return cls.__global_compiler_uploader_holder[board]
@@ -23,9 +23,18 @@ class Config:
     proxy = None
     download_url_template = "https://github.com/bq/web2board/archive/devel.zip"
     bitbloq_libs_download_url_template = 'https://github.com/bq/bitbloqLibs/archive/v{version}.zip'
+    bitbloq_libs_manifest_url_template = 'https://api.github.com/repos/bq/bitbloqLibs/git/trees/v{version}?recursive=1'
+    bitbloq_libs_file_url_template = 'https://raw.githubusercontent.com/bq/bitbloqLibs/v{version}/{path}'
     check_online_updates = True
     check_libraries_updates = True
     log_level = logging.INFO
+    diagnostics_enabled = False
+    fail_fast_builds = True
+    warm_build_cache_on_fail_fast = True
+    registry_cache_fresh_seconds = 3600  # cached registry responses are revalidated in background after it
+    registry_cache_max_age_seconds = 7 * 24 * 3600  # cached registry responses are never served after it
+    build_jobs = None  # total compiler processes of all builds, cpu count if None
+    library_versions_kept = 3  # versions of the library store kept when pruning it, the active one included
     plugins_path = (PathsManager.MAIN_PATH + os.sep + "plugins").decode(sys.getfilesystemencoding())
 
     @classmethod
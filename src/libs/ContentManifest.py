@@ -0,0 +1,101 @@
+import hashlib
+import json
+import logging
+import os
+
+from libs import utils
+
+log = logging.getLogger(__name__)
+
+
+def get_blob_hash(path):
+    """
+    Hash of the file as git computes it for blobs, so local files can be compared with the trees of the repository
+    """
+    hasher = hashlib.sha1("blob {}\0".format(os.path.getsize(path)))
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(1024 * 1024), b""):
+            hasher.update(data)
+    return hasher.hexdigest()
+
+
+def _get_stat_stamp(path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_size, stat.st_mtime]
+
+
+class ContentManifest(object):
+    """
+    Relative paths (with "/" separators) of the files of a tree and their git blob hashes. The stat stamps of the
+    files hashed from disk are kept to hash them again only when they change
+    """
+
+    def __init__(self, files=None, stamps=None):
+        self.files = files if files is not None else {}
+        self.stamps = stamps if stamps is not None else {}
+
+    @classmethod
+    def from_github_tree(cls, tree):
+        """
+        :param tree: json of the recursive trees api of github
+        """
+        if tree.get("truncated"):
+            raise ValueError("Truncated tree")
+        return cls({item["path"]: item["sha"] for item in tree["tree"] if item["type"] == "blob"})
+
+    @classmethod
+    def from_directory(cls, root, paths=None, previous=None):
+        """
+        :param paths: relative paths to hash, every file in root if None. Missing files are ignored
+        :param previous: manifest of root whose hashes are reused for the files whose stat did not change
+        """
+        previous = previous if previous is not None else cls()
+        if paths is None:
+            paths = []
+            for dir_path, _, file_names in os.walk(root):
+                relative_dir = os.path.relpath(dir_path, root)
+                for file_name in file_names:
+                    relative_path = os.path.normpath(os.path.join(relative_dir, file_name))
+                    paths.append(relative_path.replace(os.sep, "/"))
+        manifest = cls()
+        for path in paths:
+            full_path = os.path.join(root, *path.split("/"))
+            stamp = _get_stat_stamp(full_path)
+            if stamp is None or not os.path.isfile(full_path):
+                continue
+            if path in previous.files and previous.stamps.get(path) == stamp:
+                manifest.files[path] = previous.files[path]
+            else:
+                manifest.files[path] = get_blob_hash(full_path)
+            manifest.stamps[path] = stamp
+        return manifest
+
+    @classmethod
+    def load(cls, path):
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            return cls(data["files"], data.get("stamps"))
+        except (IOError, ValueError, KeyError):
+            return cls()
+
+    def save(self, path):
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with open(tmp_path, "w") as f:
+            json.dump(dict(files=self.files, stamps=self.stamps), f)
+        utils.replace_file(tmp_path, path)
+
+    def update_stamps(self, root):
+        self.stamps = {path: _get_stat_stamp(os.path.join(root, *path.split("/"))) for path in self.files}
+
+    def diff(self, installed):
+        """
+        :type installed: ContentManifest
+        :return: tuple with the sorted paths that are new or changed and the ones only in installed
+        """
+        changed = sorted(p for p, h in self.files.items() if installed.files.get(p) != h)
+        removed = sorted(p for p in installed.files if p not in self.files)
+        return changed, removed
@@ -1,20 +1,161 @@
 import logging
-from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+import weakref
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from libs.Metrics import Histogram
 
 log = logging.getLogger(__name__)
-__executor = ThreadPoolExecutor(max_workers=25)
 
+DEFAULT_POOL = "default"
+# pools with None size run every task in its own daemon thread (long running loops like serial readers)
+POOLS_SIZES = {
+    DEFAULT_POOL: 10,
+    "io": 8,
+    "compile": 2,
+    "probe": 8,
+    "serial": None,
+    "watchdog": None
+}
 
-def asynchronous():
-    def real_wrapper(fun):
-        def over_function(*args, **kwargs):
-            func = kwargs.pop("__func__")
-            return func(*args, **kwargs)
 
-        def wrapper(*args, **kwargs):
-            kwargs.update({"__func__": fun})
-            return __executor.submit(over_function, *args, **kwargs)
+class _ExceptionReport(object):
+    """
+    Logs the exception of a future collected before anybody retrieved it. It is notified with a weak reference
+    callback instead of a __del__ method of the future, which would make any reference cycle through the future
+    uncollectable in python 2
+    """
+    __pending = set()
+
+    def __init__(self, future, exception, retrieved):
+        self.name = future.name
+        self.exception = exception
+        self.retrieved = retrieved
+        self.__pending.add(weakref.ref(future, self.__on_future_collected))
+
+    def __on_future_collected(self, reference):
+        self.__pending.discard(reference)
+        if not self.retrieved:
+            log.error("Unhandled exception in asynchronous task {}: {}".format(self.name, self.exception))
+
+
+class AsyncFuture(Future):
+    """
+    Future which logs the exception if nobody retrieved it before being garbage collected
+    """
+
+    def __init__(self, name):
+        Future.__init__(self)
+        self.name = name
+        self._exception_retrieved = False
+        self._exception_report = None
+
+    def __set_exception_retrieved(self):
+        with self._condition:
+            self._exception_retrieved = True
+            if self._exception_report is not None:
+                self._exception_report.retrieved = True
+
+    def set_exception(self, exception):
+        with self._condition:
+            self._exception_report = _ExceptionReport(self, exception, self._exception_retrieved)
+        Future.set_exception(self, exception)
+
+    def result(self, timeout=None):
+        self.__set_exception_retrieved()
+        return Future.result(self, timeout)
+
+    def exception(self, timeout=None):
+        self.__set_exception_retrieved()
+        return Future.exception(self, timeout)
+
+
+class ExecutorPool(object):
+    def __init__(self, name, max_workers):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers) if max_workers is not None else None
+        self.active_count = 0
+        self.queued_count = 0
+        self.submitted_count = 0
+        self.failed_count = 0
+        self.wait_latency = Histogram()
+        self.run_latency = Histogram()
+        self.__lock = threading.Lock()
 
+    def __run(self, future, submit_time, func, args, kwargs):
+        start_time = time.time()
+        with self.__lock:
+            self.queued_count -= 1
+        if not future.set_running_or_notify_cancel():
+            return
+        with self.__lock:
+            self.active_count += 1
+        self.wait_latency.observe(start_time - submit_time)
+        # named threads make stack dumps readable
+        threading.current_thread().name = "{}-{}".format(self.name, func.__name__)
+        try:
+            future.set_result(func(*args, **kwargs))
+        except BaseException as e:
+            with self.__lock:
+                self.failed_count += 1
+            future.set_exception(e)
+        finally:
+            with self.__lock:
+                self.active_count -= 1
+            self.run_latency.observe(time.time() - start_time)
+
+    def submit(self, func, *args, **kwargs):
+        future = AsyncFuture(func.__name__)
+        with self.__lock:
+            self.queued_count += 1
+            self.submitted_count += 1
+        run_args = (future, time.time(), func, args, kwargs)
+        if self._executor is not None:
+            self._executor.submit(self.__run, *run_args)
+        else:
+            thread = threading.Thread(target=self.__run, args=run_args, name="{}-{}".format(self.name, func.__name__))
+            thread.daemon = True
+            thread.start()
+        return future
+
+    def get_stats(self):
+        return dict(max_workers=self.max_workers,
+                    queued=self.queued_count,
+                    active=self.active_count,
+                    submitted=self.submitted_count,
+                    failed=self.failed_count,
+                    wait_latency=self.wait_latency.get_dictionary(),
+                    run_latency=self.run_latency.get_dictionary())
+
+
+__pools = dict()
+__pools_lock = threading.Lock()
+
+
+def get_pool(name=DEFAULT_POOL):
+    """
+    :rtype: ExecutorPool
+    """
+    with __pools_lock:
+        if name not in __pools:
+            if name not in POOLS_SIZES:
+                raise KeyError("Unknown executor pool: {}".format(name))
+            __pools[name] = ExecutorPool(name, POOLS_SIZES[name])
+        return __pools[name]
+
+
+def get_pools_stats():
+    with __pools_lock:
+        pools = __pools.items()
+    return {name: pool.get_stats() for name, pool in pools}
+
+
+def asynchronous(pool=DEFAULT_POOL):
+    def real_wrapper(fun):
+        def wrapper(*args, **kwargs):
+            return get_pool(pool).submit(fun, *args, **kwargs)
 
         return wrapper
 
@@ -24,12 +165,7 @@ def asynchronous():
 # import time
 #
 #
-# def callb(value):
-#     print "calback"
-#     print value
-#
-#
-# @asynchronous(callb)
+# @asynchronous(pool="io")
 # def timer(delay):
 #     print "starting"
 #     time.sleep(delay)
@@ -39,4 +175,4 @@ def asynchronous():
 #
 # res = timer(5)
 # print "after async"
-# print "waiting timer to finish with value %s" % res.get()
+# print "waiting timer to finish with value %s" % res.result()
@@ -0,0 +1,140 @@
+import cProfile
+import gc
+import pstats
+import sys
+import threading
+import time
+import traceback
+from StringIO import StringIO
+
+try:
+    import tracemalloc
+except ImportError:  # python 2 only has tracemalloc in patched interpreters
+    tracemalloc = None
+
+
+def _frame_to_collapsed_stack(frame):
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append("{}:{}".format(code.co_filename.rsplit("/", 1)[-1], code.co_name))
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class SamplingProfiler(object):
+    """
+    Samples the stack of every thread each interval and aggregates them as collapsed stacks (flame graph format)
+    """
+
+    def __init__(self, interval=0.005):
+        self.interval = interval
+        self.samples = dict()
+        self.samples_count = 0
+        self.__running = False
+        self.__thread = None
+
+    def __sample_loop(self):
+        own_id = threading.current_thread().ident
+        while self.__running:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_id:
+                    continue
+                stack = _frame_to_collapsed_stack(frame)
+                self.samples[stack] = self.samples.get(stack, 0) + 1
+            self.samples_count += 1
+            time.sleep(self.interval)
+
+    def start(self):
+        self.__running = True
+        self.__thread = threading.Thread(target=self.__sample_loop, name="SamplingProfiler")
+        self.__thread.daemon = True
+        self.__thread.start()
+
+    def stop(self):
+        self.__running = False
+        self.__thread.join()
+        return self.get_collapsed_stacks()
+
+    def get_collapsed_stacks(self):
+        samples = sorted(self.samples.items(), key=lambda x: x[1], reverse=True)
+        return "\n".join("{} {}".format(stack, count) for stack, count in samples)
+
+
+class CallProfiler(object):
+    """
+    Profiles with cProfile every function run through it (cProfile only traces the thread that enables it)
+    and merges all the results
+    """
+
+    def __init__(self):
+        self.stats = None
+        self.__lock = threading.Lock()
+
+    def run(self, func, *args, **kwargs):
+        profile = cProfile.Profile()
+        try:
+            return profile.runcall(func, *args, **kwargs)
+        finally:
+            with self.__lock:
+                if self.stats is None:
+                    self.stats = pstats.Stats(profile)
+                else:
+                    self.stats.add(profile)
+
+    def get_stats_text(self, sort_by="cumulative", limit=50):
+        if self.stats is None:
+            return ""
+        stream = StringIO()
+        with self.__lock:
+            self.stats.stream = stream
+            self.stats.sort_stats(sort_by).print_stats(limit)
+        return stream.getvalue()
+
+
+def get_threads_stacks():
+    threads_names = {thread.ident: thread.name for thread in threading.enumerate()}
+    stacks = dict()
+    for thread_id, frame in sys._current_frames().items():
+        name = "{} ({})".format(threads_names.get(thread_id, "unknown"), thread_id)
+        stacks[name] = "".join(traceback.format_stack(frame))
+    return stacks
+
+
+class MemorySnapshot(object):
+    """
+    Uses tracemalloc if available, otherwise counts living objects by type
+    """
+
+    def __init__(self):
+        if tracemalloc is not None and tracemalloc.is_tracing():
+            self.snapshot = tracemalloc.take_snapshot()
+            self.types_count = None
+        else:
+            self.snapshot = None
+            self.types_count = dict()
+            for obj in gc.get_objects():
+                type_name = type(obj).__name__
+                self.types_count[type_name] = self.types_count.get(type_name, 0) + 1
+
+    def compare_to(self, old_snapshot, limit=30):
+        if self.snapshot is not None and old_snapshot.snapshot is not None:
+            return [str(stat) for stat in self.snapshot.compare_to(old_snapshot.snapshot, "lineno")[:limit]]
+        diff = dict()
+        for type_name, count in self.types_count.items():
+            difference = count - old_snapshot.types_count.get(type_name, 0)
+            if difference != 0:
+                diff[type_name] = difference
+        diff = sorted(diff.items(), key=lambda x: abs(x[1]), reverse=True)[:limit]
+        return ["{}: {:+d}".format(type_name, difference) for type_name, difference in diff]
+
+
+def start_memory_tracing():
+    if tracemalloc is not None and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    return tracemalloc is not None
+
+
+def stop_memory_tracing():
+    if tracemalloc is not None and tracemalloc.is_tracing():
+        tracemalloc.stop()
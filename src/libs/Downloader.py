@@ -1,7 +1,8 @@
+import httplib
 import logging
 import os
-import time
 import sys
+import time
 import urllib2
 
 from libs.Decorators.Asynchronous import asynchronous
@@ -12,49 +13,91 @@ warnings.filterwarnings("ignore", category=UserWarning, module='urllib2')
 
 
 class Downloader:
+    """
+    Downloads with a single request (the total size is taken from its headers) into a buffered file,
+    after a connection error the download continues with a Range request
+    """
     log = logging.getLogger(__name__)
+    CHUNK_SIZE = 256 * 1024
+    BUFFER_SIZE = 1024 * 1024
+    TIMEOUT = 30
+    RETRIES = 3
+    RETRY_DELAY = 1
 
-    def __init__(self, refresh_time=0.2):
+    def __init__(self, refresh_time=0.2, timeout=TIMEOUT, retries=RETRIES):
+        # minimum seconds between info callbacks
         self.refreshTime = refresh_time
+        self.timeout = timeout
+        self.retries = retries
+
+    def __open(self, url, offset):
+        request = urllib2.Request(url)
+        if offset:
+            request.add_header("Range", "bytes={}-".format(offset))
+        return urllib2.urlopen(request, timeout=self.timeout)
+
+    @staticmethod
+    def __get_total_size(site, offset):
+        content_length = site.info().getheader("Content-Length")
+        if content_length is None:
+            return None
+        # partial responses only have the length of the remaining bytes
+        return offset + int(content_length)
+
+    def __write_response(self, site, f, offset, total_size, info_callback):
+        last_callback_time = time.time()
+        for data in iter(lambda: site.read(self.CHUNK_SIZE), ""):
+            f.write(data)
+            offset += len(data)
+            if info_callback is not None and time.time() - last_callback_time >= self.refreshTime:
+                last_callback_time = time.time()
+                info_callback(offset, total_size, offset * 100.0 / float(total_size))
+        return offset
 
-    @asynchronous()
-    def __real_download(self, url_file, dst):
-        if os.path.exists(dst):
-            os.remove(dst)
-        while True:
-            read = url_file.read(10000)  # checking every 10 kb
-            if not read:
-                break
-            with open(dst, 'ab') as f:
-                f.write(read)
-
-    @asynchronous()
+    @asynchronous(pool="io")
     def download(self, url, dst=None, info_callback=None):
         if dst is None:
             dst = url.rsplit("/", 1)[1]
         if not isinstance(url, str):
             url = str(url)
         self.log.debug("downloading form: %s", url)
-        site = urllib2.urlopen(url)
-        download_task = self.__real_download(site, dst)
-        for i in range(3):
-            try:
-                meta = urllib2.urlopen(url).info()
-                total_size = int(meta.getheaders("Content-Length")[0])
-                break
-            except:
-                self.log.exception("Unable to get download file info. retrying in 1s")
-                time.sleep(1)
-
-        else:
-            self.log.warning("Unable get download file size")
-            total_size = sys.maxint
-
-        while not download_task.done():
+        offset = 0
+        total_size = None
+        attempt = 0
+        try:
+            with open(dst, "wb", self.BUFFER_SIZE) as f:
+                while True:
+                    try:
+                        site = self.__open(url, offset)
+                        try:
+                            if offset and site.getcode() != 206:
+                                self.log.warning("Server does not support ranges, restarting download")
+                                f.seek(0)
+                                f.truncate()
+                                offset = 0
+                            if total_size is None:
+                                total_size = self.__get_total_size(site, offset)
+                            offset = self.__write_response(site, f, offset, total_size or sys.maxint, info_callback)
+                        finally:
+                            site.close()
+                        if total_size is None or offset >= total_size:
+                            break
+                        raise IOError("Connection closed after {} of {} bytes".format(offset, total_size))
+                    except urllib2.HTTPError:
+                        raise
+                    except (IOError, httplib.HTTPException):
+                        if attempt >= self.retries:
+                            raise
+                        attempt += 1
+                        self.log.warning("Download of %s interrupted at %d bytes, retrying", url, offset,
+                                         exc_info=1)
+                        f.flush()
+                        time.sleep(self.RETRY_DELAY)
+        except BaseException:
             if os.path.exists(dst):
-                file_size = os.path.getsize(dst)
-                if info_callback is not None:
-                    info_callback(file_size, total_size, file_size * 100.0 / float(total_size))
-                time.sleep(self.refreshTime)
+                os.remove(dst)
+            raise
 
-        return download_task.result()
+        if info_callback is not None:
+            info_callback(offset, total_size or offset, 100.0)
+        return dst
@@ -1,44 +1,171 @@
+import bisect
+import os
 import re
 
-_compile_error_regex = re.compile(r'.*:[0-9]+:[0-9]+: (fatal error|error).*')
-_reference_error_regex = re.compile(r'.*:[0-9]+: .*')
+# file:line[:column]: [severity: ]message, linker errors (undefined reference...) do not have column nor severity
+_diagnostic_regex = re.compile(r'^(?P<file>.+?):(?P<line>\d+):(?:(?P<column>\d+):)? '
+                               r'(?:(?P<severity>fatal error|error|warning|note): )?(?P<message>.*)$')
+# files of the project src folder, relative to the project or built in the src variant dir of an environment
+_user_code_path_regex = re.compile(r'(?:^|[\\/])\.pioenvs[\\/][^\\/]+[\\/]src[\\/]|^src[\\/]')
+_user_code_extensions = (".ino", ".pde")
+_line_marker_regex = re.compile(r'^#line (\d+) "([^"]+)"')
+INO_CONVERTED_FILE = "tmp_ino_to.cpp"
 
 
-def _is_error(line, regex):
-    return line != "" and not line.startswith("scons") and regex.match(line) is not None
+def _iter_lines(text):
+    start = 0
+    while start < len(text):
+        end = text.find("\n", start)
+        end = len(text) if end == -1 else end
+        yield text[start:end].rstrip("\r")
+        start = end + 1
 
 
-def _construct_error(error_str, fine_path, line, column=0):
-    error_str = error_str.decode('string_escape').strip()
-    return dict(file=fine_path, line=int(line), column=int(column), error=error_str)
+def _normalize_path(path):
+    return path.replace("\\", "/").lower()
 
 
-def _parse_compile_error(line):
-    split_line = line.split(":", 4)
-    return _construct_error(split_line[4], split_line[0], split_line[1], split_line[2])
+def _is_user_code_file(file_path, project_src_dir=None):
+    """
+    Sketch files (named by the #line markers) and files of the project src folder, paths can be relative, absolute or
+    windows paths
+    """
+    base_name = re.split(r"[\\/]", file_path)[-1]
+    if base_name.lower().endswith(_user_code_extensions) or base_name == INO_CONVERTED_FILE:
+        return True
+    if _user_code_path_regex.search(file_path) is not None:
+        return True
+    if project_src_dir:
+        return _normalize_path(file_path).startswith(_normalize_path(project_src_dir).rstrip("/") + "/")
+    return False
 
 
-def _parse_reference_error(line):
-    split_line = line.split(":", 3)
-    return _construct_error(split_line[2], split_line[0], split_line[1])
+def is_user_code_error(diagnostic, project_src_dir=None):
+    return diagnostic["severity"] == "error" and _is_user_code_file(diagnostic["file"], project_src_dir)
 
 
-def _get_errors(error_str):
-    errors = []
-    lines = error_str.split("\n\n", 1)[-1].split("\n")
-    for line in lines:
-        if _is_error(line, _compile_error_regex):
-            errors.append(_parse_compile_error(line))
-        elif _is_error(line, _reference_error_regex):
-            errors.append(_parse_reference_error(line))
-    return errors
+class LineMarkersMap(object):
+    """
+    Maps lines of the converted cpp file to the ino lines using the #line markers of InoToCPPConverter
+    """
 
+    def __init__(self, lines):
+        self.generated_lines = []
+        self.markers = []
+        for line_number, line in enumerate(lines, 1):
+            match = _line_marker_regex.match(line)
+            if match is not None:
+                self.generated_lines.append(line_number)
+                self.markers.append((int(match.group(1)), match.group(2)))
 
-def format_compile_result(result):
+    @classmethod
+    def from_file(cls, file_path):
+        try:
+            with open(file_path) as f:
+                return cls(f)
+        except IOError:
+            return None
+
+    def map(self, line):
+        """
+        :return: (file, line) in the original sketch, lines before the first marker (includes and prototypes)
+        are mapped to the first line of code
+        """
+        if not self.markers:
+            return None
+        index = bisect.bisect_left(self.generated_lines, line) - 1
+        if index < 0:
+            return self.markers[0][1], self.markers[0][0]
+        original_line, file_name = self.markers[index]
+        return file_name, original_line + line - self.generated_lines[index] - 1
+
+
+class ErrorParser(object):
+    """
+    Incremental parser of the compiler and linker output, lines can be fed while the build is running.
+    Only a bounded number of diagnostics is kept so memory does not depend on the output size
+    """
+    MAX_DIAGNOSTICS = 100
+    MAX_NOTES = 10
+
+    def __init__(self, project_src_dir=None):
+        self.project_src_dir = project_src_dir
+        self.errors = []
+        self.warnings = []
+        self.errors_count = 0
+        self.warnings_count = 0
+        self._last_diagnostic = None
+        self._line_markers_map = None
+        self._line_markers_loaded = False
+
+    def _get_line_markers_map(self):
+        if not self._line_markers_loaded and self.project_src_dir is not None:
+            self._line_markers_loaded = True
+            self._line_markers_map = LineMarkersMap.from_file(os.path.join(self.project_src_dir, INO_CONVERTED_FILE))
+        return self._line_markers_map
+
+    def _remap(self, diagnostic):
+        if os.path.basename(diagnostic["file"]) != INO_CONVERTED_FILE:
+            return
+        line_markers_map = self._get_line_markers_map()
+        mapped = line_markers_map.map(diagnostic["line"]) if line_markers_map is not None else None
+        if mapped is not None:
+            diagnostic["file"], diagnostic["line"] = mapped
+
+    def feed(self, line):
+        """
+        :return: the parsed diagnostic dictionary or None if the line is not a diagnostic
+        """
+        if line.startswith("scons"):
+            return None
+        match = _diagnostic_regex.match(line)
+        if match is None:
+            return None
+        file_path, line_number, column, severity, message = match.group("file", "line", "column", "severity",
+                                                                        "message")
+        if severity is None:
+            if column is not None:
+                return None  # context lines as "required from here"
+            severity = "error"  # linker errors
+        elif severity == "fatal error":
+            severity = "error"
+        if "\\" in message and isinstance(message, str):
+            message = message.decode('string_escape')
+        diagnostic = dict(file=file_path, line=int(line_number), column=int(column or 0), error=message.strip(),
+                          severity=severity)
+        self._remap(diagnostic)
+
+        if severity == "note":
+            if self._last_diagnostic is not None and len(self._last_diagnostic["notes"]) < self.MAX_NOTES:
+                self._last_diagnostic["notes"].append(diagnostic)
+            return diagnostic
+
+        diagnostic["notes"] = []
+        if severity == "error":
+            self.errors_count += 1
+            diagnostics = self.errors
+        else:
+            self.warnings_count += 1
+            diagnostics = self.warnings
+        if len(diagnostics) < self.MAX_DIAGNOSTICS:
+            diagnostics.append(diagnostic)
+            self._last_diagnostic = diagnostic
+        else:
+            self._last_diagnostic = None
+        return diagnostic
+
+    def feed_text(self, text):
+        for line in _iter_lines(text):
+            self.feed(line)
+        return self
+
+
+def format_compile_result(result, error_parser=None):
     if result[0]:
         return result
-    error_str = result[1]["err"]
-    errors = _get_errors(error_str)
-    if len(errors) > 0:
-        result[1]["err"] = errors
+    if error_parser is None:
+        error_parser = ErrorParser().feed_text(result[1]["err"])
+    if len(error_parser.errors) > 0:
+        result[1]["err"] = error_parser.errors
+        result[1]["warnings"] = error_parser.warnings
     return result
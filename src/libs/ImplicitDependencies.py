@@ -0,0 +1,38 @@
+import hashlib
+import os
+
+
+def get_include_dirs_key(dirs):
+    """
+    Key of the listings of the include dirs. With implicit_cache scons keeps the headers found for every source file
+    and does not search them again, so a new header that shadows one found before (a library copied to the project
+    or user libraries dir) is not used until the dependencies are scanned again.
+    Only the top level entries are listed: the names and, for the library dirs and their "src" dir, the modification
+    time, which changes when a file is added to or removed from them (not when a file is edited)
+    """
+    hasher = hashlib.md5()
+    for include_dir in dirs:
+        hasher.update(include_dir + "\0")
+        if not os.path.isdir(include_dir):
+            continue
+        for name in sorted(os.listdir(include_dir)):
+            hasher.update(name + "\0")
+            path = os.path.join(include_dir, name)
+            for listed_dir in (path, os.path.join(path, "src")):
+                if os.path.isdir(listed_dir):
+                    hasher.update(repr(os.path.getmtime(listed_dir)) + "\0")
+    return hasher.hexdigest()
+
+
+def get_decider(immutable_dirs):
+    """
+    Decider of "MD5-timestamp" that does not check the dependencies in the immutable dirs once they were built
+    """
+    immutable_dirs = tuple(d.rstrip(os.sep) + os.sep for d in immutable_dirs)
+
+    def _decide_if_changed(dependency, target, prev_ni):
+        if prev_ni is not None and dependency.srcnode().get_abspath().startswith(immutable_dirs):
+            return False
+        return dependency.changed_timestamp_then_content(target, prev_ni)
+
+    return _decide_if_changed
@@ -0,0 +1,168 @@
+import logging
+import os
+import socket
+import threading
+from collections import deque
+from contextlib import contextmanager
+from multiprocessing import cpu_count
+
+log = logging.getLogger(__name__)
+
+JOB_SERVER_ENV_VAR = "WEB2BOARD_JOB_SERVER"
+
+
+def _get_cpu_count():
+    try:
+        return cpu_count()
+    except NotImplementedError:
+        return 1
+
+
+class JobServer(object):
+    """
+    Compiler job tokens (as the make jobserver) shared by the scons build and the syntax checks of this web2board
+    process (only one web2board runs per host). Free tokens go to the waiting requests in arrival order. Every token
+    of a scons process is bound to the connection which acquired it so killed builds give their tokens back
+    """
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, tokens=None):
+        self.tokens = tokens or _get_cpu_count()
+        self.available = self.tokens
+        self._waiting = deque()
+        self._lock = threading.Lock()
+        self._socket = None
+        self.address = None
+
+    def start(self):
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._socket.bind(("127.0.0.1", 0))
+        self._socket.listen(64)
+        self.address = self._socket.getsockname()
+        thread = threading.Thread(target=self._accept_loop, name="JobServer")
+        thread.daemon = True
+        thread.start()
+        log.debug("Job server listening in {} with {} tokens".format(self.address, self.tokens))
+        return self
+
+    def _accept_loop(self):
+        while True:
+            try:
+                connection, _ = self._socket.accept()
+            except socket.error:
+                return
+            thread = threading.Thread(target=self._handle_connection, args=(connection,), name="JobServer-client")
+            thread.daemon = True
+            thread.start()
+
+    def _handle_connection(self, connection):
+        try:
+            request = connection.makefile("rb").readline().split()
+            if request != ["acquire"]:
+                return
+            self.acquire()
+            try:
+                connection.sendall("ok\n")
+                connection.recv(16)  # release message or connection closed
+            finally:
+                self.release()
+        except socket.error:
+            log.debug("Job server connection error", exc_info=1)
+        finally:
+            connection.close()
+
+    def acquire(self, timeout=None):
+        with self._lock:
+            if self.available > 0 and not self._waiting:
+                self.available -= 1
+                return True
+            event = threading.Event()
+            self._waiting.append(event)
+        if event.wait(timeout):
+            return True
+        with self._lock:
+            if event.is_set():
+                return True
+            self._waiting.remove(event)
+            return False
+
+    def release(self):
+        with self._lock:
+            if self._waiting:
+                self._waiting.popleft().set()
+            else:
+                self.available += 1
+
+    @contextmanager
+    def token(self):
+        """
+        Holds a token for a command run by this process
+        """
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def get_stats(self):
+        with self._lock:
+            return dict(tokens=self.tokens, available=self.available, waiting=len(self._waiting))
+
+    def get_environment_value(self):
+        return "{}:{}".format(self.address[0], self.address[1])
+
+    @classmethod
+    def get_instance(cls):
+        """
+        :rtype: JobServer
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                from libs.Config import Config
+                cls._instance = JobServer(Config.build_jobs).start()
+            return cls._instance
+
+
+class JobTokenClient(object):
+    """
+    Used inside the scons process to run every command holding a token of the web2board job server
+    """
+
+    def __init__(self, address):
+        self.address = address
+
+    @classmethod
+    def from_environment(cls, environment=os.environ):
+        value = environment.get(JOB_SERVER_ENV_VAR)
+        if not value:
+            return None
+        host, port = value.rsplit(":", 1)
+        return cls((host, int(port)))
+
+    @contextmanager
+    def token(self):
+        connection = None
+        try:
+            connection = socket.create_connection(self.address)
+            connection.sendall("acquire\n")
+            connection.makefile("rb").readline()
+        except socket.error:
+            # without job server the command runs anyway
+            connection = None
+        try:
+            yield
+        finally:
+            if connection is not None:
+                try:
+                    connection.sendall("release\n")
+                except socket.error:
+                    pass
+                connection.close()
+
+    def wrap_spawn(self, spawn):
+        def spawn_with_token(*args, **kwargs):
+            with self.token():
+                return spawn(*args, **kwargs)
+
+        return spawn_with_token
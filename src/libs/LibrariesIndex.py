@@ -0,0 +1,139 @@
+import cPickle
+import os
+import re
+import sys
+from hashlib import md5
+
+from libs import utils
+
+
+class LibrariesIndex(object):
+    """
+    Persistent header->library index of every library source dir of the builder (validated with the mtime/inode of
+    all its directories) and cache of the includes of every parsed file by content hash
+    """
+
+    VERSION = 2
+    INCLUDES_RE = re.compile(r"^\s*#include\s+(\<|\")([^\>\"\']+)(?:\>|\")", re.M)
+    # file systems of windows and mac are case insensitive, "servo.h" is found as "Servo.h"
+    CASE_INSENSITIVE = sys.platform.startswith(("win", "darwin"))
+
+    def __init__(self, path):
+        self.path = path
+        self.dirs = {}
+        self.includes = {}
+        self._used_includes = {}
+        self._changed = False
+        try:
+            with open(path, "rb") as f:
+                data = cPickle.load(f)
+            if data['version'] == self.VERSION:
+                self.dirs = data['dirs']
+                self.includes = data['includes']
+        except Exception:  # pylint: disable=broad-except
+            pass
+
+    @staticmethod
+    def _get_stamp(path):
+        st = os.stat(path)
+        return st.st_mtime, st.st_ino
+
+    def _is_valid(self, stamps):
+        for path, stamp in stamps.iteritems():
+            try:
+                if self._get_stamp(path) != stamp:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def _build_dir_index(self, lsd_dir):
+        stamps = {lsd_dir: self._get_stamp(lsd_dir)}
+        libs = []
+        in_root = {}
+        in_src = {}
+        for ld in sorted(os.listdir(lsd_dir)):
+            lib_dir = os.path.join(lsd_dir, ld)
+            if not os.path.isdir(lib_dir):
+                continue
+            libs.append(ld)
+            src_dir = os.path.join(lib_dir, "src")
+            for root, _, files in os.walk(lib_dir, followlinks=True):
+                stamps[root] = self._get_stamp(root)
+                for f in files:
+                    inc_path = os.path.join(root, f)
+                    in_root.setdefault(os.path.relpath(inc_path, lib_dir), {})[ld] = (lib_dir, inc_path)
+                    if inc_path.startswith(src_dir + os.sep):
+                        in_src.setdefault(os.path.relpath(inc_path, src_dir), {})[ld] = (src_dir, inc_path)
+
+        # headers in the library root have priority over the ones in "src"
+        headers = in_src
+        for name, libs_found in in_root.iteritems():
+            headers.setdefault(name, {}).update(libs_found)
+        lower_names = {}
+        for name in headers:
+            lower_names.setdefault(name.lower(), []).append(name)
+        return dict(stamps=stamps, libs=libs, headers=headers, lower_names=lower_names)
+
+    def get_dir_index(self, lsd_dir):
+        index = self.dirs.get(lsd_dir)
+        if index is None or not self._is_valid(index['stamps']):
+            index = self._build_dir_index(lsd_dir)
+            self.dirs[lsd_dir] = index
+            self._changed = True
+        return index
+
+    def _get_libs_with_header(self, index, name):
+        libs_found = index['headers'].get(name)
+        if libs_found or not self.CASE_INSENSITIVE:
+            return libs_found
+        libs_found = {}
+        for found_name in sorted(index['lower_names'].get(name.lower(), [])):
+            for ld, found in index['headers'][found_name].iteritems():
+                libs_found.setdefault(ld, found)
+        return libs_found
+
+    def find_header(self, lsd_dir, name, lib_use=(), lib_ignore=()):
+        """
+        Same order as probing the files: libraries of lib_use first and then the sorted libraries of lsd_dir,
+        the library root before its "src" dir
+        :param name: normalized path of the include
+        :return: tuple of library name, library dir and header path or None if not found
+        """
+        index = self.get_dir_index(lsd_dir)
+        libs_found = self._get_libs_with_header(index, name)
+        if not libs_found:
+            return None
+        for ld in list(lib_use) + index['libs']:
+            # ignore user's specified libs
+            if ld not in libs_found or ld in lib_ignore:
+                continue
+            lib_dir, inc_path = libs_found[ld]
+            return ld, lib_dir, inc_path
+        return None
+
+    def get_includes(self, contents):
+        if isinstance(contents, unicode):
+            contents = contents.encode("utf-8")
+        key = md5(contents).hexdigest()
+        includes = self.includes.get(key)
+        if includes is None:
+            includes = self.INCLUDES_RE.findall(contents)
+            self._changed = True
+        self._used_includes[key] = includes
+        return includes
+
+    def save(self):
+        # only the includes of the files used in this build are kept
+        if not self._changed and len(self._used_includes) == len(self.includes):
+            return
+        data = dict(version=self.VERSION, dirs=self.dirs, includes=self._used_includes)
+        tmp_path = self.path + ".tmp"
+        try:
+            if not os.path.isdir(os.path.dirname(self.path)):
+                os.makedirs(os.path.dirname(self.path))
+            with open(tmp_path, "wb") as f:
+                cPickle.dump(data, f, cPickle.HIGHEST_PROTOCOL)
+            utils.replace_file(tmp_path, self.path)
+        except (IOError, OSError):
+            pass
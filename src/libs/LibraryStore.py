@@ -0,0 +1,228 @@
+import logging
+import os
+import shutil
+import threading
+
+from libs import utils
+from libs.ContentManifest import ContentManifest
+
+log = logging.getLogger(__name__)
+
+
+class LibraryStoreError(Exception):
+    pass
+
+
+class LibraryStore(object):
+    """
+    Versions of bitbloqLibs side by side. Every file is stored once by its blob hash (objects) and every version is a
+    tree of hard links to the objects (copies where hard links are not available), so the files shared by versions are
+    neither downloaded nor stored again. A version never changes once added and the active one is only a pointer file,
+    switching versions does not touch any library file.
+    The libraries of the user libraries dir (libraries_path) have priority over the ones of the store in the builds
+    """
+    OBJECTS_DIR = "objects"
+    VERSIONS_DIR = "versions"
+    LEGACY_DIR = "legacy"
+    ACTIVE_VERSION_FILE = "active_version"
+    KEPT_VERSIONS = 3
+    BUILD_VERSIONS_DIR = "libversions"
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+
+    def get_object_path(self, blob_hash):
+        return os.path.join(self.root, self.OBJECTS_DIR, blob_hash[:2], blob_hash[2:])
+
+    def get_version_path(self, version):
+        return os.path.join(self.root, self.VERSIONS_DIR, version)
+
+    def get_manifest_path(self, version):
+        # written once the tree of the version is complete
+        return os.path.join(self.root, self.VERSIONS_DIR, version + ".json")
+
+    def get_staging_path(self):
+        """
+        Temporary directory in the store (same file system as the objects, so files are moved to it)
+        """
+        return os.path.join(self.root, "staging-{}".format(os.getpid()))
+
+    def has_version(self, version):
+        return os.path.isfile(self.get_manifest_path(version)) and os.path.isdir(self.get_version_path(version))
+
+    def get_versions(self):
+        versions_path = os.path.join(self.root, self.VERSIONS_DIR)
+        if not os.path.isdir(versions_path):
+            return []
+        return sorted(name[:-len(".json")] for name in os.listdir(versions_path)
+                      if name.endswith(".json") and self.has_version(name[:-len(".json")]))
+
+    def get_manifest(self, version):
+        """
+        :rtype: ContentManifest
+        """
+        return ContentManifest.load(self.get_manifest_path(version))
+
+    def get_missing_files(self, manifest):
+        """
+        :type manifest: ContentManifest
+        :return: sorted paths of manifest whose content is not stored yet
+        """
+        return sorted(path for path, blob_hash in manifest.files.items()
+                      if not os.path.isfile(self.get_object_path(blob_hash)))
+
+    def add_object(self, path, blob_hash):
+        """
+        Moves the file in path to the objects, it is removed if the content was already stored
+        """
+        object_path = self.get_object_path(blob_hash)
+        if os.path.isfile(object_path):
+            os.remove(path)
+            return
+        if not os.path.isdir(os.path.dirname(object_path)):
+            os.makedirs(os.path.dirname(object_path))
+        os.rename(path, object_path)
+
+    @staticmethod
+    def _link(object_path, file_path):
+        if hasattr(os, "link"):
+            try:
+                os.link(object_path, file_path)
+                return
+            except OSError:
+                log.debug("Unable to link {}, copying it".format(object_path), exc_info=1)
+        shutil.copy2(object_path, file_path)
+
+    def add_version(self, version, manifest):
+        """
+        Creates the tree of the version with the stored objects of manifest
+        :type manifest: ContentManifest
+        """
+        missing = self.get_missing_files(manifest)
+        if missing:
+            raise LibraryStoreError("Files of version {} not stored: {}".format(version, ", ".join(missing[:10])))
+        version_path = self.get_version_path(version)
+        tree_path = "{}.{}.tmp".format(version_path, os.getpid())
+        if os.path.exists(tree_path):
+            shutil.rmtree(tree_path)
+        for path, blob_hash in manifest.files.items():
+            file_path = os.path.join(tree_path, *path.split("/"))
+            if not os.path.isdir(os.path.dirname(file_path)):
+                os.makedirs(os.path.dirname(file_path))
+            self._link(self.get_object_path(blob_hash), file_path)
+        with self._lock:
+            if os.path.exists(version_path):
+                shutil.rmtree(version_path)
+            os.rename(tree_path, version_path)
+            ContentManifest(manifest.files).save(self.get_manifest_path(version))
+        log.info("Version {} of the libraries stored with {} files".format(version, len(manifest.files)))
+
+    def get_active_version(self):
+        try:
+            with open(os.path.join(self.root, self.ACTIVE_VERSION_FILE)) as f:
+                version = f.read().strip()
+        except IOError:
+            return None
+        return version if version and self.has_version(version) else None
+
+    def get_active_path(self):
+        version = self.get_active_version()
+        return self.get_version_path(version) if version is not None else None
+
+    def set_active_version(self, version):
+        if not self.has_version(version):
+            raise LibraryStoreError("Version {} of the libraries is not stored".format(version))
+        path = os.path.join(self.root, self.ACTIVE_VERSION_FILE)
+        tmp_path = "{}.{}.tmp".format(path, os.getpid())
+        with self._lock:
+            with open(tmp_path, "w") as f:
+                f.write(version)
+            utils.replace_file(tmp_path, path)
+        log.info("Active version of the libraries: {}".format(version))
+
+    def _get_versions_by_age(self):
+        return sorted(self.get_versions(), key=lambda v: os.path.getmtime(self.get_manifest_path(v)), reverse=True)
+
+    def prune(self, keep=KEPT_VERSIONS, builds_dir=None):
+        """
+        Removes the versions but the active one and the last added ones (keep in total, the previous version can be
+        in use by running builds) and the objects of the removed versions
+        :param builds_dir: dir with the build dirs of the environments (.pioenvs), the libraries built from the
+        removed versions are removed too
+        """
+        active_version = self.get_active_version()
+        versions = self._get_versions_by_age()
+        kept = [v for v in versions if v == active_version] + [v for v in versions if v != active_version][:keep - 1]
+        with self._lock:
+            try:
+                for version in versions:
+                    if version not in kept:
+                        # without manifest the version is not stored anymore
+                        os.remove(self.get_manifest_path(version))
+                        shutil.rmtree(self.get_version_path(version), ignore_errors=True)
+                        if builds_dir is not None and os.path.isdir(builds_dir):
+                            for env_name in os.listdir(builds_dir):
+                                shutil.rmtree(os.path.join(builds_dir, env_name, self.BUILD_VERSIONS_DIR, version),
+                                              ignore_errors=True)
+                        log.info("Version {} of the libraries removed from the store".format(version))
+                used_objects = set()
+                for version in kept:
+                    used_objects.update(self.get_manifest(version).files.values())
+                for dir_path, _, file_names in os.walk(os.path.join(self.root, self.OBJECTS_DIR)):
+                    for file_name in file_names:
+                        if os.path.basename(dir_path) + file_name not in used_objects:
+                            os.remove(os.path.join(dir_path, file_name))
+            except OSError:
+                log.warning("Unable to prune the library store", exc_info=1)
+
+    def migrate_legacy_libraries(self, lib_dir):
+        """
+        Previous versions of web2board copied the libraries into the user libraries dir, where they would shadow the
+        ones of the store. The copies whose files are the ones of a stored version are moved to the legacy dir of the
+        store, the edited copies are kept as user libraries
+        :return: names of the moved libraries
+        """
+        if lib_dir is None or not os.path.isdir(lib_dir):
+            return []
+        manifests = [self.get_manifest(version) for version in self._get_versions_by_age()]
+        moved = []
+        for library in sorted(os.listdir(lib_dir)):
+            library_path = os.path.join(lib_dir, library)
+            if not os.path.isdir(library_path):
+                continue
+            is_stored_library = False
+            for manifest in manifests:
+                files = {path: blob_hash for path, blob_hash in manifest.files.items()
+                         if path.startswith(library + "/")}
+                if not files:
+                    continue
+                is_stored_library = True
+                if ContentManifest.from_directory(lib_dir, files.keys()).files == files:
+                    legacy_path = os.path.join(self.root, self.LEGACY_DIR, library)
+                    if os.path.exists(legacy_path):
+                        shutil.rmtree(legacy_path)
+                    shutil.move(library_path, legacy_path)
+                    moved.append(library)
+                    break
+            else:
+                if is_stored_library:
+                    log.warning("Library {} of {} was edited, it has priority over the library store"
+                                .format(library, lib_dir))
+        if moved:
+            log.info("Copies of the libraries moved from {} to {}: {}"
+                     .format(lib_dir, os.path.join(self.root, self.LEGACY_DIR), ", ".join(moved)))
+        return moved
+
+    @classmethod
+    def get_instance(cls):
+        """
+        :rtype: LibraryStore
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                from platformio.util import get_home_dir
+                cls._instance = LibraryStore(os.path.join(get_home_dir(), "bitbloqLibs"))
+        return cls._instance
@@ -1,3 +1,4 @@
+import atexit
 import copy
 import importlib
 import json
@@ -6,7 +7,9 @@ import logging.config
 import logging.handlers
 import os
 import sys
+import threading
 import time
+from Queue import Queue, Full, Empty
 from datetime import datetime
 from logging import Handler
 
@@ -19,7 +22,35 @@ __author__ = 'jorge.garcia'
 FILE_ENCODING = sys.getfilesystemencoding()
 
 
+def decode_record(record):
+    """
+    Merges msg and args into a unicode message only once so sinks do not need to copy and re-format the record
+    """
+    try:
+        message = record.getMessage()
+    except:
+        try:
+            message = record.msg.decode(FILE_ENCODING)
+            if record.args:
+                message = message % record.args
+        except:
+            try:
+                message = record.msg.decode("utf-8", errors="replace")
+                if record.args:
+                    message = message % record.args
+            except:
+                message = "Unable to format record"
+    if isinstance(message, str):
+        message = message.decode(FILE_ENCODING, "replace")
+    record.msg = message
+    record.args = None
+    record.is_decoded = True
+    return record
+
+
 def getDecodedMessage(record, handler):
+    if getattr(record, "is_decoded", False):
+        return record
     # Need to make an actual copy of the record
     # to prevent altering the message for other loggers
     myRecord = copy.copy(record)
@@ -91,8 +122,193 @@ class HubsHandler(Handler):
         subscribedClients.onLoggingMessage(datetime.now().isoformat(), r.levelno, r.msg, self.format(r))
 
 
-def init_logging(name):
+_exception_formatter = logging.Formatter()
+_STOP_DISPATCHER = object()
+
+
+class AsyncLoggingHandler(Handler):
+    """
+    Front end handler, logging calls only render the message once and enqueue the record, a background thread
+    dispatches it to the sinks (console, file and hubs handlers) in batches
+    """
+    QUEUE_SIZE = 10000
+    BATCH_SIZE = 100
+
+    def __init__(self, sinks=None, queue_size=QUEUE_SIZE):
+        Handler.__init__(self)
+        self.sinks = list(sinks) if sinks is not None else []
+        """:type : list of Handler"""
+        self.queue = Queue(maxsize=queue_size)
+        self.dropped_records = 0
+        self.dispatched_records = 0
+        self.__reported_dropped_records = 0
+        self.__dispatcher = threading.Thread(target=self.__dispatch_loop, name="LoggingDispatcher")
+        self.__dispatcher.daemon = True
+        self.__dispatcher.start()
+
+    def handle(self, record):
+        # skip Handler's lock, the queue is already thread safe
+        if self.filter(record):
+            self.emit(record)
+        return record
+
+    def emit(self, record):
+        # the message and traceback are rendered now, the args may change before the record is dispatched
+        try:
+            self.prepare(record)
+        except:
+            self.handleError(record)
+            return
+        try:
+            self.queue.put_nowait(record)
+        except Full:
+            self.acquire()
+            try:
+                self.dropped_records += 1
+            finally:
+                self.release()
+
+    @staticmethod
+    def prepare(record):
+        decode_record(record)
+        if record.exc_info:
+            if not record.exc_text:
+                record.exc_text = _exception_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def add_sink(self, sink):
+        self.sinks.append(sink)
+
+    def get_stats(self):
+        return dict(queued=self.queue.qsize(), dropped=self.dropped_records, dispatched=self.dispatched_records)
+
+    def flush(self, timeout=2):
+        if threading.current_thread() is self.__dispatcher:
+            return
+        watchdog = time.time()
+        while self.queue.unfinished_tasks > 0 and time.time() - watchdog < timeout:
+            time.sleep(0.01)
+
+    def close(self, timeout=2):
+        """
+        Dispatches the queued records and stops the dispatcher thread, the sinks are not closed
+        """
+        if self.__dispatcher.is_alive():
+            self.flush(timeout)
+            self.queue.put(_STOP_DISPATCHER)
+            if threading.current_thread() is not self.__dispatcher:
+                self.__dispatcher.join(timeout)
+        Handler.close(self)
+
+    def is_dispatching(self):
+        return self.__dispatcher.is_alive()
+
+    def __get_batch(self):
+        batch = [self.queue.get()]
+        try:
+            while len(batch) < self.BATCH_SIZE:
+                batch.append(self.queue.get_nowait())
+        except Empty:
+            pass
+        return batch
+
+    def __report_dropped_records(self):
+        dropped = self.dropped_records - self.__reported_dropped_records
+        if dropped > 0:
+            self.__reported_dropped_records += dropped
+            record = logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                                       "Logging queue full, %d records dropped", (dropped,), None)
+            self.__dispatch(record)
+
+    def __dispatch(self, record):
+        if not getattr(record, "is_decoded", False):
+            decode_record(record)
+        for sink in self.sinks:
+            if record.levelno >= sink.level:
+                try:
+                    sink.handle(record)
+                except:
+                    sink.handleError(record)
+        self.dispatched_records += 1
+
+    def __dispatch_loop(self):
+        while True:
+            batch = self.__get_batch()
+            self.__report_dropped_records()
+            for record in batch:
+                if record is _STOP_DISPATCHER:
+                    self.queue.task_done()
+                    return
+                try:
+                    self.__dispatch(record)
+                except:
+                    self.handleError(record)
+                finally:
+                    self.queue.task_done()
+
+
+def get_async_logging_handler():
+    """
+    :rtype: AsyncLoggingHandler | None
+    """
+    for handler in logging.getLogger().handlers:
+        if isinstance(handler, AsyncLoggingHandler):
+            return handler
+    return None
+
+
+def flush_logging(timeout=2):
+    handler = get_async_logging_handler()
+    if handler is not None:
+        handler.flush(timeout)
+
+
+_async_handler = None
+""":type : AsyncLoggingHandler"""
+
+
+def _flush_async_handler():
+    if _async_handler is not None:
+        _async_handler.flush()
+
+
+def _move_root_handlers_to_async_handler():
+    """
+    Replaces the root handlers by one AsyncLoggingHandler dispatching to them. Calling it again replaces the
+    previous async handler (its thread is stopped), the sinks it was dispatching to are kept if still in use
+    """
+    global _async_handler
+    root = logging.getLogger()
+    sinks = []
+    for handler in list(root.handlers):
+        sinks.extend(handler.sinks if isinstance(handler, AsyncLoggingHandler) else [handler])
+        root.removeHandler(handler)
+    previous_handler = _async_handler
+    _async_handler = AsyncLoggingHandler(sinks)
+    root.addHandler(_async_handler)
+    if previous_handler is None:
+        atexit.register(_flush_async_handler)
+    else:
+        previous_handler.close()
+        for sink in previous_handler.sinks:
+            if sink not in sinks:
+                sink.close()
+
+
+def _load_logging_config(log_dir=None):
+    with open(PathsManager.RES_LOGGING_CONFIG_PATH) as f:
+        config = json.load(f)
+    if log_dir is not None:
+        for handler in config.get("handlers", {}).values():
+            if "filename" in handler and not os.path.isabs(handler["filename"]):
+                handler["filename"] = os.path.join(log_dir, handler["filename"])
+    return config
+
+
+def init_logging(name, log_dir=None):
     """
+    :param log_dir: directory for relative log file names, defaults to the working directory
     :rtype: logging.Logger
     """
     if PathsManager.MAIN_PATH == PathsManager.get_copy_path_for_update():
@@ -104,7 +320,8 @@ def init_logging(name):
         log.addHandler(file_handler)
         log.setLevel(logging.DEBUG)
     else:
-        logging.config.dictConfig(json.load(open(PathsManager.RES_LOGGING_CONFIG_PATH)))
+        logging.config.dictConfig(_load_logging_config(log_dir))
         logging.getLogger("ws4py").setLevel(logging.ERROR)
+        _move_root_handlers_to_async_handler()
 
     return logging.getLogger(name)
\ No newline at end of file
@@ -15,13 +15,15 @@ from Scripts.TestRunner import run_all_test, run_integration_test, run_unit_test
 from libs import utils
 from libs.Config import Config
 from libs.Decorators.Asynchronous import asynchronous
+from libs.LoggingUtils import flush_logging
 from libs.PathsManager import PathsManager
 from libs.Updaters.BitbloqLibsUpdater import BitbloqLibsUpdater
 from libs.Updaters.Web2boardUpdater import Web2BoardUpdater
 from libs.Version import Version
 from libs.WSCommunication.Clients.hubs_api import HubsAPI
-from libs.WSCommunication.ConnectionHandler import WSConnectionHandler
+from libs.WSCommunication.ConnectionHandler import MetricsRequestHandler, WSConnectionHandler
 from libs.WSCommunication.ConsoleHandler import ConsoleHandler
+from platformio.app import flush_state
 
 log = logging.getLogger(__name__)
 __mainApp = None
@@ -116,7 +118,7 @@ class MainApp:
 
         return options
 
-    @asynchronous()
+    @asynchronous(pool="io")
     def update_libraries_if_necessary(self):
         try:
             if Config.check_libraries_updates:
@@ -151,7 +153,7 @@ class MainApp:
     def initialize_server_and_communication_protocol(self, options):
         # do not call this line in executable
         self.__construct_api_files()
-        self.w2b_server = web.Application([(r'/(.*)', WSConnectionHandler)])
+        self.w2b_server = web.Application([(r'/metrics', MetricsRequestHandler), (r'/(.*)', WSConnectionHandler)])
         Config.web_socket_port = options.port
         self.w2b_server.listen(options.port)
         return self.w2b_server
@@ -187,6 +189,12 @@ class MainApp:
 
 def force_quit():
     try:
+        # os._exit does not run the atexit handlers
+        flush_state()
+    except Exception:
+        log.exception("Unable to save the state before quitting")
+    try:
+        flush_logging()
         os._exit(1)
     finally:
         pass
@@ -0,0 +1,143 @@
+import bisect
+import threading
+
+
+class Histogram(object):
+    """
+    Cumulative latency histogram, bucket limits are upper bounds in seconds
+    """
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 60)
+
+    def __init__(self, buckets=BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.__lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.__lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value
+
+    def get_dictionary(self):
+        with self.__lock:
+            cumulative = 0
+            buckets = []
+            for limit, count in zip(self.buckets + ("+Inf",), self.counts):
+                cumulative += count
+                buckets.append((limit, cumulative))
+            return dict(buckets=buckets, count=self.count, sum=self.sum)
+
+
+def _escape_label_value(value):
+    return unicode(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels, extra_label=None):
+    labels = list(labels) + ([extra_label] if extra_label is not None else [])
+    if not labels:
+        return ""
+    return "{" + ",".join(u'{}="{}"'.format(k, _escape_label_value(v)) for k, v in labels) + "}"
+
+
+class Metrics(object):
+    """
+    Process wide registry of counters, gauges and histograms identified by name and labels
+    """
+    PREFIX = "web2board_"
+    counters = dict()
+    gauges = dict()
+    histograms = dict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _get_key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    @classmethod
+    def inc(cls, name, value=1, **labels):
+        key = cls._get_key(name, labels)
+        with cls._lock:
+            cls.counters[key] = cls.counters.get(key, 0) + value
+
+    @classmethod
+    def set_gauge(cls, name, value, **labels):
+        cls.gauges[cls._get_key(name, labels)] = value
+
+    @classmethod
+    def observe(cls, name, value, **labels):
+        key = cls._get_key(name, labels)
+        histogram = cls.histograms.get(key)
+        if histogram is None:
+            with cls._lock:
+                histogram = cls.histograms.setdefault(key, Histogram())
+        histogram.observe(value)
+
+    @classmethod
+    def register_histogram(cls, name, histogram, **labels):
+        cls.histograms[cls._get_key(name, labels)] = histogram
+
+    @classmethod
+    def get_counter(cls, name, **labels):
+        return cls.counters.get(cls._get_key(name, labels), 0)
+
+    @classmethod
+    def get_cache_hit_ratios(cls):
+        requests = dict()
+        for (name, labels), value in cls.counters.items():
+            if name != "cache_requests_total":
+                continue
+            labels = dict(labels)
+            hits, total = requests.get(labels["cache"], (0, 0))
+            hits += value if labels["result"] == "hit" else 0
+            requests[labels["cache"]] = hits, total + value
+        return {cache: float(hits) / total for cache, (hits, total) in requests.items() if total}
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls.counters.clear()
+            cls.gauges.clear()
+            cls.histograms.clear()
+
+    @classmethod
+    def get_dictionary(cls):
+        def to_list(metrics_dict, value_getter=lambda v: v):
+            return [dict(name=name, labels=dict(labels), value=value_getter(value))
+                    for (name, labels), value in sorted(metrics_dict.items())]
+
+        return dict(counters=to_list(cls.counters),
+                    gauges=to_list(cls.gauges),
+                    histograms=to_list(cls.histograms, lambda h: h.get_dictionary()),
+                    cache_hit_ratios=cls.get_cache_hit_ratios())
+
+    @classmethod
+    def to_prometheus(cls):
+        lines = []
+        typed_names = set()
+
+        def add_type(name, metric_type):
+            if name not in typed_names:
+                typed_names.add(name)
+                lines.append("# TYPE {} {}".format(name, metric_type))
+
+        for (name, labels), value in sorted(cls.counters.items()):
+            name = cls.PREFIX + name
+            add_type(name, "counter")
+            lines.append(u"{}{} {}".format(name, _format_labels(labels), value))
+        for (name, labels), value in sorted(cls.gauges.items()):
+            name = cls.PREFIX + name
+            add_type(name, "gauge")
+            lines.append(u"{}{} {}".format(name, _format_labels(labels), value))
+        for (name, labels), histogram in sorted(cls.histograms.items()):
+            name = cls.PREFIX + name
+            add_type(name, "histogram")
+            data = histogram.get_dictionary()
+            for limit, count in data["buckets"]:
+                lines.append(u"{}_bucket{} {}".format(name, _format_labels(labels, ("le", limit)), count))
+            lines.append(u"{}_sum{} {}".format(name, _format_labels(labels), data["sum"]))
+            lines.append(u"{}_count{} {}".format(name, _format_labels(labels), data["count"]))
+        return u"\n".join(lines) + u"\n"
@@ -102,12 +102,19 @@ class Packager:
         os.chdir(self.src_path)
         try:
             self._get_platformio_packages()
+            self._create_platforms_manifest()
             self._construct_web2board_executable()
             # shutil.move(self.installer_creation_executables_path, join(self.installer_creation_dist_path, "web2board"))
             self._construct_link_executable()
         finally:
             os.chdir(current_path)
 
+    @staticmethod
+    def _create_platforms_manifest():
+        log.debug("Creating platforms manifest")
+        platforms_dir = join(util.get_source_dir(), "platforms")
+        PlatformFactory.create_manifest(platforms_dir, join(platforms_dir, PlatformFactory.MANIFEST_NAME))
+
     def _construct_link_executable(self):
         os.chdir(self.src_path)
         log.debug("Creating Web2boardLink Executable")
@@ -204,6 +211,7 @@ class Packager:
         os.chdir(self.src_path)
         try:
             self._get_platformio_packages()
+            self._create_platforms_manifest()
             self._construct_web2board_executable()
             shutil.move(join(self.installer_creation_dist_path, "web2board"), self.installer_offline_path)
         finally:
@@ -0,0 +1,33 @@
+import hashlib
+import json
+import os
+import shutil
+
+
+def get_key(command_line, header_path, packages_versions):
+    """
+    Key of the directory of the precompiled header. Gcc only checks the flags and macros of a .gch, not the headers
+    it was built from, so besides the compile command line the key has the content of the header and the versions
+    of the installed packages (the framework and toolchain headers it includes)
+    :param packages_versions: dictionary with the versions of the installed packages by name
+    """
+    hasher = hashlib.md5(command_line)
+    try:
+        with open(header_path, "rb") as f:
+            hasher.update(f.read())
+    except IOError:
+        pass
+    hasher.update(json.dumps(packages_versions, sort_keys=True))
+    return hasher.hexdigest()[:10]
+
+
+def remove_stale_dirs(pch_root, key):
+    """
+    Removes the precompiled header directories of the other keys, they are not valid for the current build anymore
+    """
+    if not os.path.isdir(pch_root):
+        return
+    for name in os.listdir(pch_root):
+        path = os.path.join(pch_root, name)
+        if name != key and os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
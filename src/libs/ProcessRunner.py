@@ -0,0 +1,235 @@
+import collections
+import gzip
+import logging
+import os
+import select
+import subprocess
+import tempfile
+import threading
+import time
+from Queue import Empty, Queue
+
+from libs import utils
+
+log = logging.getLogger(__name__)
+
+
+class RingBuffer(object):
+    """
+    Keeps the last lines of an output up to max_bytes, older lines are dropped or, with spill_dir,
+    appended to a gzip compressed file
+    """
+
+    def __init__(self, max_bytes, spill_dir=None, name="output"):
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.name = name
+        self.spill_path = None
+        self.dropped_lines = 0
+        self._lines = collections.deque()
+        self._size = 0
+        self._spill_file = None
+
+    def append(self, line):
+        self._lines.append(line)
+        self._size += len(line) + 1
+        while self._size > self.max_bytes and len(self._lines) > 1:
+            self._drop(self._lines.popleft())
+
+    def _drop(self, line):
+        self._size -= len(line) + 1
+        self.dropped_lines += 1
+        if self.spill_dir is None:
+            return
+        if self._spill_file is None:
+            fd, self.spill_path = tempfile.mkstemp(prefix="w2b_{}_".format(self.name), suffix=".gz",
+                                                   dir=self.spill_dir)
+            self._spill_file = gzip.GzipFile(fileobj=os.fdopen(fd, "wb"), mode="wb")
+        self._spill_file.write(line + "\n")
+
+    def get_text(self):
+        return "\n".join(self._lines)
+
+    def close(self):
+        if self._spill_file is not None:
+            fileobj = self._spill_file.fileobj
+            self._spill_file.close()
+            fileobj.close()
+            self._spill_file = None
+
+
+class _OutputStream(object):
+    def __init__(self, name, pipe, callback, buffer_):
+        self.name = name
+        self.pipe = pipe
+        self.callback = callback
+        self.buffer = buffer_
+        self._partial = ""
+
+    def feed(self, data):
+        lines = (self._partial + data).split("\n")
+        self._partial = lines.pop()
+        for line in lines:
+            self._on_line(line.rstrip("\r"))
+
+    def flush(self):
+        if self._partial:
+            self._on_line(self._partial.rstrip("\r"))
+            self._partial = ""
+
+    def _on_line(self, line):
+        self.buffer.append(line)
+        if self.callback is not None:
+            try:
+                self.callback(line)
+            except Exception:
+                log.exception("Error processing output line of {}".format(self.name))
+
+
+class ProcessRunner(object):
+    """
+    Runs a process multiplexing its stdout and stderr in the calling thread with poll/select (windows pipes can
+    not be polled, there a daemon thread per pipe only reads and the lines are still processed in the calling thread).
+    Stdin is the null device, complete lines are delivered to the callbacks and kept in bounded ring buffers.
+    With timeout the process (its whole group with new_process_group) is killed when it expires
+    """
+    MAX_OUTPUT_BYTES = 4 * 1024 * 1024
+    READ_SIZE = 64 * 1024
+    KILL_GRACE_PERIOD = 1
+
+    def __init__(self, args, on_out=None, on_err=None, timeout=None, new_process_group=False,
+                 on_process_started=None, max_output_bytes=MAX_OUTPUT_BYTES, spill_dir=None, **popen_kwargs):
+        self.args = args
+        self.timeout = timeout
+        self.new_process_group = new_process_group
+        self.on_process_started = on_process_started
+        self.popen_kwargs = popen_kwargs
+        self.process = None
+        self.timed_out = False
+        self.out = RingBuffer(max_output_bytes, spill_dir, "out")
+        self.err = RingBuffer(max_output_bytes, spill_dir, "err")
+        self._callbacks = dict(stdout=on_out, stderr=on_err)
+        self._buffers = dict(stdout=self.out, stderr=self.err)
+
+    def _start(self):
+        kwargs = dict(stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        kwargs.update(self.popen_kwargs)
+        if self.new_process_group:
+            if utils.is_windows():
+                kwargs["creationflags"] = kwargs.get("creationflags", 0) | subprocess.CREATE_NEW_PROCESS_GROUP
+            else:
+                kwargs["preexec_fn"] = os.setsid
+        with open(os.devnull, "rb") as stdin:
+            kwargs.setdefault("stdin", stdin)
+            self.process = subprocess.Popen(self.args, **kwargs)
+        if self.on_process_started is not None:
+            self.on_process_started(self.process)
+
+    def kill(self):
+        try:
+            if self.new_process_group:
+                utils.kill_process_group(self.process)
+            else:
+                self.process.kill()
+        except OSError:
+            pass
+
+    def _check_timeout(self, deadline):
+        """
+        :return: the new deadline, after killing the process it waits KILL_GRACE_PERIOD for the pipes to close
+        """
+        if deadline is None or time.time() < deadline:
+            return deadline
+        if self.timed_out:
+            raise _PipesKeptOpen()
+        log.warning("Killing process {} after {}s timeout".format(self.args, self.timeout))
+        self.timed_out = True
+        self.kill()
+        return time.time() + self.KILL_GRACE_PERIOD
+
+    def _read_with_poll(self, streams, deadline):
+        streams = {s.pipe.fileno(): s for s in streams}
+        poller = select.poll() if hasattr(select, "poll") else None
+        if poller is not None:
+            for fd in streams:
+                poller.register(fd, select.POLLIN | select.POLLPRI | select.POLLHUP | select.POLLERR)
+        while streams:
+            wait = None if deadline is None else max(deadline - time.time(), 0)
+            if poller is not None:
+                ready = [fd for fd, _ in poller.poll(None if wait is None else wait * 1000)]
+            else:
+                ready = select.select(list(streams), [], [], wait)[0]
+            for fd in ready:
+                data = os.read(fd, self.READ_SIZE)
+                if data:
+                    streams[fd].feed(data)
+                    continue
+                streams.pop(fd).flush()
+                if poller is not None:
+                    poller.unregister(fd)
+            deadline = self._check_timeout(deadline)
+
+    def _read_with_threads(self, streams, deadline):
+        events = Queue()
+
+        def read_pipe(stream):
+            for line in iter(stream.pipe.readline, ""):
+                events.put((stream, line))
+            events.put((stream, None))
+
+        for stream in streams:
+            thread = threading.Thread(target=read_pipe, args=(stream,), name="ProcessRunner-" + stream.name)
+            thread.daemon = True
+            thread.start()
+        pending = len(streams)
+        while pending:
+            try:
+                # blocking gets without timeout can not be interrupted in python 2
+                wait = 3600 if deadline is None else max(deadline - time.time(), 0.01)
+                stream, data = events.get(timeout=wait)
+            except Empty:
+                deadline = self._check_timeout(deadline)
+                continue
+            if data is None:
+                stream.flush()
+                pending -= 1
+            else:
+                stream.feed(data)
+            deadline = self._check_timeout(deadline)
+
+    def run(self):
+        """
+        :return: dictionary with out, err, returncode and timed_out (out_spill and err_spill when output was spilled)
+        """
+        self._start()
+        streams = [_OutputStream(name, getattr(self.process, name), self._callbacks[name], self._buffers[name])
+                   for name in ("stdout", "stderr") if getattr(self.process, name) is not None]
+        deadline = time.time() + self.timeout if self.timeout is not None else None
+        try:
+            if utils.is_windows():
+                self._read_with_threads(streams, deadline)
+            else:
+                self._read_with_poll(streams, deadline)
+        except _PipesKeptOpen:
+            log.warning("Pipes of killed process {} are still open".format(self.args))
+        except BaseException:
+            self.kill()
+            raise
+        finally:
+            for stream in streams:
+                stream.pipe.close()
+            self.out.close()
+            self.err.close()
+        returncode = self.process.wait()
+
+        result = dict(out=self.out.get_text(), err=self.err.get_text(), returncode=returncode,
+                      timed_out=self.timed_out)
+        for name, buffer_ in (("out", self.out), ("err", self.err)):
+            if buffer_.spill_path is not None:
+                result[name + "_spill"] = buffer_.spill_path
+        return result
+
+
+class _PipesKeptOpen(Exception):
+    pass
+
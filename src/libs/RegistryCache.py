@@ -0,0 +1,139 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import urllib
+
+from libs import utils
+from libs.Metrics import Metrics
+
+log = logging.getLogger(__name__)
+
+
+class RegistryCache(object):
+    """
+    On disk cache of the GET responses of the registry, shared by all the processes (every build is a new one).
+    Responses younger than fresh_seconds are served without requests, responses younger than max_age_seconds are
+    served at once while they are revalidated in background with their ETag/Last-Modified (so they are also served
+    when offline) and older ones have to be revalidated before being served
+    """
+    VERSION = 1
+    TIMEOUT = 10
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, cache_dir, fresh_seconds=3600, max_age_seconds=7 * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.fresh_seconds = fresh_seconds
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self._revalidating = set()
+
+    @staticmethod
+    def get_key(url, params=None):
+        if not params:
+            return url
+        return url + "?" + urllib.urlencode(sorted(params.items()))
+
+    def _get_path(self, key):
+        return os.path.join(self.cache_dir, hashlib.sha1(key).hexdigest() + ".json")
+
+    def _load(self, key):
+        try:
+            with open(self._get_path(key)) as f:
+                entry = json.load(f)
+            if entry.get("version") == self.VERSION and entry.get("key") == key:
+                return entry
+        except (IOError, ValueError):
+            pass
+        return None
+
+    def _store(self, key, entry):
+        path = self._get_path(key)
+        tmp_path = "{}.{}.{}.tmp".format(path, os.getpid(), threading.current_thread().ident)
+        try:
+            if not os.path.isdir(self.cache_dir):
+                os.makedirs(self.cache_dir)
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            utils.replace_file(tmp_path, path)
+        except (IOError, OSError):
+            log.debug("Unable to store registry response in {}".format(path), exc_info=1)
+
+    def _fetch(self, key, url, params, headers, entry):
+        """
+        Conditional request if there is a cached entry, successful responses are stored
+        :return: tuple of status code and body
+        """
+        import requests
+        headers = dict(headers or {})
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        r = requests.get(url, params=params, headers=headers, timeout=self.TIMEOUT)
+        try:
+            if r.status_code == 304 and entry is not None:
+                entry["fetched"] = time.time()
+            elif r.status_code == 200:
+                entry = dict(version=self.VERSION, key=key, etag=r.headers.get("ETag"),
+                             last_modified=r.headers.get("Last-Modified"), fetched=time.time(), body=r.text)
+            else:
+                return r.status_code, r.text
+            self._store(key, entry)
+            return 200, entry["body"]
+        finally:
+            r.close()
+
+    def _revalidate_in_background(self, key, url, params, headers, entry):
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def revalidate():
+            try:
+                self._fetch(key, url, params, headers, entry)
+            except Exception:
+                log.debug("Unable to revalidate {}".format(key), exc_info=1)
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+
+        thread = threading.Thread(target=revalidate, name="RegistryCache-revalidate")
+        thread.daemon = True
+        thread.start()
+        return thread
+
+    def get(self, url, params=None, headers=None):
+        """
+        Network errors are raised only if there is no cached response younger than max_age_seconds
+        :return: tuple of status code and body
+        """
+        key = self.get_key(url, params)
+        entry = self._load(key)
+        age = time.time() - entry["fetched"] if entry is not None else None
+        if entry is not None and 0 <= age < self.max_age_seconds:
+            Metrics.inc("cache_requests_total", cache="registry", result="hit")
+            if age >= self.fresh_seconds:
+                self._revalidate_in_background(key, url, params, headers, entry)
+            return 200, entry["body"]
+        Metrics.inc("cache_requests_total", cache="registry", result="miss")
+        return self._fetch(key, url, params, headers, entry)
+
+    @classmethod
+    def get_instance(cls):
+        """
+        :rtype: RegistryCache
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                from libs.Config import Config
+                from platformio.util import get_home_dir
+                cls._instance = RegistryCache(os.path.join(get_home_dir(), "registry_cache"),
+                                              Config.registry_cache_fresh_seconds,
+                                              Config.registry_cache_max_age_seconds)
+            return cls._instance
@@ -0,0 +1,173 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+
+from libs import utils
+
+log = logging.getLogger(__name__)
+
+_INCLUDES_START = "#include <...> search starts here:"
+_INCLUDES_END = "End of search list."
+
+
+def get_file_stamp(path):
+    """
+    :return: [realpath, mtime, size] of the file or None if it does not exist
+    """
+    try:
+        path = os.path.realpath(path)
+        st = os.stat(path)
+    except (OSError, TypeError):
+        return None
+    return [path, st.st_mtime, st.st_size]
+
+
+def get_packages_versions():
+    from platformio.app import get_state_item
+    return {k: v.get("version") for k, v in get_state_item("installed_packages", {}).items()}
+
+
+def get_builder_stamp():
+    """
+    The builder scripts are updated with web2board and a new version of them can change the idedata
+    """
+    from platformio import __version__, util
+    return [__version__, get_file_stamp(os.path.join(util.get_source_dir(), "builder", "main.py"))]
+
+
+def get_project_stamp(project_dir):
+    """
+    idedata of a project only changes with its platformio.ini, the installed packages or the builder
+    """
+    return [get_packages_versions(), get_file_stamp(os.path.join(project_dir, "platformio.ini")), get_builder_stamp()]
+
+
+def parse_compiler_output(out, err):
+    """
+    Parses the output of "$CC -v -dM -E" with the compiler type, default include dirs and defines
+    """
+    defines = []
+    for line in out.splitlines():
+        parts = line.split(None, 2)
+        if len(parts) >= 2 and parts[0] == "#define":
+            defines.append(parts[1] if len(parts) == 2 else "{}={}".format(parts[1], parts[2]))
+    include_dirs = []
+    in_includes = False
+    for line in err.splitlines():
+        if line.startswith(_INCLUDES_START):
+            in_includes = True
+        elif line.startswith(_INCLUDES_END):
+            in_includes = False
+        elif in_includes:
+            include_dirs.append(os.path.normpath(line.strip().replace(" (framework directory)", "")))
+    output = (out + err).lower()
+    compiler_type = next((t for t in ("clang", "gcc") if t in output), None)
+    return dict(type=compiler_type, include_dirs=include_dirs, defines=defines)
+
+
+class ToolchainFacts(object):
+    """
+    Persistent cache of facts about the installed toolchains (compiler type, default include dirs and defines,
+    programs location and idedata) so the builds do not need to spawn processes to get them.
+    Every entry is stored with a stamp and it is only valid while the stamp does not change. Entries are written in
+    their own files, so the processes writing entries at the same time (the scons builds) never lose other ones
+    """
+    VERSION = 2
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = {}
+
+    def _get_entry_path(self, section, key):
+        if isinstance(key, unicode):
+            key = key.encode("utf-8")
+        return os.path.join(self.path, section, hashlib.md5(key).hexdigest() + ".json")
+
+    def _load(self, section, key):
+        try:
+            with open(self._get_entry_path(section, key)) as f:
+                entry = json.load(f)
+            if entry.get("version") == self.VERSION and entry.get("key") == key:
+                return entry
+        except (IOError, ValueError):
+            pass
+        return None
+
+    def get(self, section, key, stamp=None):
+        with self._lock:
+            entry = self._entries.get((section, key))
+        if entry is None or entry["stamp"] != stamp:
+            # it may have been written by other process
+            entry = self._load(section, key)
+            with self._lock:
+                self._entries[(section, key)] = entry
+        if entry is None or entry["stamp"] != stamp:
+            return None
+        return entry["value"]
+
+    def set(self, section, key, value, stamp=None):
+        # stamps are compared with the json loaded ones
+        stamp = json.loads(json.dumps(stamp))
+        entry = dict(version=self.VERSION, key=key, stamp=stamp, value=value)
+        path = self._get_entry_path(section, key)
+        tmp_path = "{}.{}.{}.tmp".format(path, os.getpid(), threading.current_thread().ident)
+        try:
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(tmp_path, "w") as f:
+                json.dump(entry, f)
+            utils.replace_file(tmp_path, path)
+        except (IOError, OSError):
+            log.debug("Unable to save toolchain facts in {}".format(path), exc_info=1)
+        with self._lock:
+            self._entries[(section, key)] = entry
+
+    def get_or_compute(self, section, key, stamp, compute):
+        value = self.get(section, key, stamp)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.set(section, key, value, stamp)
+        return value
+
+    def get_compiler_facts(self, cc_path, env=None, version=None):
+        """
+        :return: dictionary with type, path, include_dirs and defines of the compiler or None if it can not be run
+        """
+        stamp = get_file_stamp(cc_path)
+        if stamp is None:
+            return None
+        return self.get_or_compute("compilers", stamp[0], [version] + stamp,
+                                   lambda: self._probe_compiler(cc_path, env))
+
+    @staticmethod
+    def _probe_compiler(cc_path, env=None):
+        from platformio.util import exec_command
+        try:
+            result = exec_command([cc_path, "-v", "-dM", "-E", "-x", "c++", os.devnull], env=env)
+            if result['returncode'] != 0:
+                # compilers without c++ support
+                result = exec_command([cc_path, "-v"], env=env)
+        except OSError:
+            return None
+        if result['returncode'] != 0:
+            return None
+        facts = parse_compiler_output(result['out'], result['err'])
+        facts["path"] = cc_path
+        return facts
+
+    @classmethod
+    def get_instance(cls):
+        """
+        :rtype: ToolchainFacts
+        """
+        with cls._instance_lock:
+            if cls._instance is None:
+                from platformio.util import get_home_dir
+                cls._instance = ToolchainFacts(os.path.join(get_home_dir(), "toolchain_facts"))
+            return cls._instance
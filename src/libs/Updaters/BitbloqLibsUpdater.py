@@ -1,9 +1,15 @@
+import httplib
+import json
 import logging
 import os
 import tempfile
 import shutil
+import urllib
+import urllib2
 from libs import utils
 from libs.Config import Config
+from libs.ContentManifest import ContentManifest, get_blob_hash
+from libs.LibraryStore import LibraryStore
 from libs.PathsManager import PathsManager
 from libs.Updaters.Updater import Updater, VersionInfo
 from libs.Version import Version
@@ -17,18 +23,26 @@ class BitbloqLibsUpdaterError(Exception):
 
 
 class BitbloqLibsUpdater(Updater):
+    """
+    Versions are installed side by side in the library store: only the files whose content is not stored yet are
+    downloaded (or extracted from the whole archive when there are many) and switching to an installed version only
+    changes the active one. The user libraries dir (libraries_path) only has the libraries of the user, the copies of
+    bitbloqLibs installed there by previous versions are migrated
+    """
     __globalBitbloqLibsUpdater = None
     update_lock = threading.Lock()
+    DELTA_MAX_FILES = 100
 
     def __init__(self):
         Updater.__init__(self)
         self.current_version_info = VersionInfo(Version.bitbloq_libs,
                                                 libraries_names=Version.bitbloq_libs_libraries)
         self.name = "BitbloqLibsUpdater"
+        self.store = LibraryStore.get_instance()
 
     @property
     def destination_path(self):
-        return Config.get_platformio_lib_dir()
+        return self.store.get_version_path(self.current_version_info.version)
 
     def _update_current_version_to(self, version_to_upload):
         Updater._update_current_version_to(self, version_to_upload)
@@ -37,42 +51,124 @@ class BitbloqLibsUpdater(Updater):
         Version.bitbloq_libs = self.current_version_info.version
         Version.store_values()
 
-    def _move_libs_to_destination(self, downloaded_path):
-        directories_in_folder = utils.list_directories_in_path(downloaded_path)
-        if len(directories_in_folder) != 1:
-            raise BitbloqLibsUpdaterError("Not only one bitbloqLibs folder in unzipped file")
-        downloaded_path = downloaded_path + os.sep + directories_in_folder[0]
-
-        if not os.path.exists(self.destination_path):
-            os.makedirs(self.destination_path)
-        utils.copytree(downloaded_path, self.destination_path, force_copy=True)
+    def _get_online_manifest(self, version_to_upload):
+        """
+        :return: manifest of the version or None if it is not available
+        """
+        version = version_to_upload.version
+        if version_to_upload.file_to_download_url != Config.bitbloq_libs_download_url_template.format(version=version):
+            # the manifest is only known for the official archives
+            return None
+        try:
+            site = urllib2.urlopen(Config.bitbloq_libs_manifest_url_template.format(version=version),
+                                   timeout=self.downloader.timeout)
+            try:
+                return ContentManifest.from_github_tree(json.load(site))
+            finally:
+                site.close()
+        except (IOError, httplib.HTTPException, ValueError, KeyError):
+            log.warning("[{0}] Unable to get the manifest of version {1}".format(self.name, version), exc_info=1)
+            return None
+
+    def _download_missing_files(self, version_to_upload, online_manifest, staging_path):
+        """
+        Downloads the files of the version that are not in the store to staging_path
+        :return: False if the archive has to be used
+        """
+        missing = self.store.get_missing_files(online_manifest)
+        if len(missing) > self.DELTA_MAX_FILES:
+            log.info("[{0}] {1} files not stored, downloading the whole archive".format(self.name, len(missing)))
+            return False
+        version = version_to_upload.version
+        log.info("[{0}] Downloading {1} files of version {2}, {3} already stored"
+                 .format(self.name, len(missing), version, len(online_manifest.files) - len(missing)))
+        downloads = []
+        try:
+            for path in missing:
+                file_path = os.path.join(staging_path, *path.split("/"))
+                if not os.path.isdir(os.path.dirname(file_path)):
+                    os.makedirs(os.path.dirname(file_path))
+                url = Config.bitbloq_libs_file_url_template.format(version=version, path=urllib.quote(path))
+                downloads.append((path, file_path, self.downloader.download(url, file_path)))
+            for path, file_path, download in downloads:
+                download.result()
+                if get_blob_hash(file_path) != online_manifest.files[path]:
+                    raise BitbloqLibsUpdaterError("Downloaded file {} does not match its hash".format(path))
+            return True
+        except (IOError, httplib.HTTPException, BitbloqLibsUpdaterError):
+            log.warning("[{0}] Unable to download the files, downloading the whole archive".format(self.name),
+                        exc_info=1)
+            self._stop_downloads([download for _, _, download in downloads])
+            shutil.rmtree(staging_path)
+            os.makedirs(staging_path)
+            return False
+
+    @staticmethod
+    def _stop_downloads(downloads):
+        """
+        Cancels the queued downloads and waits for the running ones, they would write in the staging path
+        """
+        for download in downloads:
+            if not download.cancel():
+                # their errors are the ones of the failed delta download
+                download.exception()
+
+    def _download_archive(self, version_to_upload, staging_path):
+        """
+        Extracts the whole archive to staging_path
+        :return: manifest of the extracted files
+        """
+        log.info('[{0}] Downloading version {1}, from {2}'
+                 .format(self.name, version_to_upload.version, version_to_upload.file_to_download_url))
+        downloaded_file_path = tempfile.gettempdir() + os.sep + "w2b_tmp_libs.zip"
+        self.downloader.download(version_to_upload.file_to_download_url, downloaded_file_path).result()
+        try:
+            log.info('[{0}] extracting zipfile: {1}'.format(self.name, downloaded_file_path))
+            if len(utils.get_zip_top_directories(downloaded_file_path)) != 1:
+                raise BitbloqLibsUpdaterError("Not only one bitbloqLibs folder in unzipped file")
+            utils.extract_zip(downloaded_file_path, staging_path, strip_components=1)
+        finally:
+            os.remove(downloaded_file_path)
+        return ContentManifest.from_directory(staging_path)
+
+    def _add_version_to_store(self, version_to_upload):
+        staging_path = self.store.get_staging_path()
+        if os.path.exists(staging_path):
+            shutil.rmtree(staging_path)
+        os.makedirs(staging_path)
+        try:
+            manifest = self._get_online_manifest(version_to_upload)
+            if manifest is None or not self._download_missing_files(version_to_upload, manifest, staging_path):
+                manifest = self._download_archive(version_to_upload, staging_path)
+            for path, blob_hash in manifest.files.items():
+                file_path = os.path.join(staging_path, *path.split("/"))
+                if os.path.isfile(file_path):
+                    self.store.add_object(file_path, blob_hash)
+            self.store.add_version(version_to_upload.version, manifest)
+        finally:
+            shutil.rmtree(staging_path)
 
     def restore_current_version_if_necessary(self):
-        if self.is_necessary_to_update():
+        if self.is_necessary_to_update() or not self.store.has_version(self.current_version_info.version):
             log.warning("It is necessary to upload BitbloqLibs")
             url = Config.bitbloq_libs_download_url_template.format(**self.current_version_info.__dict__)
             self.current_version_info.file_to_download_url = url
             self.update(self.current_version_info)
+        elif self.store.get_active_version() != self.current_version_info.version:
+            self.store.set_active_version(self.current_version_info.version)
+            self.store.migrate_legacy_libraries(Config.get_platformio_lib_dir())
         else:
             log.debug("BitbloqLibs is up to date")
+            self.store.migrate_legacy_libraries(Config.get_platformio_lib_dir())
 
     def update(self, version_to_upload):
         with self.update_lock:
-            log.info('[{0}] Downloading version {1}, from {2}'
-                     .format(self.name, version_to_upload.version, version_to_upload.file_to_download_url))
-            downloaded_file_path = tempfile.gettempdir() + os.sep + "w2b_tmp_libs.zip"
-            self.downloader.download(version_to_upload.file_to_download_url, downloaded_file_path).result()
-
-            extract_folder = tempfile.gettempdir() + os.sep + "web2board_tmp_folder"
-            if not os.path.exists(extract_folder):
-                os.mkdir(extract_folder)
-            try:
-                log.info('[{0}] extracting zipfile: {1}'.format(self.name, downloaded_file_path))
-                utils.extract_zip(downloaded_file_path, extract_folder)
-                self._move_libs_to_destination(extract_folder)
-                self._update_current_version_to(version_to_upload)
-            finally:
-                if os.path.exists(extract_folder):
-                    shutil.rmtree(extract_folder)
-
-
+            if self.store.has_version(version_to_upload.version):
+                log.info("[{0}] Version {1} already stored".format(self.name, version_to_upload.version))
+            else:
+                self._add_version_to_store(version_to_upload)
+            self.store.set_active_version(version_to_upload.version)
+            self._update_current_version_to(version_to_upload)
+            self.store.prune(Config.library_versions_kept,
+                             os.path.join(PathsManager.PLATFORMIO_WORKSPACE_PATH, ".pioenvs"))
+            self.store.migrate_legacy_libraries(Config.get_platformio_lib_dir())
@@ -54,7 +54,7 @@ class Web2BoardUpdater:
 
         return Config.download_url_template.format(**args)
 
-    @asynchronous()
+    @asynchronous(pool="io")
     def download_version(self, version, infoCallback=None):
         confirmationPath = pm.get_dst_path_for_update(version) + ".confirm"
         zipDstPath = pm.get_dst_path_for_update(version) + ".zip"
@@ -66,7 +66,7 @@ class Web2BoardUpdater:
             with open(confirmationPath, "w"):
                 pass
 
-    @asynchronous()
+    @asynchronous(pool="io")
     def update(self, version, destination):
         version_path = pm.get_dst_path_for_update(version)
         confirm_path = version_path + ".confirm"
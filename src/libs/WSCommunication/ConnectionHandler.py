@@ -1,16 +1,69 @@
 import json
 import logging
 import os
+import threading
 import time
+from tornado import web
 from wshubsapi.connection_handlers.tornado_handler import ConnectionHandler
+from wshubsapi.hubs_inspector import HubsInspector
 
-import libs.MainApp
 from libs import utils
+from libs.Metrics import Metrics
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
+_hub_call_profiler = None
+
+
+def set_hub_call_profiler(profiler):
+    """
+    :type profiler: libs.Diagnostics.CallProfiler | None
+    """
+    global _hub_call_profiler
+    _hub_call_profiler = profiler
+
+
+def instrument_comm_environment(comm_environment):
+    """
+    Records calls, errors and latency per hub function around the messages dispatched by the comm_environment
+    """
+    if getattr(comm_environment, "is_instrumented", False):
+        return comm_environment
+    last_reply = threading.local()
+    original_on_message = comm_environment.on_message
+    original_reply = comm_environment.reply
+
+    def reply(client, reply_dict, origin_message):
+        last_reply.value = reply_dict
+        return original_reply(client, reply_dict, origin_message)
+
+    def on_message(client, message):
+        last_reply.value = None
+        start_time = time.time()
+        try:
+            if _hub_call_profiler is not None:
+                return _hub_call_profiler.run(original_on_message, client, message)
+            return original_on_message(client, message)
+        finally:
+            reply_dict = last_reply.value
+            if isinstance(reply_dict, dict) and "hub" in reply_dict:
+                labels = dict(hub=reply_dict["hub"], function=reply_dict["function"])
+                Metrics.inc("hub_calls_total", **labels)
+                if not reply_dict["success"]:
+                    Metrics.inc("hub_errors_total", **labels)
+                Metrics.observe("hub_call_seconds", time.time() - start_time, **labels)
+
+    comm_environment.reply = reply
+    comm_environment.on_message = on_message
+    comm_environment.message_received_queue.on_message = on_message
+    comm_environment.is_instrumented = True
+    return comm_environment
 
 
 class WSConnectionHandler(ConnectionHandler):
+    def __init__(self, application, request, **kwargs):
+        super(WSConnectionHandler, self).__init__(application, request, **kwargs)
+        instrument_comm_environment(self.comm_environment)
+
     def open(self, *args):
         super(WSConnectionHandler, self).open(*args)
 
@@ -20,7 +73,8 @@ class WSConnectionHandler(ConnectionHandler):
             log.info("Bitbloq disconnected, closing web2board...")
             time.sleep(0.5)
             if utils.are_we_frozen():
-                libs.MainApp.force_quit()
+                from libs.MainApp import force_quit
+                force_quit()
 
     def on_message(self, message):
         if message.startswith('setBitbloqLibsVersion'):  # bitbloq thinks we are in version 1
@@ -33,3 +87,11 @@ class WSConnectionHandler(ConnectionHandler):
             except UnicodeError:
                 pass
             self.comm_environment.on_async_message(self._connected_client, message.encode('utf-8', 'ignore'))
+
+
+class MetricsRequestHandler(web.RequestHandler):
+    def get(self):
+        from libs.WSCommunication.Hubs.MetricsHub import MetricsHub
+        metrics_hub = HubsInspector.get_hub_instance(MetricsHub)
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.write(metrics_hub.get_prometheus_metrics())
@@ -8,6 +8,7 @@ from wshubsapi.connected_client import ConnectedClient
 from libs import utils
 from libs.Decorators.Asynchronous import asynchronous
 from libs.LoggingUtils import init_logging
+from libs.WSCommunication.ConnectionHandler import instrument_comm_environment
 from libs.WSCommunication.ConsoleMessageParser import ConsoleMessageParser
 
 
@@ -15,7 +16,7 @@ class ConsoleHandler:
     log = logging.getLogger(__name__)
 
     def __init__(self):
-        self.comm_environment = CommEnvironment.get_instance()
+        self.comm_environment = instrument_comm_environment(CommEnvironment.get_instance())
         self._connected_client = ConnectedClient(self.comm_environment, self.write_message)
         self.open("bitbloq")
         self.parser = ConsoleMessageParser()
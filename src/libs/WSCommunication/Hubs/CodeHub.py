@@ -4,6 +4,8 @@ import os
 from wshubsapi.hub import Hub, UnsuccessfulReplay
 from wshubsapi.hubs_inspector import HubsInspector
 
+from libs.CompileProgress import CompileProgressSink
+from libs.Config import Config
 from libs.CompilerUploader import CompilerException, CompilerUploader
 from libs.PathsManager import PathsManager
 from libs.WSCommunication.Hubs.SerialMonitorHub import SerialMonitorHub
@@ -41,6 +43,12 @@ class CodeHub(Hub):
         _sender.is_uploading(upload_port)
         return upload_port
 
+    @staticmethod
+    def __create_progress_sink(board, _sender):
+        return CompileProgressSink(board, lambda progress: _sender.compile_progress(progress),
+                                   fail_fast=Config.fail_fast_builds,
+                                   project_src_dir=os.path.join(PathsManager.PLATFORMIO_WORKSPACE_PATH, "src"))
+
     def compile(self, code, _sender):
         """
         :type code: str
@@ -49,9 +57,19 @@ class CodeHub(Hub):
         log.info("Compiling from {}".format(_sender.ID))
         log.debug("Compiling code: {}".format(code.encode("utf-8")))
         _sender.is_compiling()
-        compile_report = CompilerUploader.construct().compile(code)
+        with self.__create_progress_sink(CompilerUploader.DEFAULT_BOARD, _sender):
+            compile_report = CompilerUploader.construct().compile(code)
         return self.__handle_compile_report(compile_report)
 
+    def check(self, code, board=CompilerUploader.DEFAULT_BOARD):
+        """
+        Fast syntax check (no build) intended for as-you-type diagnostics
+        :type code: str
+        :return: dictionary with success, errors and warnings lists
+        """
+        log.debug("Checking code: {}".format(code.encode("utf-8")))
+        return CompilerUploader.construct(board).check(code)
+
     def get_hex_data(self, code, _sender):
         """
         :type code: str
@@ -60,7 +78,8 @@ class CodeHub(Hub):
         log.info("getting hexData from {}".format(_sender.ID))
         log.debug("Compiling code: {}".format(code.encode("utf-8")))
         _sender.is_compiling()
-        compileReport, hexData = CompilerUploader.construct().get_hex_data(code)
+        with self.__create_progress_sink(CompilerUploader.DEFAULT_BOARD, _sender):
+            compileReport, hexData = CompilerUploader.construct().get_hex_data(code)
         return self.__handle_compile_report(compileReport), hexData
 
     def upload(self, code, board, _sender, port=None):
@@ -74,7 +93,8 @@ class CodeHub(Hub):
         if isinstance(upload_port, UnsuccessfulReplay):
             return upload_port
 
-        compile_report = CompilerUploader.construct(board).upload(code, upload_port=upload_port)
+        with self.__create_progress_sink(board, _sender):
+            compile_report = CompilerUploader.construct(board).upload(code, upload_port=upload_port)
 
         return self.__handle_compile_report(compile_report, upload_port)
 
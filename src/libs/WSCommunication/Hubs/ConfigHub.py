@@ -8,6 +8,7 @@ import time
 from wshubsapi.hub import Hub
 from libs.Config import Config
 from libs import utils
+from libs.LibraryStore import LibraryStore
 from libs.PathsManager import PathsManager
 
 log = logging.getLogger(__name__)
@@ -49,7 +50,13 @@ class ConfigHub(Hub):
         utils.set_log_level(log_level)
 
     def set_libraries_path(self, lib_dir):
+        """
+        Dir of the user libraries, they have priority over the bitbloqLibs of the library store in the builds (an
+        edited copy of a library is used instead of the stored one). Unchanged copies of stored bitbloqLibs are moved
+        out of it
+        """
         Config.set_platformio_lib_dir(lib_dir)
+        LibraryStore.get_instance().migrate_legacy_libraries(Config.get_platformio_lib_dir())
         PathsManager.clean_pio_envs()
 
     def get_libraries_path(self):
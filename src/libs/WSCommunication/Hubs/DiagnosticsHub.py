@@ -0,0 +1,112 @@
+import time
+
+from wshubsapi.comm_environment import CommEnvironment
+from wshubsapi.hub import Hub
+from wshubsapi.hubs_inspector import HubsInspector
+
+from libs import Diagnostics
+from libs.Config import Config
+from libs.Decorators.Asynchronous import get_pools_stats
+from libs.LoggingUtils import get_async_logging_handler
+from libs.WSCommunication import ConnectionHandler
+from libs.WSCommunication.Hubs.LoggingHub import LoggingHub
+from libs.WSCommunication.Hubs.SerialMonitorHub import SerialMonitorHub
+
+
+class DiagnosticsHubException(Exception):
+    pass
+
+
+class DiagnosticsHub(Hub):
+    """
+    Runtime profiling and memory diagnostics, only available if Config.diagnostics_enabled is True
+    """
+    MAX_PROFILING_SECONDS = 120
+
+    def __init__(self):
+        super(DiagnosticsHub, self).__init__()
+        self.sampling_profiler = None
+        self.call_profiler = None
+        self.memory_snapshots = []
+
+    @staticmethod
+    def __check_enabled():
+        if not Config.diagnostics_enabled:
+            raise DiagnosticsHubException("Diagnostics are disabled, set diagnostics_enabled in configuration")
+
+    def start_profiler(self, mode="sampling"):
+        """
+        :param mode: "sampling" samples all threads, "cprofile" profiles every hub call
+        """
+        self.__check_enabled()
+        if self.sampling_profiler is not None or self.call_profiler is not None:
+            raise DiagnosticsHubException("Profiler already running")
+        if mode == "sampling":
+            self.sampling_profiler = Diagnostics.SamplingProfiler()
+            self.sampling_profiler.start()
+        elif mode == "cprofile":
+            self.call_profiler = Diagnostics.CallProfiler()
+            ConnectionHandler.set_hub_call_profiler(self.call_profiler)
+        else:
+            raise DiagnosticsHubException("Unknown profiler mode: {}".format(mode))
+        return True
+
+    def stop_profiler(self):
+        self.__check_enabled()
+        if self.sampling_profiler is not None:
+            profiler, self.sampling_profiler = self.sampling_profiler, None
+            return dict(mode="sampling", samples=profiler.samples_count, collapsed_stacks=profiler.stop())
+        if self.call_profiler is not None:
+            profiler, self.call_profiler = self.call_profiler, None
+            ConnectionHandler.set_hub_call_profiler(None)
+            return dict(mode="cprofile", stats=profiler.get_stats_text())
+        raise DiagnosticsHubException("Profiler not running")
+
+    def profile(self, seconds=10, mode="sampling"):
+        self.start_profiler(mode)
+        try:
+            time.sleep(min(seconds, self.MAX_PROFILING_SECONDS))
+        finally:
+            result = self.stop_profiler()
+        return result
+
+    def take_memory_snapshot(self):
+        self.__check_enabled()
+        self.memory_snapshots.append(Diagnostics.MemorySnapshot())
+        return len(self.memory_snapshots)
+
+    def diff_memory_snapshots(self, limit=30):
+        self.__check_enabled()
+        if len(self.memory_snapshots) < 2:
+            raise DiagnosticsHubException("At least two memory snapshots are necessary")
+        return self.memory_snapshots[-1].compare_to(self.memory_snapshots[-2], limit)
+
+    def start_memory_tracing(self):
+        self.__check_enabled()
+        return Diagnostics.start_memory_tracing()
+
+    def stop_memory_tracing(self):
+        self.__check_enabled()
+        Diagnostics.stop_memory_tracing()
+        self.memory_snapshots = []
+        return True
+
+    def get_threads_stacks(self):
+        self.__check_enabled()
+        return Diagnostics.get_threads_stacks()
+
+    def get_structures_sizes(self):
+        self.__check_enabled()
+        serial_hub = HubsInspector.get_hub_instance(SerialMonitorHub)
+        comm_environment = CommEnvironment.get_instance()
+        logging_handler = get_async_logging_handler()
+        return dict(
+            logging_records_buffer=len(HubsInspector.get_hub_instance(LoggingHub).records_buffer),
+            logging_queue=logging_handler.queue.qsize() if logging_handler is not None else 0,
+            serial_connections=len(serial_hub.serial_connections),
+            serial_subscribed_clients={port: len(clients) for port, clients in
+                                       serial_hub.subscribed_clients_ports.items()},
+            comm_environment_futures=len(comm_environment._CommEnvironment__futures_buffer),
+            comm_environment_received_messages=comm_environment.message_received_queue.qsize(),
+            executor_queued_tasks={name: stats["queued"] for name, stats in get_pools_stats().items()}
+        )
@@ -0,0 +1,43 @@
+from wshubsapi.hub import Hub
+
+from libs.Decorators.Asynchronous import get_pool, get_pools_stats
+from libs.JobServer import JobServer
+from libs.LoggingUtils import get_async_logging_handler
+from libs.Metrics import Metrics
+
+
+class MetricsHub(Hub):
+    def __init__(self):
+        super(MetricsHub, self).__init__()
+
+    @staticmethod
+    def __update_runtime_gauges():
+        for pool, stats in get_pools_stats().items():
+            Metrics.set_gauge("executor_queued_tasks", stats["queued"], pool=pool)
+            Metrics.set_gauge("executor_active_tasks", stats["active"], pool=pool)
+            Metrics.set_gauge("executor_submitted_tasks", stats["submitted"], pool=pool)
+            Metrics.set_gauge("executor_failed_tasks", stats["failed"], pool=pool)
+            Metrics.register_histogram("executor_wait_seconds", get_pool(pool).wait_latency, pool=pool)
+            Metrics.register_histogram("executor_run_seconds", get_pool(pool).run_latency, pool=pool)
+        logging_handler = get_async_logging_handler()
+        if logging_handler is not None:
+            for key, value in logging_handler.get_stats().items():
+                Metrics.set_gauge("logging_records", value, state=key)
+        if JobServer._instance is not None:
+            for key, value in JobServer._instance.get_stats().items():
+                Metrics.set_gauge("build_job_tokens", value, state=key)
+
+    def get_metrics(self):
+        self.__update_runtime_gauges()
+        return Metrics.get_dictionary()
+
+    def get_prometheus_metrics(self):
+        self.__update_runtime_gauges()
+        return Metrics.to_prometheus()
+
+    def get_cache_hit_ratios(self):
+        return Metrics.get_cache_hit_ratios()
+
+    def reset_metrics(self):
+        Metrics.reset()
+        return True
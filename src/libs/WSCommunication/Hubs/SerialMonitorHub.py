@@ -9,6 +9,7 @@ from wshubsapi.hub import Hub
 
 from libs.CompilerUploader import CompilerUploader
 from libs.Decorators.Asynchronous import asynchronous
+from libs.Metrics import Metrics
 from libs.PathsManager import PathsManager
 
 log = logging.getLogger(__name__)
@@ -24,7 +25,7 @@ class SerialConnection:
         self.__getData()
         self.is_about_to_be_closed = False
 
-    @asynchronous()
+    @asynchronous(pool="serial")
     def __getData(self):
         while self.serial.isOpen():
             out = ''
@@ -75,6 +76,7 @@ class SerialMonitorHub(Hub):
         self.subscribed_clients_ports = dict()
 
     def __on_received_callback(self, port, data):
+        Metrics.inc("serial_received_bytes_total", len(data), port=port)
         self.clients.get_subscribed_clients().received(port, data)
         self._get_subscribed_clients_to_port(port).received(port, data)
 
@@ -104,6 +106,7 @@ class SerialMonitorHub(Hub):
             self.start_connection(port)
 
         self.serial_connections[port].write(data)
+        Metrics.inc("serial_written_bytes_total", len(data), port=port)
         self.clients.get_subscribed_clients().written(data, port, _sender.ID)
 
     def change_baudrate(self, port, baudrate):
@@ -3,4 +3,6 @@ import CodeHub
 import SerialMonitorHub
 import WindowHub
 import ConfigHub
-import LoggingHub
\ No newline at end of file
+import LoggingHub
+import MetricsHub
+import DiagnosticsHub
\ No newline at end of file
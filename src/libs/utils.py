@@ -1,11 +1,14 @@
 import inspect
 import logging
+import multiprocessing
 import os
 import platform
 import shutil
+import signal
 import sys
 import tempfile
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from glob import glob
 from urllib2 import urlopen
 import urllib2
@@ -98,9 +101,94 @@ def find_modules_for_pyinstaller(path, patterns):
     return list(set(list_modules))
 
 
-def extract_zip(origin, destination):
+def _get_zip_member_path(destination, name, strip_components):
+    parts = [p for p in name.replace("\\", "/").split("/")[strip_components:] if p not in ("", ".")]
+    if not parts or ".." in parts or os.path.splitdrive(parts[0])[0]:
+        return None
+    return os.path.join(destination, *parts)
+
+
+def _extract_zip_members(origin, members, after_extract):
+    # ZipFile objects can not be shared between threads
+    with zipfile.ZipFile(origin, "r") as z:
+        for info, path in members:
+            with z.open(info) as source, open(path, "wb") as target:
+                shutil.copyfileobj(source, target, 1024 * 1024)
+            if after_extract is not None:
+                after_extract(info, path)
+
+
+def extract_zip(origin, destination, strip_components=0, after_extract=None, workers=None):
+    """
+    Extracts the members in parallel, distributed by size between the workers (decompression releases the GIL)
+    :param strip_components: number of leading path components removed from the members
+    :param after_extract: function called with the ZipInfo and the path of every extracted file
+    """
+    with zipfile.ZipFile(origin, "r") as z:
+        infos = z.infolist()
+    files = []
+    for info in infos:
+        path = _get_zip_member_path(destination, info.filename, strip_components)
+        if path is None:
+            continue
+        if info.filename.endswith("/"):
+            if not os.path.isdir(path):
+                os.makedirs(path)
+        else:
+            files.append((info, path))
+    for directory in set(os.path.dirname(path) for _, path in files):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    workers = min(workers or (multiprocessing.cpu_count() * 2), len(files)) or 1
+    batches = [[] for _ in range(workers)]
+    sizes = [0] * workers
+    for info, path in sorted(files, key=lambda f: f[0].file_size, reverse=True):
+        lightest = sizes.index(min(sizes))
+        batches[lightest].append((info, path))
+        sizes[lightest] += info.file_size
+    if workers == 1:
+        return _extract_zip_members(origin, batches[0], after_extract)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for future in [executor.submit(_extract_zip_members, origin, batch, after_extract) for batch in batches]:
+            future.result()
+
+
+def get_zip_top_directories(origin):
     with zipfile.ZipFile(origin, "r") as z:
-        return z.extractall(destination)
+        return sorted(set(name.replace("\\", "/").split("/")[0] for name in z.namelist() if "/" in name))
+
+
+def replace_entries(src, dst):
+    """
+    Moves every entry of src into dst with renames (dst and src have to be in the same file system), existing
+    entries of dst are moved aside before and then removed, so the replacement of every entry is atomic
+    """
+    if not os.path.exists(dst):
+        os.makedirs(dst)
+    for item in os.listdir(src):
+        target = os.path.join(dst, item)
+        old = None
+        if os.path.lexists(target):
+            old = "{}.old-{}".format(target, os.getpid())
+            os.rename(target, old)
+        os.rename(os.path.join(src, item), target)
+        if old is None:
+            continue
+        if os.path.isdir(old) and not os.path.islink(old):
+            shutil.rmtree(old, ignore_errors=True)
+        else:
+            os.remove(old)
+
+
+def replace_file(src, dst):
+    """
+    Renames src to dst replacing it atomically, readers find the old or the new file. Windows can not rename over an
+    existing file, there dst is removed before
+    """
+    if is_windows() and os.path.isfile(dst):
+        os.remove(dst)
+    os.rename(src, dst)
 
 
 def list_serial_ports(ports_filter=None):
@@ -143,6 +231,19 @@ def kill_process(name):
             log.exception("Failing killing old web2board process")
 
 
+def kill_process_group(process):
+    """
+    Kills the process and all its children, in posix the process has to be started with preexec_fn=os.setsid
+    """
+    try:
+        if is_windows():
+            os.system("taskkill /F /T /PID {}".format(process.pid))
+        else:
+            os.killpg(process.pid, signal.SIGTERM)
+    except OSError:
+        log.debug("Unable to kill process group of: {}".format(process.pid), exc_info=1)
+
+
 def get_executable_extension(frozen=False):
     if not are_we_frozen() and not frozen:
         return ".py"
@@ -159,7 +260,12 @@ def set_log_level(log_level):
                   "error": logging.ERROR, "critical": logging.CRITICAL}
 
     log_level = log_level if isinstance(log_level, int) else log_levels[log_level.lower()]
-    logging.getLogger().handlers[0].level = log_level
+    # the real handlers are the sinks when logging goes through the asynchronous handler
+    handlers = [sink for handler in logging.getLogger().handlers for sink in getattr(handler, "sinks", [handler])]
+    console_handlers = [h for h in handlers
+                        if isinstance(h, logging.StreamHandler) and not isinstance(h, logging.FileHandler)]
+    for handler in console_handlers or handlers[:1]:
+        handler.level = log_level
 
 
 def open_file(file_path):
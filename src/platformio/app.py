@@ -12,9 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import atexit
 import json
+import threading
 from copy import deepcopy
-from os import environ, getenv
+from os import environ, getenv, getpid, stat
 from os.path import getmtime, isfile, join
 from time import time
 
@@ -24,6 +26,7 @@ except:
     from lockfile import FileLock as LockFile
 
 
+from libs import utils
 from platformio import __version__
 from platformio.exception import InvalidSettingName, InvalidSettingValue
 from platformio.util import get_home_dir, is_ci
@@ -97,13 +100,19 @@ class State(object):
         return self._state
 
     def __exit__(self, type_, value, traceback):
-        if self._prev_state != self._state:
-            with open(self.path, "w") as fp:
-                if "dev" in __version__:
-                    json.dump(self._state, fp, indent=4)
-                else:
-                    json.dump(self._state, fp)
-        self._unlock_state_file()
+        try:
+            if self._prev_state != self._state:
+                # [web2board] modified: atomic write, readers never see a
+                # partially written file
+                tmp_path = "%s.%d.tmp" % (self.path, getpid())
+                with open(tmp_path, "w") as fp:
+                    if "dev" in __version__:
+                        json.dump(self._state, fp, indent=4)
+                    else:
+                        json.dump(self._state, fp)
+                utils.replace_file(tmp_path, self.path)
+        finally:
+            self._unlock_state_file()
 
     def _lock_state_file(self):
         if not self.lock:
@@ -121,6 +130,147 @@ class State(object):
             self._lockfile.release()
 
 
+class _PendingItems(dict):
+    """
+    Keys set in a dictionary item of the state, merged on flush with the
+    keys set by other processes
+    """
+
+
+class CachedState(object):
+    """
+    [web2board] added: process level cache of the state file. Reads only
+    stat the file (it is reloaded when its mtime, size or inode change) and
+    changes are written behind: they are visible in this process at once and
+    flushed after FLUSH_DELAY (or on flush/exit) with the locked State, which
+    merges them item by item with the changes of other processes
+    """
+
+    FLUSH_DELAY = 1
+    _DELETED = object()
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self._data = {}
+        self._stamp = None
+        self._pending = {}
+        self._timer = None
+        self._lock = threading.RLock()
+
+    def _get_stamp(self):
+        try:
+            st = stat(self.path)
+            return st.st_mtime, st.st_size, st.st_ino
+        except OSError:
+            return None
+
+    def _refresh(self):
+        stamp = self._get_stamp()
+        if stamp == self._stamp:
+            return
+        data = {}
+        if stamp is not None:
+            try:
+                with open(self.path, "r") as fp:
+                    data = json.load(fp)
+            except (IOError, ValueError):
+                data = {}
+        self._data, self._stamp = data, stamp
+
+    def get(self, name, default=None):
+        with self._lock:
+            value = self._pending.get(name)
+            if name not in self._pending or \
+                    isinstance(value, _PendingItems):
+                self._refresh()
+                value = self._merge(self._data.get(name, self._DELETED),
+                                    self._pending.get(name))
+            # callers can modify the returned value
+            return deepcopy(default if value is self._DELETED else value)
+
+    def set(self, name, value):
+        with self._lock:
+            self._pending[name] = deepcopy(value)
+            self._schedule_flush()
+
+    def set_item(self, name, key, value):
+        """
+        Sets key of the dictionary item name, the other keys are not written
+        """
+        with self._lock:
+            pending = self._pending.get(name)
+            if name not in self._pending:
+                pending = self._pending[name] = _PendingItems()
+            elif not isinstance(pending, dict):
+                pending = self._pending[name] = {}
+            pending[key] = deepcopy(value)
+            self._schedule_flush()
+
+    @classmethod
+    def _merge(cls, value, pending_items):
+        if not pending_items:
+            return value
+        items = dict(value) if isinstance(value, dict) else {}
+        items.update(pending_items)
+        return items
+
+    def delete(self, name):
+        with self._lock:
+            self._pending[name] = self._DELETED
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        if self._timer is None:
+            self._timer = threading.Timer(self.FLUSH_DELAY, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending:
+                return
+            with State(self.path, lock=True) as data:
+                for name, value in self._pending.items():
+                    if value is self._DELETED:
+                        data.pop(name, None)
+                    elif isinstance(value, _PendingItems):
+                        data[name] = self._merge(data.get(name), value)
+                    else:
+                        data[name] = value
+            self._pending = {}
+            self._refresh()
+
+    @classmethod
+    def get_instance(cls, path=None):
+        """
+        :rtype: CachedState
+        """
+        path = path or join(get_home_dir(), "appstate.json")
+        with cls._instances_lock:
+            if path not in cls._instances:
+                cls._instances[path] = CachedState(path)
+            return cls._instances[path]
+
+    @classmethod
+    def flush_all(cls):
+        with cls._instances_lock:
+            instances = cls._instances.values()
+        for instance in instances:
+            instance.flush()
+
+
+atexit.register(CachedState.flush_all)
+
+
+def flush_state():
+    CachedState.flush_all()
+
+
 def sanitize_setting(name, value):
     if name not in DEFAULT_SETTINGS:
         raise InvalidSettingName(name)
@@ -140,13 +290,11 @@ def sanitize_setting(name, value):
 
 
 def get_state_item(name, default=None):
-    with State() as data:
-        return data.get(name, default)
+    return CachedState.get_instance().get(name, default)
 
 
 def set_state_item(name, value):
-    with State(lock=True) as data:
-        data[name] = value
+    CachedState.get_instance().set(name, value)
 
 
 def get_setting(name):
@@ -160,24 +308,20 @@ def get_setting(name):
     if _env_name in environ:
         return sanitize_setting(name, getenv(_env_name))
 
-    with State() as data:
-        if "settings" in data and name in data['settings']:
-            return data['settings'][name]
+    settings = get_state_item("settings", {})
+    if name in settings:
+        return settings[name]
 
     return DEFAULT_SETTINGS[name]['value']
 
 
 def set_setting(name, value):
-    with State(lock=True) as data:
-        if "settings" not in data:
-            data['settings'] = {}
-        data['settings'][name] = sanitize_setting(name, value)
+    CachedState.get_instance().set_item("settings", name,
+                                        sanitize_setting(name, value))
 
 
 def reset_settings():
-    with State(lock=True) as data:
-        if "settings" in data:
-            del data['settings']
+    CachedState.get_instance().delete("settings")
 
 
 def get_session_var(name, default=None):
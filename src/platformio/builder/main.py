@@ -36,13 +36,20 @@ except ImportError:
         except ImportError:
             pass
 
+import atexit
 import json
 from os import environ
-from os.path import isfile, join
+from os.path import isdir, isfile, join
 from time import time
 
-from SCons.Script import COMMAND_LINE_TARGETS, DefaultEnvironment, Variables
+import SCons.Taskmaster
+from SCons.Script import (COMMAND_LINE_TARGETS, DefaultEnvironment,
+                          GetBuildFailures, SetOption, Variables)
 
+from libs.BuildTimeline import TIMELINE_ENV_VAR, create_timeline, write_timeline
+from libs.ImplicitDependencies import get_decider, get_include_dirs_key
+from libs.JobServer import JobTokenClient
+from platformio.app import get_state_item
 from platformio.exception import UnknownBoard
 
 # AllowSubstExceptions()
@@ -68,6 +75,9 @@ commonvars.AddVariables(
     ("LIB_DFCYCLIC",),
     ("LIB_IGNORE",),
     ("LIB_USE",),
+    # [web2board] added: active version of the library store
+    ("LIBVERSION",),
+    ("LIBVERSION_DIR",),
 
     # board options
     ("BOARD",),
@@ -109,6 +119,8 @@ DefaultEnvironment(
     LIBSOURCE_DIRS=[
         "$PROJECTLIB_DIR",
         util.get_lib_dir(),
+        # [web2board] added, the user libraries have priority over the store
+        "$LIBVERSION_DIR",
         join("$PLATFORMFW_DIR", "libraries")
     ]
 )
@@ -162,6 +174,89 @@ if env.subst("$PIOPACKAGE_TOOLCHAIN"):
 
 env.SConscriptChdir(0)
 env.SConsignFile(join("$PIOENVS_DIR", ".sconsign.dblite"))
+
+
+# [web2board] added fast incremental mode: implicit dependencies are stored
+# in the sconsign file, only files with a new timestamp are hashed and files
+# of the installed packages (immutable until their version changes) and of the
+# active version of the library store are not checked at all.
+# The stored dependencies are scanned again when the files of the editable
+# include dirs change. Set PLATFORMIO_DISABLE_FAST_INCREMENTAL if the files of
+# an installed package are edited by hand or a header is added to a dir that is
+# not tracked (i.e. an include dir of build_flags)
+def _store_after_successful_build(path, data):
+    def _store():
+        if not GetBuildFailures() and isdir(env.subst("$PIOENVS_DIR")):
+            with open(path, "w") as f:
+                f.write(data)
+
+    atexit.register(_store)
+
+
+def _read_stored(path):
+    if not isfile(path):
+        return None
+    with open(path) as f:
+        return f.read()
+
+
+def _configure_fast_incremental_mode():
+    SetOption("implicit_cache", 1)
+    env.Decider("MD5-timestamp")
+
+    include_dirs_path = env.subst(join("$PIOENVS_DIR", ".include_dirs_key"))
+    include_dirs_key = get_include_dirs_key([
+        env.subst(d) for d in
+        ("$PROJECTSRC_DIR", "$PROJECTLIB_DIR", util.get_lib_dir())])
+    if _read_stored(include_dirs_path) != include_dirs_key:
+        # headers found before may be shadowed by new ones
+        SetOption("implicit_deps_changed", 1)
+        _store_after_successful_build(include_dirs_path, include_dirs_key)
+
+    versions_path = env.subst(join("$PIOENVS_DIR", ".packages_versions"))
+    versions = json.dumps(
+        {k: v['version'] for k, v in
+         get_state_item("installed_packages", {}).items()}, sort_keys=True)
+
+    immutable_dirs = []
+    if _read_stored(versions_path) == versions:
+        immutable_dirs.append(env.subst("$PIOPACKAGES_DIR"))
+    else:
+        # packages were updated, the next successful build stores the versions
+        _store_after_successful_build(versions_path, versions)
+    # a version of the library store never changes once stored
+    if env.subst("$LIBVERSION_DIR"):
+        immutable_dirs.append(env.subst("$LIBVERSION_DIR"))
+
+    if immutable_dirs:
+        env.Decider(get_decider(immutable_dirs))
+
+
+if not environ.get("PLATFORMIO_DISABLE_FAST_INCREMENTAL"):
+    _configure_fast_incremental_mode()
+
+# [web2board] added: timings of the executed nodes are written for
+# BasePlatform.run when it asks for them
+def _configure_build_timeline(path):
+    start_time = time()
+    SCons.Taskmaster.CollectTimings = []
+
+    def _write_build_timeline():
+        write_timeline(path, create_timeline(
+            SCons.Taskmaster.CollectTimings, SCons.Taskmaster.ScanTime,
+            start_time, time()))
+
+    atexit.register(_write_build_timeline)
+
+
+if environ.get(TIMELINE_ENV_VAR):
+    _configure_build_timeline(environ[TIMELINE_ENV_VAR])
+
+# [web2board] added: every command takes a token of the web2board job server
+job_token_client = JobTokenClient.from_environment()
+if job_token_client is not None:
+    env.Replace(SPAWN=job_token_client.wrap_spawn(env['SPAWN']))
+
 env.SConscript("$BUILD_SCRIPT")
 
 if "UPLOAD_FLAGS" in env:
@@ -111,6 +111,11 @@ env.Append(
     ]
 )
 
+# [web2board] added, precompiled for the converted sketch (see UsePrecompiledHeader)
+env.Replace(
+    PRECOMPILED_HEADER=join("$BUILD_DIR", "FrameworkArduino", "Arduino.h")
+)
+
 #
 # Atmel SAM platform
 #
@@ -14,26 +14,42 @@
 
 from __future__ import absolute_import
 
-import atexit
 import re
 from glob import glob
-from os import environ, remove
-from os.path import basename, join
+from hashlib import md5
+from os import environ, makedirs, remove
+from os.path import basename, dirname, isdir, isfile, join
 
-from platformio.util import exec_command, where_is_program
+from libs.ToolchainFacts import ToolchainFacts
+from platformio.app import get_state_item
+from platformio.util import where_is_program
 
 
 class InoToCPPConverter(object):
 
-    PROTOTYPE_RE = re.compile(
-        r"""^(
-        (\s*[a-z_\d]+){1,2}         # return type
-        (\s+[a-z_\d]+\s*)           # name of prototype
-        \([a-z_,\.\*\&\[\]\s\d]*\)  # arguments
-        )\s*\{                      # must end with {
+    # [web2board] modified: prototypes are extracted with a single linear
+    # token scan (regular expressions over the whole sketch backtracked a lot)
+    VERSION = 2  # changes of the converted output invalidate the cached files
+    TOKENS_RE = re.compile(
+        r"""(?P<comment>//[^\n]*|/\*.*?(?:\*/|\Z))
+        |(?P<string>"(?:\\.|[^"\\\n])*"|'(?:\\.|[^'\\\n])*')
+        |(?P<preprocessor>^[ \t]*\#(?:\\\r?\n|[^\n])*)
+        |(?P<open>\{)
+        |(?P<close>\})
+        |(?P<semicolon>;)
+        |(?P<code>[^{};"'/\#\n]+|.|\n)
         """,
-        re.X | re.M | re.I
+        re.X | re.M | re.S
     )
+    IDENTIFIER_CHARS = set("abcdefghijklmnopqrstuvwxyz"
+                           "ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_")
+    ARGUMENTS_CHARS = IDENTIFIER_CHARS | set(",.*&[] \t\r\n")
+    RESERVED_KEYWORDS = set(["if", "else", "while"])
+    MAX_SIGNATURE_LENGTH = 1024
+    # definitions inside the bodies of these blocks are also prototyped
+    TYPE_BLOCK_RE = re.compile(r"\b(?:class|struct|union)\b")
+    ACCESS_LABELS_RE = re.compile(
+        r"^(?:\s*(?:public|private|protected)\s*:(?!:))+")
 
     DETECTMAIN_RE = re.compile(r"void\s+(setup|loop)\s*\(", re.M | re.I)
 
@@ -53,32 +69,95 @@ class InoToCPPConverter(object):
         else:
             return " "
 
-    def _parse_prototypes(self, contents):
+    @classmethod
+    def _get_prototype(cls, signature):
+        """
+        :return: the signature if it is a function definition as
+        "[type] type name(arguments)" or None
+        """
+        signature = cls.ACCESS_LABELS_RE.sub("", signature.strip()).strip()
+        open_index = signature.find("(")
+        if open_index <= 0 or not signature.endswith(")"):
+            return None
+        if not set(signature[open_index + 1:-1]) <= cls.ARGUMENTS_CHARS:
+            return None
+        words = signature[:open_index].split()
+        if not 2 <= len(words) <= 3 or \
+                not set("".join(words)) <= cls.IDENTIFIER_CHARS:
+            return None
+        if set(words[-2:]) & cls.RESERVED_KEYWORDS:
+            return None
+        return signature
+
+    @classmethod
+    def _scan(cls, contents):
+        """
+        :return: prototypes of the functions defined at file level or inside
+        class bodies and the offset of the first code token (None if there is
+        no code)
+        """
         prototypes = []
-        reserved_keywords = set(["if", "else", "while"])
-        for item in self.PROTOTYPE_RE.findall(contents):
-            if set([item[1].strip(), item[2].strip()]) & reserved_keywords:
+        first_code_offset = None
+        # for every open block, True if its definitions are prototyped
+        blocks = []
+        signature = []
+        signature_length = 0
+        for match in cls.TOKENS_RE.finditer(contents):
+            kind = match.lastgroup
+            collecting = all(blocks)
+            if kind == "comment":
+                if collecting and signature:
+                    signature.append(" ")
                 continue
-            prototypes.append(item[0])
-        return prototypes
+            if kind == "preprocessor":
+                if collecting:
+                    signature = []
+                    signature_length = 0
+                continue
+            if first_code_offset is None and \
+                    (kind != "code" or match.group().strip()):
+                first_code_offset = match.start()
+            if kind in ("code", "string"):
+                if collecting:
+                    if signature_length <= cls.MAX_SIGNATURE_LENGTH:
+                        signature.append(match.group())
+                    signature_length += match.end() - match.start()
+                continue
+            if kind == "open":
+                text = "".join(signature)
+                if collecting and \
+                        signature_length <= cls.MAX_SIGNATURE_LENGTH:
+                    prototype = cls._get_prototype(text)
+                    if prototype is not None:
+                        prototypes.append(prototype)
+                blocks.append(collecting and
+                              cls.TYPE_BLOCK_RE.search(text) is not None)
+            elif kind == "close" and blocks:
+                blocks.pop()
+            signature = []
+            signature_length = 0
+        return prototypes, first_code_offset
 
-    def append_prototypes(self, fname, contents, prototypes):
+    def _parse_prototypes(self, contents):
+        return self._scan(contents)[0]
+
+    def append_prototypes(self, fname, contents, prototypes,
+                          first_code_offset=None):
+        offset = first_code_offset
+        if offset is None:
+            offset = self._scan(contents)[1]
+        first_code_line = None
+        if offset is not None:
+            first_code_line = contents.count("\n", 0, offset) + 1
+        # comments are replaced keeping the number of lines
         contents = self.STRIPCOMMENTS_RE.sub(self._replace_comments_callback,
                                              contents)
         result = []
-        is_appended = False
-        linenum = 0
-        for line in contents.splitlines():
-            linenum += 1
-            line = line.strip()
-
-            if not is_appended and line and not line.startswith("#"):
-                is_appended = True
+        for linenum, line in enumerate(contents.splitlines(), 1):
+            if linenum == first_code_line:
                 result.append("%s;" % ";\n".join(prototypes))
                 result.append('#line %d "%s"' % (linenum, fname))
-
-            result.append(line)
-
+            result.append(line.strip())
         return result
 
     def convert(self):
@@ -86,9 +165,10 @@ class InoToCPPConverter(object):
         data = []
         for node in self.nodes:
             ino_contents = node.get_text_contents()
-            prototypes += self._parse_prototypes(ino_contents)
+            node_prototypes, first_code_offset = self._scan(ino_contents)
+            prototypes += node_prototypes
 
-            item = (basename(node.get_path()), ino_contents)
+            item = (basename(node.get_path()), ino_contents, first_code_offset)
             if self.is_main_node(ino_contents):
                 data = [item] + data
             else:
@@ -100,9 +180,10 @@ class InoToCPPConverter(object):
         result = ["#include <Arduino.h>"]
         is_first = True
 
-        for name, contents in data:
+        for name, contents, first_code_offset in data:
             if is_first and prototypes:
-                result += self.append_prototypes(name, contents, prototypes)
+                result += self.append_prototypes(name, contents, prototypes,
+                                                 first_code_offset)
             else:
                 result.append('#line 1 "%s"' % name)
                 result.append(contents)
@@ -112,24 +193,42 @@ class InoToCPPConverter(object):
 
 
 def ConvertInoToCpp(env):
-
-    def delete_tmpcpp_file(file_):
-        remove(file_)
-
+    # [web2board] modified: the converted file is kept between builds and
+    # only written if its content changes so scons does not recompile it
     ino_nodes = (env.Glob(join("$PROJECTSRC_DIR", "*.ino")) +
                  env.Glob(join("$PROJECTSRC_DIR", "*.pde")))
-
-    c = InoToCPPConverter(ino_nodes)
-    data = c.convert()
-
+    tmpcpp_file = join(env.subst("$PROJECTSRC_DIR"), "tmp_ino_to.cpp")
+    key_file = join(env.subst("$BUILD_DIR"), "tmp_ino_to.key")
+
+    key = md5("%d\0" % InoToCPPConverter.VERSION)
+    for node in ino_nodes:
+        key.update(node.get_path() + "\0" + node.get_contents() + "\0")
+    key = key.hexdigest()
+    if isfile(tmpcpp_file) and isfile(key_file):
+        with open(key_file) as f:
+            if f.read() == key:
+                return
+
+    data = InoToCPPConverter(ino_nodes).convert()
     if not data:
+        if isfile(tmpcpp_file):
+            remove(tmpcpp_file)
         return
 
-    tmpcpp_file = join(env.subst("$PROJECTSRC_DIR"), "tmp_ino_to.cpp")
-    with open(tmpcpp_file, "w") as f:
-        f.write(data)
+    if isinstance(data, unicode):
+        data = data.encode("utf-8")
+    old_data = None
+    if isfile(tmpcpp_file):
+        with open(tmpcpp_file, "rb") as f:
+            old_data = f.read()
+    if old_data != data:
+        with open(tmpcpp_file, "wb") as f:
+            f.write(data)
 
-    atexit.register(delete_tmpcpp_file, tmpcpp_file)
+    if not isdir(dirname(key_file)):
+        makedirs(dirname(key_file))
+    with open(key_file, "w") as f:
+        f.write(key)
 
 
 def DumpIDEData(env):
@@ -137,7 +236,10 @@ def DumpIDEData(env):
         "defines": [],
         "includes": [],
         "cxx_path": where_is_program(
-            env.subst("$CXX"), env.subst("${ENV['PATH']}"))
+            env.subst("$CXX"), env.subst("${ENV['PATH']}")),
+        # [web2board] modified to allow syntax checks without scons
+        "cxx_flags": [f for f in env.subst("$CPPFLAGS $CXXFLAGS").split()
+                      if f != "-MMD"]
     }
 
     # includes from framework and libs
@@ -174,20 +276,22 @@ def DumpIDEData(env):
     return data
 
 
+def GetCompilerFacts(env):
+    # [web2board] added: type, default include dirs and defines of $CC
+    # are read from the toolchain facts cache, it only runs the compiler when
+    # the toolchain changes
+    sysenv = environ.copy()
+    sysenv['PATH'] = str(env['ENV']['PATH'])
+    toolchain = env.subst("$PIOPACKAGE_TOOLCHAIN")
+    version = get_state_item("installed_packages", {}).get(
+        toolchain, {}).get("version") if toolchain else None
+    return ToolchainFacts.get_instance().get_compiler_facts(
+        where_is_program(env.subst("$CC"), sysenv['PATH']), sysenv, version)
+
+
 def GetCompilerType(env):
-    try:
-        sysenv = environ.copy()
-        sysenv['PATH'] = str(env['ENV']['PATH'])
-        result = exec_command([env.subst("$CC"), "-v"], env=sysenv)
-    except OSError:
-        return None
-    if result['returncode'] != 0:
-        return None
-    output = "".join([result['out'], result['err']]).lower()
-    for type_ in ("clang", "gcc"):
-        if type_ in output:
-            return type_
-    return None
+    facts = env.GetCompilerFacts()
+    return facts['type'] if facts else None
 
 
 def exists(_):
@@ -197,5 +301,6 @@ def exists(_):
 def generate(env):
     env.AddMethod(ConvertInoToCpp)
     env.AddMethod(DumpIDEData)
+    env.AddMethod(GetCompilerFacts)
     env.AddMethod(GetCompilerType)
     return env
@@ -16,6 +16,7 @@ from __future__ import absolute_import
 
 import re
 from glob import glob
+from hashlib import md5
 from os import getenv, listdir, sep, walk
 from os.path import basename, dirname, isdir, isfile, join, normpath, realpath
 
@@ -23,6 +24,10 @@ from SCons.Script import (COMMAND_LINE_TARGETS, DefaultEnvironment, Exit,
                           SConscript)
 from SCons.Util import case_sensitive_suffixes
 
+from libs.LibrariesIndex import LibrariesIndex
+from libs.PrecompiledHeader import get_key as get_precompiled_header_key
+from libs.PrecompiledHeader import remove_stale_dirs as remove_stale_pch_dirs
+from platformio.app import get_state_item
 from platformio.util import pioversion_to_intstr
 
 SRC_BUILD_EXT = ["c", "cpp", "S", "spp", "SPP", "sx", "s", "asm", "ASM"]
@@ -83,14 +88,59 @@ def BuildProgram(env):
         LIBPATH=["$BUILD_DIR"]
     )
 
+    sources = env.LookupSources(
+        "$BUILDSRC_DIR", "$PROJECTSRC_DIR", duplicate=False,
+        src_filter=getenv("PLATFORMIO_SRC_FILTER", env.get("SRC_FILTER")))
+
     return env.Program(
         join("$BUILD_DIR", env.subst("$PROGNAME")),
-        env.LookupSources(
-            "$BUILDSRC_DIR", "$PROJECTSRC_DIR", duplicate=False,
-            src_filter=getenv("PLATFORMIO_SRC_FILTER",
-                              env.get("SRC_FILTER")))
+        env.UsePrecompiledHeader(sources)
+    )
+
+
+# [web2board] added to speed up the compilation of the converted sketch
+def UsePrecompiledHeader(env, sources):
+    """
+    Compiles PRECOMPILED_HEADER (set by the framework script) with the final
+    program flags and puts it first in the include path of the converted
+    sketch (which always starts including it). The header directory is keyed
+    by the flags, the content of the source header and the installed packages
+    versions, the directories of previous keys are removed. Gcc ignores the
+    .gch and parses the header if it is not valid anymore.
+    """
+    header = env.get("PRECOMPILED_HEADER")
+    sketch_sources = [s for s in sources
+                      if basename(str(s)) == "tmp_ino_to.cpp"]
+    if (not header or not sketch_sources or
+            getenv("PLATFORMIO_DISABLE_PCH") or
+            env.GetCompilerType() != "gcc"):
+        return sources
+
+    # the source of the header, its copy in the variant dir does not exist
+    # before the first build
+    pch_key = get_precompiled_header_key(
+        env.subst("$CXX $CXXFLAGS $CCFLAGS $_CCCOMCOM"),
+        env.File(header).srcnode().get_abspath(),
+        {name: options['version'] for name, options in
+         get_state_item("installed_packages", {}).items()})
+    pch_dir = join("$BUILD_DIR", "pch", pch_key)
+    if not isdir(env.subst(pch_dir)):
+        remove_stale_pch_dirs(env.subst(join("$BUILD_DIR", "pch")), pch_key)
+    gch = env.Command(
+        join(pch_dir, basename(env.subst(header)) + ".gch"), header,
+        "$CXX -x c++-header -o $TARGET -c $CXXFLAGS $CCFLAGS $_CCCOMCOM "
+        "$SOURCE"
     )
 
+    result = []
+    for source in sources:
+        if source in sketch_sources:
+            source = env.Object(
+                source, CPPPATH=[pch_dir] + env.get("CPPPATH", []))
+            env.Depends(source, gch)
+        result.append(source)
+    return result
+
 
 def ProcessFlags(env, flags):
     for f in flags:
@@ -206,9 +256,9 @@ def BuildLibrary(env, variant_dir, src_dir, src_filter=None):
 
 def BuildDependentLibraries(env, src_dir):  # pylint: disable=R0914
 
-    INCLUDES_RE = re.compile(
-        r"^\s*#include\s+(\<|\")([^\>\"\']+)(?:\>|\")", re.M)
     LIBSOURCE_DIRS = [env.subst(d) for d in env.get("LIBSOURCE_DIRS", [])]
+    libraries_index = LibrariesIndex(
+        join(env.subst("$PIOENVS_DIR"), ".libraries_index"))
 
     # start internal prototypes
 
@@ -245,6 +295,22 @@ def BuildDependentLibraries(env, src_dir):  # pylint: disable=R0914
                 return False
 
         def _find_in_system(self):
+            if ".." in self.name:
+                return self._find_in_system_probing()
+            name = normpath(self.name)
+            for lsd_dir in LIBSOURCE_DIRS:
+                if not isdir(lsd_dir):
+                    continue
+
+                found = libraries_index.find_header(
+                    lsd_dir, name, env.get("LIB_USE", []),
+                    env.get("LIB_IGNORE", []))
+                if found is not None:
+                    self._lib_name, self._lib_dir, self._inc_path = found
+                    return True
+            return False
+
+        def _find_in_system_probing(self):
             for lsd_dir in LIBSOURCE_DIRS:
                 if not isdir(lsd_dir):
                     continue
@@ -300,7 +366,7 @@ def BuildDependentLibraries(env, src_dir):  # pylint: disable=R0914
 
     def _parse_includes(state, node):
         skip_includes = ("arduino.h", "energia.h")
-        matches = INCLUDES_RE.findall(node.get_text_contents())
+        matches = libraries_index.get_includes(node.get_text_contents())
         for (inc_type, inc_name) in matches:
             base_dir = dirname(node.get_abspath())
             if inc_name.lower() in skip_includes:
@@ -327,21 +393,32 @@ def BuildDependentLibraries(env, src_dir):  # pylint: disable=R0914
 
     # end internal prototypes
 
+    # [web2board] added: the libraries of a version of the library store
+    # are built in a directory of that version, switching back to a version
+    # does not recompile its libraries
+    libversion_dir = env.subst("$LIBVERSION_DIR")
+
+    def _get_lib_build_dir(libname, lib_dir):
+        if libversion_dir and lib_dir.startswith(libversion_dir + sep):
+            return join("$BUILD_DIR", "libversions", "$LIBVERSION", libname)
+        return join("$BUILD_DIR", libname)
+
     deplibs = _get_dep_libs(src_dir)
+    libraries_index.save()
     for l, ld in deplibs:
         env.Append(
-            CPPPATH=[join("$BUILD_DIR", l)]
+            CPPPATH=[_get_lib_build_dir(l, ld)]
         )
         # add automatically "utility" dir from the lib (Arduino issue)
         if isdir(join(ld, "utility")):
             env.Append(
-                CPPPATH=[join("$BUILD_DIR", l, "utility")]
+                CPPPATH=[join(_get_lib_build_dir(l, ld), "utility")]
             )
 
     libs = []
     for (libname, inc_dir) in deplibs:
         lib = env.BuildLibrary(
-            join("$BUILD_DIR", libname), inc_dir)
+            _get_lib_build_dir(libname, inc_dir), inc_dir)
         env.Clean(libname, lib)
         libs.append(lib)
     return libs
@@ -353,6 +430,7 @@ def exists(_):
 
 def generate(env):
     env.AddMethod(BuildProgram)
+    env.AddMethod(UsePrecompiledHeader)
     env.AddMethod(ProcessFlags)
     env.AddMethod(IsFileWithExt)
     env.AddMethod(VariantDirWrap)
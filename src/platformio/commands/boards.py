@@ -16,7 +16,8 @@ import json
 
 import click
 
-from platformio.util import get_boards
+from libs.BoardsCatalog import BoardsCatalog
+from platformio.util import get_boards, get_boards_catalog
 
 
 @click.command("list", short_help="Pre-configured Embedded Boards")
@@ -31,18 +32,14 @@ def cli(query, json_output):  # pylint: disable=R0912
                      " {flash:<7} {ram:<6} {name}")
     terminal_width, _ = click.get_terminal_size()
 
+    # [web2board] modified to search in the boards catalog index
+    catalog = get_boards_catalog()
     grpboards = {}
-    for type_, data in get_boards().items():
-        if data['platform'] not in grpboards:
-            grpboards[data['platform']] = {}
-        grpboards[data['platform']][type_] = data
+    for type_ in catalog.search(query=query):
+        platform = catalog.get_field(type_, BoardsCatalog.PLATFORM)
+        grpboards.setdefault(platform, {})[type_] = get_boards(type_)
 
     for (platform, boards) in sorted(grpboards.items()):
-        if query:
-            search_data = json.dumps(boards).lower()
-            if query.lower() not in search_data.lower():
-                continue
-
         click.echo("")
         click.echo("Platform: ", nl=False)
         click.secho(platform, bold=True)
@@ -53,11 +50,6 @@ def cli(query, json_output):  # pylint: disable=R0912
         click.echo("-" * terminal_width)
 
         for type_, data in sorted(boards.items(), key=lambda b: b[1]['name']):
-            if query:
-                search_data = "%s %s" % (type_, json.dumps(data).lower())
-                if query.lower() not in search_data.lower():
-                    continue
-
             flash_size = ""
             if "maximum_size" in data.get("upload", None):
                 flash_size = int(data['upload']['maximum_size'])
@@ -83,10 +75,6 @@ def cli(query, json_output):  # pylint: disable=R0912
 
 def ouput_boards_json(query):
     result = {}
-    for type_, data in get_boards().items():
-        if query:
-            search_data = "%s %s" % (type_, json.dumps(data).lower())
-            if query.lower() not in search_data.lower():
-                continue
-        result[type_] = data
+    for type_ in get_boards_catalog().search(query=query):
+        result[type_] = get_boards(type_)
     click.echo(json.dumps(result))
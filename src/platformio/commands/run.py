@@ -99,13 +99,15 @@ class EnvironmentProcessor(object):
     }
 
     def __init__(self, cmd_ctx, name, options,  # pylint: disable=R0913
-                 targets, upload_port, verbose):
+                 targets, upload_port, verbose,
+                 keep_going=False):  # [web2board] added keep_going
         self.cmd_ctx = cmd_ctx
         self.name = name
         self.options = self._validate_options(options)
         self.targets = targets
         self.upload_port = upload_port
         self.verbose_level = int(verbose)
+        self.keep_going = keep_going
 
     def process(self):
         terminal_width, _ = click.get_terminal_size()
@@ -184,7 +186,8 @@ class EnvironmentProcessor(object):
             _autoinstall_libs(self.cmd_ctx, self.options['lib_install'])
 
         p = PlatformFactory.newPlatform(platform)
-        return p.run(build_vars, build_targets, self.verbose_level)
+        return p.run(build_vars, build_targets, self.verbose_level,
+                     keep_going=self.keep_going)
 
 
 def _autoinstall_libs(ctx, libids_list):
@@ -12,22 +12,47 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import hashlib
+import json
+import os
+import threading
+import time
 from email.utils import parsedate_tz
-from math import ceil
-from os.path import getsize, join
+from os.path import getsize, isfile, join
 from time import mktime
 
 import click
 import requests
+from requests.packages.urllib3.exceptions import HTTPError as Urllib3Error
 
 from platformio import util
 from platformio.exception import (FDSHASumMismatch, FDSizeMismatch,
                                   FDUnrecognizedStatusCode)
 
+_TRANSFER_ERRORS = (requests.exceptions.RequestException, Urllib3Error,
+                    IOError)
+
 
 class FileDownloader(object):
+    """
+    [web2board] modified: the chunk size adapts to the connection speed,
+    big files are downloaded in parallel range segments (written and hashed
+    in order, so there is no second pass to get the sha1) and partial
+    downloads are resumed after a failure (also by the next download of the
+    same file, the .part file is kept with the validators of the response)
+    """
 
-    CHUNK_SIZE = 1024
+    MIN_CHUNK_SIZE = 16 * 1024
+    MAX_CHUNK_SIZE = 1024 * 1024
+    FAST_READ_SECONDS = 0.05
+    SLOW_READ_SECONDS = 0.5
+    PARALLEL_MIN_SIZE = 8 * 1024 * 1024
+    SEGMENT_SIZE = 2 * 1024 * 1024
+    WORKERS = 4
+    # maximum number of downloaded segments waiting to be written
+    WINDOW = 8
+    RETRIES = 3
+    TIMEOUT = 30
 
     def __init__(self, url, dest_dir=None):
         self._url = url
@@ -39,10 +64,12 @@ class FileDownloader(object):
 
         self._progressbar = None
         self._request = None
+        self._sha1 = None
 
         # make connection
         self._request = requests.get(url, stream=True,
-                                     headers=util.get_request_defheaders())
+                                     headers=util.get_request_defheaders(),
+                                     timeout=self.TIMEOUT)
         if self._request.status_code != 200:
             raise FDUnrecognizedStatusCode(self._request.status_code, url)
 
@@ -53,53 +80,248 @@ class FileDownloader(object):
         return self._destination
 
     def get_lmtime(self):
-        return self._request.headers['last-modified']
+        return self._request.headers.get('last-modified')
 
     def get_size(self):
+        if "content-length" not in self._request.headers:
+            return None
         return int(self._request.headers['content-length'])
 
-    def start(self):
-        itercontent = self._request.iter_content(chunk_size=self.CHUNK_SIZE)
-        f = open(self._destination, "wb")
-        chunks = int(ceil(self.get_size() / float(self.CHUNK_SIZE)))
+    def accepts_ranges(self):
+        return self._request.headers.get("accept-ranges") == "bytes" and \
+            self.get_size() is not None
+
+    def get_sha1(self):
+        return self._sha1
+
+    def start(self, on_data=None):
+        """
+        :param on_data: function called with the bytes of the file in order
+        """
+        sha1 = hashlib.sha1()
+        hasher = sha1 if on_data is None else _Tee(sha1, on_data)
+        part_path = self._destination + ".part"
+        offset = self._resume(part_path, hasher)
+        size = self.get_size()
+
+        with open(part_path, "ab") as f:
+            with self._progress(size) as progress:
+                progress(offset)
+                if size is None or offset < size:
+                    if self.accepts_ranges() and \
+                            size >= self.PARALLEL_MIN_SIZE and \
+                            size - offset > self.SEGMENT_SIZE:
+                        self._download_segments(f, offset, hasher, progress)
+                    else:
+                        self._download_stream(f, offset, hasher, progress)
+        self._request.close()
+
+        self._sha1 = sha1.hexdigest()
+        if isfile(self._destination):
+            os.remove(self._destination)
+        os.rename(part_path, self._destination)
+        os.remove(part_path + ".json")
+        if self.get_lmtime():
+            self._preserve_filemtime(self.get_lmtime())
+
+    def _get_validators(self):
+        return dict(url=self._url, size=self.get_size(),
+                    etag=self._request.headers.get("etag"),
+                    lmtime=self.get_lmtime())
+
+    def _resume(self, part_path, hasher):
+        """
+        Hashes the bytes of a previous partial download of the same file
+        :return: offset to continue the download
+        """
+        info_path = part_path + ".json"
+        validators = self._get_validators()
+        try:
+            with open(info_path) as f:
+                resumable = json.load(f) == validators and \
+                    self.accepts_ranges() and \
+                    getsize(part_path) <= self.get_size()
+        except (IOError, OSError, ValueError):
+            resumable = False
+
+        if resumable:
+            with open(part_path, "rb") as f:
+                for data in iter(lambda: f.read(self.MAX_CHUNK_SIZE), b""):
+                    hasher.update(data)
+            return getsize(part_path)
 
-        if util.is_ci():
+        if isfile(part_path):
+            os.remove(part_path)
+        with open(info_path, "w") as f:
+            json.dump(validators, f)
+        return 0
+
+    def _progress(self, size):
+        if util.is_ci() or size is None:
             click.echo("Downloading...")
-            for _ in range(0, chunks):
-                f.write(next(itercontent))
-        else:
-            with click.progressbar(length=chunks, label="Downloading") as pb:
-                for _ in pb:
-                    f.write(next(itercontent))
-        f.close()
+            return _NoProgress()
+        return _ProgressBar(click.progressbar(length=size,
+                                              label="Downloading"))
+
+    def _open_range(self, start, end=None, session=requests):
+        headers = util.get_request_defheaders()
+        headers['Range'] = "bytes=%d-%s" % (
+            start, "" if end is None else end - 1)
+        # the final url, without redirections
+        r = session.get(self._request.url, stream=True, headers=headers,
+                        timeout=self.TIMEOUT)
+        if r.status_code != 206:
+            r.close()
+            raise FDUnrecognizedStatusCode(r.status_code, self._url)
+        return r
+
+    def _iter_content(self, response):
+        """
+        Reads MIN_CHUNK_SIZE..MAX_CHUNK_SIZE chunks, bigger while the reads
+        are fast and smaller when they are slow (to keep the progress alive)
+        """
+        chunk_size = self.MIN_CHUNK_SIZE
+        while True:
+            start_time = time.time()
+            data = response.raw.read(chunk_size, decode_content=True)
+            if not data:
+                return
+            yield data
+            elapsed = time.time() - start_time
+            if len(data) == chunk_size and elapsed < self.FAST_READ_SECONDS:
+                chunk_size = min(chunk_size * 2, self.MAX_CHUNK_SIZE)
+            elif elapsed > self.SLOW_READ_SECONDS:
+                chunk_size = max(chunk_size / 2, self.MIN_CHUNK_SIZE)
+
+    def _download_stream(self, f, offset, hasher, progress):
+        size = self.get_size()
+        response = self._request if offset == 0 else None
+        attempt = 0
+        while True:
+            try:
+                if response is None:
+                    response = self._open_range(offset)
+                for data in self._iter_content(response):
+                    f.write(data)
+                    hasher.update(data)
+                    offset += len(data)
+                    progress(len(data))
+                if size is None or offset >= size:
+                    return
+            except _TRANSFER_ERRORS:
+                if not self.accepts_ranges() or attempt >= self.RETRIES:
+                    raise
+            finally:
+                if response is not None:
+                    response.close()
+            # connection lost, the download continues where it was
+            if not self.accepts_ranges() or attempt >= self.RETRIES:
+                raise FDSizeMismatch(offset, self._fname, size)
+            attempt += 1
+            response = None
+
+    def _fetch_segment(self, session, start, end):
+        chunks = []
+        received = 0
+        attempt = 0
+        while True:
+            try:
+                response = self._open_range(start + received, end, session)
+                try:
+                    for data in self._iter_content(response):
+                        chunks.append(data)
+                        received += len(data)
+                finally:
+                    response.close()
+                if received >= end - start:
+                    return b"".join(chunks)
+            except _TRANSFER_ERRORS:
+                if attempt >= self.RETRIES:
+                    raise
+            if attempt >= self.RETRIES:
+                raise FDSizeMismatch(received, self._fname, end - start)
+            attempt += 1
+
+    def _download_segments(self, f, offset, hasher, progress):
+        size = self.get_size()
+        # the segments use their own connections
         self._request.close()
+        segments = [(start, min(start + self.SEGMENT_SIZE, size))
+                    for start in range(offset, size, self.SEGMENT_SIZE)]
+        condition = threading.Condition()
+        state = dict(next=0, written=0, results={}, error=None, stop=False)
+
+        def fetch_segments():
+            session = requests.Session()
+            try:
+                while True:
+                    with condition:
+                        while state['next'] - state['written'] >= \
+                                self.WINDOW and not state['stop']:
+                            condition.wait(1)
+                        if state['stop'] or state['next'] >= len(segments):
+                            return
+                        index = state['next']
+                        state['next'] += 1
+                    try:
+                        data = self._fetch_segment(session, *segments[index])
+                    except Exception as e:  # pylint: disable=broad-except
+                        with condition:
+                            state['error'] = state['error'] or e
+                            state['stop'] = True
+                            condition.notify_all()
+                        return
+                    with condition:
+                        state['results'][index] = data
+                        condition.notify_all()
+            finally:
+                session.close()
+
+        for _ in range(min(self.WORKERS, len(segments))):
+            thread = threading.Thread(target=fetch_segments,
+                                      name="FileDownloader-segment")
+            thread.daemon = True
+            thread.start()
 
-        self._preserve_filemtime(self.get_lmtime())
+        try:
+            for index in range(len(segments)):
+                with condition:
+                    while index not in state['results'] and \
+                            state['error'] is None:
+                        # waits with timeout to be interruptible
+                        condition.wait(1)
+                    if index not in state['results']:
+                        raise state['error']
+                    data = state['results'].pop(index)
+                    state['written'] = index + 1
+                    condition.notify_all()
+                # segments are written in order, the .part file is always
+                # resumable and the sha1 is computed while writing
+                f.write(data)
+                hasher.update(data)
+                progress(len(data))
+        finally:
+            with condition:
+                state['stop'] = True
+                condition.notify_all()
 
     def verify(self, sha1=None):
         _dlsize = getsize(self._destination)
-        if _dlsize != self.get_size():
+        if self.get_size() is not None and _dlsize != self.get_size():
             raise FDSizeMismatch(_dlsize, self._fname, self.get_size())
 
         if not sha1:
             return
 
-        dlsha1 = None
-        try:
-            result = util.exec_command(["sha1sum", self._destination])
-            dlsha1 = result['out']
-        except OSError:
-            try:
-                result = util.exec_command(
-                    ["shasum", "-a", "1", self._destination])
-                dlsha1 = result['out']
-            except OSError:
-                pass
-
-        if dlsha1:
-            dlsha1 = dlsha1[1:41] if dlsha1.startswith("\\") else dlsha1[:40]
-            if sha1 != dlsha1:
-                raise FDSHASumMismatch(dlsha1, self._fname, sha1)
+        dlsha1 = self._sha1
+        if dlsha1 is None:
+            hasher = hashlib.sha1()
+            with open(self._destination, "rb") as f:
+                for data in iter(lambda: f.read(self.MAX_CHUNK_SIZE), b""):
+                    hasher.update(data)
+            dlsha1 = hasher.hexdigest()
+        if sha1 != dlsha1:
+            raise FDSHASumMismatch(dlsha1, self._fname, sha1)
 
     def _preserve_filemtime(self, lmdate):
         timedata = parsedate_tz(lmdate)
@@ -109,3 +331,36 @@ class FileDownloader(object):
     def __del__(self):
         if self._request:
             self._request.close()
+
+
+class _Tee(object):
+
+    def __init__(self, hasher, on_data):
+        self._hasher = hasher
+        self._on_data = on_data
+
+    def update(self, data):
+        self._hasher.update(data)
+        self._on_data(data)
+
+
+class _ProgressBar(object):
+
+    def __init__(self, progressbar):
+        self._progressbar = progressbar
+
+    def __enter__(self):
+        self._progressbar.__enter__()
+        return self._progressbar.update
+
+    def __exit__(self, *args):
+        return self._progressbar.__exit__(*args)
+
+
+class _NoProgress(object):
+
+    def __enter__(self):
+        return lambda _: None
+
+    def __exit__(self, *args):
+        pass
@@ -20,6 +20,7 @@ from os.path import abspath, basename, expanduser, isdir, join, relpath
 import bottle
 import click
 
+from libs.ToolchainFacts import ToolchainFacts, get_project_stamp
 from platformio import exception, util
 
 
@@ -64,9 +65,17 @@ class ProjectGenerator(object):
         envdata = self.get_project_env()
         if "env_name" not in envdata:
             return data
+        # [web2board] modified to read the idedata from the toolchain facts
+        # cache instead of running platformio every time
+        return ToolchainFacts.get_instance().get_or_compute(
+            "idedata", "%s|%s" % (self.project_dir, envdata['env_name']),
+            get_project_stamp(self.project_dir),
+            lambda: self._run_project_build_data(envdata['env_name']))
+
+    def _run_project_build_data(self, env_name):
         result = util.exec_command(
             ["platformio", "-f", "run", "-t", "idedata",
-             "-e", envdata['env_name'], "-d", self.project_dir]
+             "-e", env_name, "-d", self.project_dir]
         )
 
         if result['returncode'] != 0 or '"includes":' not in result['out']:
@@ -14,7 +14,7 @@
 
 import json
 import re
-from os import listdir, makedirs, remove, rename
+from os import listdir, rename
 from os.path import isdir, isfile, join
 from shutil import rmtree
 from tempfile import gettempdir
@@ -36,6 +36,7 @@ class LibraryManager(object):
     def download(url, dest_dir):
         fd = FileDownloader(url, dest_dir)
         fd.start()
+        fd.verify()
         return fd.get_filepath()
 
     @staticmethod
@@ -89,16 +90,10 @@ class LibraryManager(object):
             "/lib/download/" + str(id_),
             dict(version=version) if version else None
         )
-        dlpath = None
         tmplib_dir = join(self.lib_dir, str(id_))
-        try:
-            dlpath = self.download(dlinfo['url'], gettempdir())
-            if not isdir(tmplib_dir):
-                makedirs(tmplib_dir)
-            self.unpack(dlpath, tmplib_dir)
-        finally:
-            if dlpath:
-                remove(dlpath)
+        # [web2board] modified: unpacked while it is downloaded
+        fd = FileDownloader(dlinfo['url'], gettempdir())
+        FileUnpacker(fd.get_filepath(), tmplib_dir).download_and_start(fd)
 
         info = self.get_info(id_)
         rename(tmplib_dir, join(self.lib_dir, "%s_ID%d" % (
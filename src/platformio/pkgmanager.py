@@ -12,8 +12,8 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
-from os import makedirs, remove
-from os.path import basename, isdir, isfile, join
+from os import makedirs
+from os.path import basename, dirname, isdir, join
 from shutil import rmtree
 from time import time
 
@@ -46,6 +46,12 @@ class PackageManager(object):
         fd.verify(sha1)
         return fd.get_filepath()
 
+    @staticmethod
+    def download_and_unpack(url, dest_dir, sha1=None):
+        fd = FileDownloader(url, dirname(dest_dir))
+        fu = FileUnpacker(fd.get_filepath(), dest_dir)
+        return fu.download_and_start(fd, sha1)
+
     @staticmethod
     def unpack(pkgpath, dest_dir):
         fu = FileUnpacker(pkgpath, dest_dir)
@@ -94,26 +100,21 @@ class PackageManager(object):
 
         info = self.get_info(name)
         pkg_dir = join(self._package_dir, name)
-        if not isdir(pkg_dir):
-            makedirs(pkg_dir)
 
-        dlpath = None
+        # [web2board] modified: the package is unpacked while it is
+        # downloaded and moved to pkg_dir only if it is complete
         try:
-            dlpath = self.download(info['url'], pkg_dir, info['sha1'])
+            self.download_and_unpack(info['url'], pkg_dir, info['sha1'])
         except (requests.exceptions.ConnectionError,
                 requests.exceptions.ChunkedEncodingError,
                 exception.FDUnrecognizedStatusCode, StopIteration):
-            if info['url'].startswith("http://sourceforge.net"):
-                dlpath = self.download(
-                    "http://dl.platformio.org/packages/%s" %
-                    basename(info['url']), pkg_dir, info['sha1'])
-
-        assert isfile(dlpath)
+            if not info['url'].startswith("http://sourceforge.net"):
+                raise
+            self.download_and_unpack(
+                "http://dl.platformio.org/packages/%s" %
+                basename(info['url']), pkg_dir, info['sha1'])
 
-        if self.unpack(dlpath, pkg_dir):
-            self._register(name, info['version'])
-        # remove archive
-        remove(dlpath)
+        self._register(name, info['version'])
 
         telemetry.on_event(
             category="PackageManager", action="Install", label=name)
@@ -20,7 +20,8 @@ from platformio.commands.run import EnvironmentProcessor, _clean_pioenvs_dir
 
 
 def run(ctx=None, environment=(), target=(), upload_port=None,  # pylint: disable=R0913,R0914
-        project_dir=os.getcwd(), verbose=3, disable_auto_clean=False):
+        project_dir=os.getcwd(), verbose=3, disable_auto_clean=False,
+        keep_going=False):  # [web2board] added keep_going
     with util.cd(project_dir):
         config = util.get_project_config()
 
@@ -63,7 +64,8 @@ def run(ctx=None, environment=(), target=(), upload_port=None,  # pylint: disabl
                 options[k] = v
 
             ep = EnvironmentProcessor(
-                    ctx, envname, options, target, upload_port, verbose)
+                    ctx, envname, options, target, upload_port, verbose,
+                    keep_going=keep_going)
             results.append(ep.process()) # [JORGE_GARCIA] modified to get process description
 
         return results
@@ -11,16 +11,22 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import json
 import logging
 import os
 import re
+import tempfile
+from hashlib import md5
 from imp import load_source
-from multiprocessing import cpu_count
-from os.path import isdir, isfile, join
+from os.path import getmtime, isdir, isfile, join
 
 import click
 import sys
 
+from libs import BuildTimeline
+from libs.CompileProgress import get_output_sink
+from libs.JobServer import JOB_SERVER_ENV_VAR, JobServer
+from libs.LibraryStore import LibraryStore
 from libs.PathsManager import PathsManager
 from platformio import app, exception, util
 from platformio.app import get_state_item, set_state_item
@@ -162,6 +168,58 @@ class PlatformFactory(object):
             raise exception.UnknownPlatform(type_)
         return module
 
+    # [web2board] added: static manifest of the platforms of a directory
+    # (type -> module file -> class name) created when packaging and
+    # validated with the mtime of the modules, so only the requested platform
+    # module is imported. Manifests created at runtime are written in the home
+    # dir, never in the platforms dir
+    MANIFEST_NAME = "platforms_manifest.json"
+
+    @classmethod
+    def get_manifest_cache_path(cls, pdir):
+        return join(util.get_home_dir(), "%s_%s" % (
+            md5(os.path.realpath(pdir)).hexdigest()[:10], cls.MANIFEST_NAME))
+
+    @staticmethod
+    def _get_sources_mtimes(pdir):
+        return {p[:-3]: getmtime(join(pdir, p)) for p in os.listdir(pdir)
+                if p.endswith(".py") and p not in ("__init__.py", "base.py")}
+
+    @classmethod
+    def create_manifest(cls, pdir, manifest_path=None):
+        sources = cls._get_sources_mtimes(pdir)
+        platforms = {}
+        for type_ in sorted(sources):
+            with open(join(pdir, "%s.py" % type_)) as f:
+                source = f.read()
+            # the class is searched in the source to not run every module
+            if re.search(r"^class %s\b" % cls.get_clsname(type_), source,
+                         re.M):
+                platforms[type_] = {"file": "%s.py" % type_,
+                                    "class": cls.get_clsname(type_)}
+        manifest = {"sources": sources, "platforms": platforms}
+        if manifest_path is not None:
+            try:
+                with open(manifest_path, "w") as f:
+                    json.dump(manifest, f, indent=2, sort_keys=True)
+            except IOError:
+                pass
+        return manifest
+
+    @classmethod
+    def load_manifest(cls, pdir):
+        cache_path = cls.get_manifest_cache_path(pdir)
+        # the packaged manifest first
+        for manifest_path in (join(pdir, cls.MANIFEST_NAME), cache_path):
+            try:
+                with open(manifest_path) as f:
+                    manifest = json.load(f)
+                if manifest['sources'] == cls._get_sources_mtimes(pdir):
+                    return manifest
+            except (IOError, ValueError, KeyError):
+                pass
+        return cls.create_manifest(pdir, cache_path)
+
     @classmethod
     @util.memoized
     def _lookup_platforms(cls):
@@ -170,21 +228,8 @@ class PlatformFactory(object):
             pdir = join(d, "platforms")
             if not isdir(pdir):
                 continue
-            for p in sorted(os.listdir(pdir)):
-                if (p in ("__init__.py", "base.py") or not
-                p.endswith(".py")):
-                    continue
-                type_ = p[:-3]
-                path = join(pdir, p)
-                try:
-                    isplatform = hasattr(
-                        cls.load_module(type_, path),
-                        cls.get_clsname(type_)
-                    )
-                    if isplatform:
-                        platforms[type_] = path
-                except exception.UnknownPlatform:
-                    pass
+            for type_, data in cls.load_manifest(pdir)['platforms'].items():
+                platforms[type_] = join(pdir, data['file'])
         return platforms
 
     @classmethod
@@ -394,7 +439,8 @@ class BasePlatform(object):
         else:
             raise exception.PlatformNotInstalledYet(self.get_type())
 
-    def run(self, variables, targets, verbose):
+    def run(self, variables, targets, verbose,
+            keep_going=False):  # [web2board] added keep_going
         assert isinstance(variables, list)
         assert isinstance(targets, list)
 
@@ -422,6 +468,16 @@ class BasePlatform(object):
             if not isfile(path):
                 raise exception.BuildScriptNotFound(path)
 
+        # [web2board] added: libraries of the active version of the
+        # library store, resolved once so the whole build uses the same one
+        if "libversion_dir" not in envoptions:
+            library_store = LibraryStore.get_instance()
+            lib_version = library_store.get_active_version()
+            if lib_version is not None:
+                variables.append("LIBVERSION=%s" % lib_version)
+                variables.append("LIBVERSION_DIR=%s" %
+                                 library_store.get_version_path(lib_version))
+
         # append aliases of the installed packages
         installed_packages = PackageManager.get_installed()
         for name, options in self.get_packages().items():
@@ -431,12 +487,15 @@ class BasePlatform(object):
                 "PIOPACKAGE_%s=%s" % (options['alias'].upper(), name))
 
         self._found_error = False
+        # [web2board] modified to stream the output to the sink of the requesting thread
+        self._output_sink = get_output_sink()
         args = []
         try:
             args = [os.path.relpath(PathsManager.EXECUTABLE_FILE),  # [JORGE_GARCIA] modified for scons compatibility
                     "-Q",
                     "-j %d" % self.get_job_nums(),
-                    "--warn=no-no-parallel-support",
+                    "--warn=no-no-parallel-support"
+                    ] + (["-k"] if keep_going else []) + [  # [web2board] added keep_going
                     "-f", join(util.get_source_dir(), "builder", "main.py")
                     ] + variables + targets + [os.getcwd()]
             if PathsManager.EXECUTABLE_FILE.endswith(".py"):
@@ -444,15 +503,30 @@ class BasePlatform(object):
             # test that SCons is installed correctly
             # assert util.test_scons()
             log.debug("Executing: {}".format("\n".join(args)))
+            # [web2board] modified to share the compiler processes with the syntax checks
+            job_server_value = JobServer.get_instance().get_environment_value()
+            # [web2board] modified, the scons process reads the state file
+            app.flush_state()
+            # [web2board] modified to get the build timeline of the scons process
+            timeline_fd, timeline_path = tempfile.mkstemp(prefix="w2b_timeline_", suffix=".json")
+            os.close(timeline_fd)
+            exec_kwargs = {"env": dict(os.environ, **{JOB_SERVER_ENV_VAR: job_server_value,
+                                                      BuildTimeline.TIMELINE_ENV_VAR: timeline_path})}
+            if self._output_sink is not None:
+                # [web2board] modified to let the sink abort the whole build (fail fast)
+                exec_kwargs["on_process_started"] = self._output_sink.on_process_started
+                exec_kwargs["new_process_group"] = True
             result = util.exec_command(args,
-                                       stdout=util.AsyncPipe(self.on_run_out),
-                                       stderr=util.AsyncPipe(self.on_run_err))
+                                       on_out=self.on_run_out,
+                                       on_err=self.on_run_err,
+                                       **exec_kwargs)
 
         except (OSError, AssertionError) as e:
             log.exception("error running scons with \n{}".format(args))
             raise exception.SConsNotInstalledError()
 
         assert "returncode" in result
+        result["timeline"] = BuildTimeline.collect(timeline_path, board=envoptions.get("board"))
         # if self._found_error:
         #     result['returncode'] = 1
 
@@ -462,9 +536,13 @@ class BasePlatform(object):
         return result
 
     def on_run_out(self, line):
+        if getattr(self, "_output_sink", None) is not None:
+            self._output_sink.on_out(line)
         self._echo_line(line, level=3)
 
     def on_run_err(self, line):
+        if getattr(self, "_output_sink", None) is not None:
+            self._output_sink.on_err(line)
         is_error = self.LINE_ERROR_RE.search(line) is not None
         if is_error:
             self._found_error = True
@@ -490,7 +568,5 @@ class BasePlatform(object):
 
     @staticmethod
     def get_job_nums():
-        try:
-            return cpu_count()
-        except NotImplementedError:
-            return 1
+        # [web2board] modified, the job server limits the total processes of all builds
+        return JobServer.get_instance().tokens
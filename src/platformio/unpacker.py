@@ -12,14 +12,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import os
+import threading
+from contextlib import contextmanager
 from os import chmod
-from os.path import join, splitext
+from os.path import abspath, isdir, join, normpath, splitext
+from Queue import Full, Queue
+from shutil import rmtree
 from tarfile import open as tarfile_open
 from time import mktime
 from zipfile import ZipFile
 
 import click
 
+from libs import utils
 from platformio import util
 from platformio.exception import UnsupportedArchiveType
 
@@ -39,20 +45,34 @@ class ArchiveBase(object):
     def after_extract(self, item, dest_dir):
         pass
 
+    # [web2board] added to let every archive type extract in its fastest way
+    def extract_all(self, dest_dir):
+        for item in self.get_items():
+            self.extract_item(item, dest_dir)
+
 
 class TARArchive(ArchiveBase):
 
-    def __init__(self, archpath):
-        ArchiveBase.__init__(self, tarfile_open(archpath))
+    # [web2board] modified: opened in stream mode, the members are
+    # extracted in a single sequential pass (also from a fileobj that is
+    # being downloaded)
+    def __init__(self, archpath=None, fileobj=None):
+        ArchiveBase.__init__(self, tarfile_open(archpath, mode="r|*",
+                                                fileobj=fileobj))
 
     def get_items(self):
-        return self._afo.getmembers()
+        return self._afo
+
+    def extract_all(self, dest_dir):
+        self._afo.extractall(dest_dir)
+        self._afo.close()
 
 
 class ZIPArchive(ArchiveBase):
 
     def __init__(self, archpath):
         ArchiveBase.__init__(self, ZipFile(archpath))
+        self._archpath = archpath
 
     @staticmethod
     def preserve_permissions(item, dest_dir):
@@ -74,6 +94,91 @@ class ZIPArchive(ArchiveBase):
         self.preserve_permissions(item, dest_dir)
         self.preserve_mtime(item, dest_dir)
 
+    # [web2board] added: members are extracted in parallel
+    def extract_all(self, dest_dir):
+        self._afo.close()
+        utils.extract_zip(
+            self._archpath, dest_dir,
+            after_extract=lambda item, _: self.after_extract(item, dest_dir))
+
+
+class TARStream(object):
+    """
+    [web2board] added: file object of the bytes of a tar archive fed while
+    it is downloaded, a thread extracts them as they arrive
+    """
+
+    MAX_PENDING_CHUNKS = 64
+    READ_SIZE = 64 * 1024
+
+    def __init__(self, dest_dir):
+        self._chunks = Queue(self.MAX_PENDING_CHUNKS)
+        self._data = ""
+        self._eof = False
+        self._error = None
+        self._thread = threading.Thread(target=self._extract,
+                                        args=(dest_dir,),
+                                        name="TARStream-extract")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        try:
+            self.close()
+        except Exception:  # pylint: disable=broad-except
+            # the error of the download is more relevant
+            if exc_type is None:
+                raise
+
+    def _extract(self, dest_dir):
+        try:
+            TARArchive(fileobj=self).extract_all(dest_dir)
+        except Exception as e:  # pylint: disable=broad-except
+            self._error = e
+        # the feeder can not be blocked by a full queue
+        while self.read(self.READ_SIZE):
+            pass
+
+    def read(self, size=-1):
+        pieces = []
+        while not self._eof and (size < 0 or size > 0):
+            if not self._data:
+                data = self._chunks.get()
+                if data is None:
+                    self._eof = True
+                    break
+                self._data = data
+            piece = self._data if size < 0 else self._data[:size]
+            self._data = self._data[len(piece):]
+            pieces.append(piece)
+            size -= len(piece) if size > 0 else 0
+        return "".join(pieces)
+
+    def feed(self, data):
+        while True:
+            if self._error is not None:
+                raise self._error
+            try:
+                # with timeout to check the errors of the extraction
+                self._chunks.put(data, timeout=1)
+                return
+            except Full:
+                pass
+
+    def close(self):
+        """
+        Waits the extraction of the fed bytes
+        """
+        self._chunks.put(None)
+        # joins with timeout to be interruptible
+        while self._thread.is_alive():
+            self._thread.join(1)
+        if self._error is not None:
+            raise self._error
+
 
 class FileUnpacker(object):
 
@@ -82,23 +187,62 @@ class FileUnpacker(object):
         self._dest_dir = dest_dir
         self._unpacker = None
 
+        # [web2board] modified: the archive is opened when it is unpacked,
+        # it can be still downloading
         _, archext = splitext(archpath.lower())
         if archext in (".gz", ".bz2"):
-            self._unpacker = TARArchive(archpath)
+            self._unpacker = TARArchive
         elif archext == ".zip":
-            self._unpacker = ZIPArchive(archpath)
+            self._unpacker = ZIPArchive
 
         if not self._unpacker:
             raise UnsupportedArchiveType(archpath)
 
+    @contextmanager
+    def _staging(self):
+        """
+        [web2board] added: the archive is extracted in a staging directory
+        next to the destination and then renamed into it, the destination
+        never has a partially extracted archive
+        """
+        dest_dir = normpath(abspath(self._dest_dir))
+        staging_dir = "%s.unpacking-%d" % (dest_dir, os.getpid())
+        if isdir(staging_dir):
+            rmtree(staging_dir)
+        os.makedirs(staging_dir)
+        try:
+            yield staging_dir
+            if isdir(dest_dir) and not os.listdir(dest_dir):
+                os.rmdir(dest_dir)
+            if isdir(dest_dir):
+                utils.replace_entries(staging_dir, dest_dir)
+            else:
+                os.rename(staging_dir, dest_dir)
+        finally:
+            if isdir(staging_dir):
+                rmtree(staging_dir, ignore_errors=True)
+
     def start(self):
-        if util.is_ci():
-            click.echo("Unpacking...")
-            for item in self._unpacker.get_items():
-                self._unpacker.extract_item(item, self._dest_dir)
-        else:
-            with click.progressbar(self._unpacker.get_items(),
-                                   label="Unpacking") as pb:
-                for item in pb:
-                    self._unpacker.extract_item(item, self._dest_dir)
+        click.echo("Unpacking...")
+        with self._staging() as staging_dir:
+            self._unpacker(self._archpath).extract_all(staging_dir)
+        return True
+
+    def download_and_start(self, downloader, sha1=None):
+        """
+        [web2board] added: tar archives are extracted while they are
+        downloaded, zip archives (their central directory is at the end)
+        after. Nothing is moved to the destination if the download fails
+        """
+        click.echo("Downloading and unpacking...")
+        with self._staging() as staging_dir:
+            if self._unpacker is TARArchive:
+                with TARStream(staging_dir) as stream:
+                    downloader.start(on_data=stream.feed)
+            else:
+                downloader.start()
+            downloader.verify(sha1)
+            if self._unpacker is ZIPArchive:
+                ZIPArchive(self._archpath).extract_all(staging_dir)
+        os.remove(downloader.get_filepath())
         return True
@@ -17,17 +17,18 @@ import functools
 import json
 import os
 import re
-import subprocess
 import sys
-import tempfile
 from glob import glob
 from os.path import (abspath, basename, dirname, expanduser, isdir, isfile,
                      join, realpath)
 from platform import system, uname
-from threading import Thread
 
 from libs import utils
+from libs.BoardsCatalog import BoardsCatalog
 from libs.PathsManager import PathsManager
+from libs.ProcessRunner import ProcessRunner
+from libs.RegistryCache import RegistryCache
+from libs.ToolchainFacts import ToolchainFacts
 from platformio import __apiurl__, __version__, exception
 
 # pylint: disable=wrong-import-order
@@ -37,39 +38,6 @@ except ImportError:
     from ConfigParser import ConfigParser
 
 
-class AsyncPipe(Thread):
-
-    def __init__(self, outcallback=None):
-        Thread.__init__(self)
-        self.outcallback = outcallback
-
-        self._fd_read, self._fd_write = os.pipe()
-        self._pipe_reader = os.fdopen(self._fd_read)
-        self._buffer = []
-
-        self.start()
-
-    def get_buffer(self):
-        return self._buffer
-
-    def fileno(self):
-        return self._fd_write
-
-    def run(self):
-        for line in iter(self._pipe_reader.readline, ""):
-            line = line.strip()
-            self._buffer.append(line)
-            if self.outcallback:
-                self.outcallback(line)
-            else:
-                print line
-        self._pipe_reader.close()
-
-    def close(self):
-        os.close(self._fd_write)
-        self.join()
-
-
 class cd(object):
 
     def __init__(self, new_path):
@@ -226,47 +194,18 @@ def is_ci():
     return os.getenv("CI", "").lower() == "true"
 
 
-def exec_command(*args, **kwargs):
-    result = {
-        "out": None,
-        "err": None,
-        "returncode": None
-    }
-
-    tempPath = tempfile.gettempdir() + os.sep + "w2bInAuxiliary.w2b" # [JORGE_GARCIA] modified for non console in windows
-    with open(tempPath, "w"):
-        pass
-
-
-    default = dict(
-        stdout=subprocess.PIPE,
-        stderr=subprocess.PIPE,
-        stdin=open(tempPath, "r"),  # [JORGE_GARCIA] modified for non console in windows
-        shell=system() == "Windows"
-    )
-    default.update(kwargs)
-    kwargs = default
-
-    p = subprocess.Popen(*args, **kwargs)
+def exec_command(args, **kwargs):
+    """
+    [web2board] modified: runs the process with ProcessRunner (stdout and
+    stderr multiplexed in the calling thread, null device as stdin and bounded
+    output). Besides the Popen arguments it accepts on_out/on_err line
+    callbacks, timeout, new_process_group and on_process_started
+    """
+    kwargs.setdefault("shell", system() == "Windows")
     try:
-        result['out'], result['err'] = p.communicate()
-        result['returncode'] = p.returncode
+        return ProcessRunner(args, **kwargs).run()
     except KeyboardInterrupt:
         raise exception.AbortedByUser()
-    finally:
-        for s in ("stdout", "stderr"):
-            if isinstance(kwargs[s], AsyncPipe):
-                kwargs[s].close()
-
-    for s in ("stdout", "stderr"):
-        if isinstance(kwargs[s], AsyncPipe):
-            result[s[3:]] = "\n".join(kwargs[s].get_buffer())
-
-    for k, v in result.iteritems():
-        if v and isinstance(v, basestring):
-            result[k].strip()
-
-    return result
 
 
 def get_serialports():
@@ -322,22 +261,29 @@ def get_api_result(path, params=None, data=None):
         if data:
             r = requests.post(__apiurl__ + path, params=params, data=data,
                               headers=get_request_defheaders())
+            result = r.json()
+            r.raise_for_status()
         else:
-            r = requests.get(__apiurl__ + path, params=params,
-                             headers=get_request_defheaders())
-        result = r.json()
-        r.raise_for_status()
+            # [web2board] added: registry responses are cached on disk
+            status_code, text = RegistryCache.get_instance().get(
+                __apiurl__ + path, params=params,
+                headers=get_request_defheaders())
+            result = json.loads(text)
+            if status_code >= 400:
+                raise requests.exceptions.HTTPError(
+                    "%d Error for url: %s" % (status_code, __apiurl__ + path))
     except requests.exceptions.HTTPError as e:
         if result and "errors" in result:
             raise exception.APIRequestError(result['errors'][0]['title'])
         else:
             raise exception.APIRequestError(e)
-    except requests.exceptions.ConnectionError:
+    except (requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout):
         raise exception.APIRequestError(
             "Could not connect to PlatformIO Registry Service")
     except ValueError:
         raise exception.APIRequestError(
-            "Invalid response: %s" % r.text.encode("utf-8"))
+            "Invalid response: %s" % (r.text if r else text).encode("utf-8"))
     finally:
         if r:
             r.close()
@@ -392,31 +338,26 @@ def scons_in_pip():
     return "scons (" in r['out'].lower()
 
 
+# [web2board] modified: boards are read from a compiled catalog (index
+# plus serialized boards) instead of loading all the json files in every
+# process, a board is only deserialized when it is requested
 @memoized
-def _lookup_boards():
-    boards = {}
-    bdirs = [join(get_source_dir(), "boards")]
-    if isdir(join(get_home_dir(), "boards")):
-        bdirs.append(join(get_home_dir(), "boards"))
-
-    for bdir in bdirs:
-        for json_file in sorted(os.listdir(bdir)):
-            if not json_file.endswith(".json"):
-                continue
-            with open(join(bdir, json_file)) as f:
-                boards.update(json.load(f))
-    return boards
+def get_boards_catalog():
+    return BoardsCatalog(
+        join(get_home_dir(), "boards_catalog.json"),
+        [join(get_source_dir(), "boards"), join(get_home_dir(), "boards")])
 
 
 def get_boards(type_=None):
-    boards = _lookup_boards()
+    catalog = get_boards_catalog()
 
     if type_ is None:
-        return boards
+        return catalog.get_all()
     else:
-        if type_ not in boards:
+        board = catalog.get_board(type_)
+        if board is None:
             raise exception.UnknownBoard(type_)
-        return boards[type_]
+        return board
 
 
 @memoized
@@ -459,10 +400,24 @@ def get_frameworks(type_=None):
 
 
 def where_is_program(program, envpath=None):
-    env = os.environ
+    # [web2board] modified: locations are read from the toolchain facts
+    # cache (while the file exists) instead of spawning which/where
+    env = os.environ.copy()
     if envpath:
         env['PATH'] = envpath
+    facts = ToolchainFacts.get_instance()
+    key = "%s%s%s" % (program, os.pathsep, env.get("PATH", ""))
+    location = facts.get("programs", key)
+    if location is not None and isfile(location):
+        return location
+
+    location = _where_is_program(program, env)
+    if location != program:
+        facts.set("programs", key, location)
+    return location
+
 
+def _where_is_program(program, env):
     # try OS's built-in commands
     try:
         result = exec_command(
@@ -20,7 +20,7 @@ import click
 from wshubsapi.hubs_inspector import HubsInspector
 
 from Scripts.TestRunner import *
-from libs.LoggingUtils import init_logging
+from libs.LoggingUtils import init_logging, flush_logging
 from libs.PathsManager import PathsManager
 
 log = init_logging(__name__)  # initialized in main
@@ -58,6 +58,7 @@ def run_scons_script():
 
 if "-Q" in sys.argv:
     run_scons_script()
+    flush_logging()
     os._exit(1)
 
 if __name__ == "__main__":
@@ -86,4 +87,5 @@ if __name__ == "__main__":
         else:
             log.critical("critical exception", exc_info=1)
 
+    flush_logging()
     os._exit(1)
@@ -65,7 +65,7 @@ def needs_factory_reset():
     return False
 
 
-@asynchronous()
+@asynchronous(pool="io")
 def factory_reset_process():
     global msg_box
     try:
@@ -111,7 +111,7 @@ def update_if_necessary():
         app.mainloop()
 
 
-@asynchronous()
+@asynchronous(pool="watchdog")
 def start_watchdog():
     global msg_box
     time_passed = 0